@@ -0,0 +1,308 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from micro_grid.envs.v2.WeatherCache import WeatherCache, default_cache_dir
+
+## PARAMETERS ##
+ENV_ID = "micro_grid:micro-v2"
+MODELS = "trained_models/*.zip"
+OUTPUT_DIR = "trained_csv"
+CONFIG_PATH = "./config.yml"
+# the pretrained agents were evaluated for 5 episodes on the seed 96
+EVAL_EPISODES = 5
+EVAL_SEED = 96
+# name of the random baseline among the models
+RANDOM = "random"
+# the evaluation loop next to this script, together with the micro_grid package a change invalidates the cached evaluations
+EVALUATION_SOURCE = "ExecuteBaseline.py"
+
+
+def file_hash(path: str) -> str:
+    """Returns the sha256 of a file
+
+    Args:
+        path (str): the file
+
+    Returns:
+        str: hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def files_hash(paths: list, base: str) -> str:
+    """Returns the sha256 over the names and contents of files
+
+    Args:
+        paths (list): the files
+        base (str): directory the names are relative to, so moving the files does not change the hash
+
+    Returns:
+        str: hex digest
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.relpath(path, base).replace(os.sep, "/").encode())
+        digest.update(file_hash(path).encode())
+    return digest.hexdigest()
+
+
+def source_hash() -> str:
+    """Returns the hash of the sources of the installed micro_grid package and of the evaluation loop
+
+    Returns:
+        str: hex digest
+    """
+    import micro_grid
+    package = os.path.dirname(os.path.abspath(micro_grid.__path__[0]))
+    paths = sorted(glob.glob(os.path.join(
+        micro_grid.__path__[0], "**", "*.py"), recursive=True))
+    evaluation = os.path.join(os.path.dirname(
+        os.path.abspath(__file__)), EVALUATION_SOURCE)
+    return hashlib.sha256((files_hash(paths, package) + file_hash(evaluation)).encode()).hexdigest()
+
+
+def weather_hash(years: list) -> str:
+    """Returns the hash of the cached weather of the evaluation years, fetches missing years first
+
+    Args:
+        years (list): the evaluation years
+
+    Returns:
+        str: hex digest
+    """
+    from micro_grid.envs.v2.Ambient2 import LATITUDE, LONGITUDE
+    cache = WeatherCache()
+    paths = []
+    for year in sorted(set(years)):
+        cache.get(LATITUDE, LONGITUDE, year)
+        paths.append(cache.path(LATITUDE, LONGITUDE, year))
+    return files_hash(paths, cache.cache_dir)
+
+
+def model_name(path: str) -> str:
+    """Returns the name of the results of a model file, e.g. model_10_000 for trained_models/PPO_model_10_000.zip"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return name[len("PPO_"):] if name.startswith("PPO_") else name
+
+
+def model_names(paths: list) -> dict:
+    """Returns the model files by the names of their results
+
+    Args:
+        paths (list): the model files
+
+    Raises:
+        ValueError: If model files share a name, their results would overwrite each other
+
+    Returns:
+        dict: model file by name
+    """
+    names = {}
+    for path in paths:
+        names.setdefault(model_name(path), []).append(path)
+    duplicates = {name: files for name, files in names.items() if len(files) > 1}
+    if(len(duplicates) > 0):
+        raise ValueError("Model files share the name of their results, rename them: " +
+                         "; ".join(name + ": " + ", ".join(files) for name, files in sorted(duplicates.items())))
+    return {name: files[0] for name, files in names.items()}
+
+
+def available_cpus() -> int:
+    """Returns the amount of cpus this process may use, like ExecuteBaseline.split_cpus, all cpus where the affinity is unknown"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def cache_key(model_hash: str, sources: str, config_hash: str, weather: str, seed: int, episodes: int) -> dict:
+    """Returns everything an evaluation depends on, equal keys have equal results.
+    The episodes simulated at once are not part of it, every episode is seeded on its own.
+
+    Args:
+        model_hash (str): hash of the model file, RANDOM for the random baseline
+        sources (str): hash of the sources of the environment and the evaluation
+        config_hash (str): hash of the building config
+        weather (str): hash of the weather of the evaluation years
+        seed (int): evaluation seed
+        episodes (int): amount of episodes
+
+    Returns:
+        dict: the key
+    """
+    return {'model': model_hash, 'env': ENV_ID, 'sources': sources, 'config': config_hash,
+            'weather': weather, 'seed': seed, 'episodes': episodes}
+
+
+def cache_path(cache_dir: str, name: str, key: dict) -> str:
+    """Returns the cache file of an evaluation"""
+    digest = hashlib.sha256(json.dumps(
+        key, sort_keys=True).encode()).hexdigest()
+    return os.path.join(cache_dir, name + "-" + digest[:16] + ".npz")
+
+
+def load_cached(path: str, key: dict):
+    """Loads the rewards of a cached evaluation
+
+    Args:
+        path (str): the cache file
+        key (dict): the key of the evaluation
+
+    Returns:
+        _type_: the reward of every step, one row per episode, None if the evaluation is not cached
+    """
+    if(not os.path.isfile(path)):
+        return None
+    with np.load(path) as cached:
+        # the file name only holds a prefix of the hash
+        if(json.loads(str(cached['key'])) != key):
+            return None
+        return cached['rewards']
+
+
+def store_cached(path: str, key: dict, rewards: np.ndarray):
+    """Stores the rewards of an evaluation like WeatherCache.save_atomic,
+    written to a unique temporary file first so readers never see a partial file and concurrent runs never share one"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    descriptor, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".npz")
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            np.savez(file, rewards=rewards,
+                     key=np.array(json.dumps(key, sort_keys=True)))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def evaluate(model_path: str, years: list, seed: int, eval_envs: int, threads: int) -> np.ndarray:
+    """Evaluates a model or the random baseline on the given years, runs in a worker process
+
+    Args:
+        model_path (str): the model file, RANDOM for the random baseline
+        years (list): a year per episode
+        seed (int): evaluation seed
+        eval_envs (int): episodes simulated at once
+        threads (int): torch threads of the worker
+
+    Returns:
+        np.ndarray: the reward of every step, one row per episode
+    """
+    import torch
+    from stable_baselines3 import PPO
+    from ExecuteBaseline import evaluate_batched, model_policy, random_policy
+    torch.set_num_threads(threads)
+    if(model_path == RANDOM):
+        policy = random_policy(seed, len(years))
+    else:
+        policy = model_policy(PPO.load(model_path, device="cpu"))
+    return evaluate_batched(policy, years, eval_envs, seed)
+
+
+def results_frame(rewards: np.ndarray, random=False) -> pd.DataFrame:
+    """Returns the results of an evaluation in the format of the ExecuteBaseline log
+
+    Args:
+        rewards (np.ndarray): the reward of every step, one row per episode
+        random (bool, optional): uses the column names of the random baseline. Defaults to False.
+
+    Returns:
+        pd.DataFrame: rewards per step, reward sum per episode and their mean and standard deviation
+    """
+    prefix = "random" if random else "model"
+    episode_prefix = "random_" if random else ""
+    steps = rewards.ravel()
+    sums = np.sum(rewards, axis=1, dtype=np.float64)
+    return pd.concat([pd.DataFrame({prefix + '_rewards': steps}),
+                      pd.DataFrame({prefix + '_sum_rewards': sums}),
+                      pd.DataFrame({prefix + '_mean_reward_per_step': [np.mean(steps, dtype=np.float64)],
+                                    prefix + '_std_reward_per_step': [np.std(steps, dtype=np.float64)],
+                                    episode_prefix + 'episode_mean_reward': [np.mean(sums)],
+                                    episode_prefix + 'episode_std_reward': [np.std(sums)]})], axis=1)
+
+
+def main():
+    from ExecuteBaseline import EVAL_ENVS, evaluation_years
+    parser = argparse.ArgumentParser(
+        prog="EvaluateModels.py", usage="python EvaluateModels.py",
+        description="Evaluates every trained model and the random baseline on the same years and seed in parallel worker processes "
+                    "and writes one csv per model. Evaluations are cached by model file, environment sources, config, weather, "
+                    "seed and episodes, so only new or changed models are evaluated again.")
+    parser.add_argument("models", nargs="*", default=[MODELS],
+                        help="Model files or glob patterns. Default: trained_models/*.zip.")
+    parser.add_argument("-e", "--episodes", type=int, default=EVAL_EPISODES,
+                        help="Evaluation episodes per model. Default: 5.")
+    parser.add_argument("-s", "--eval_seed", type=int, default=EVAL_SEED,
+                        help="Seed of the years and prices of the evaluation. Default: 96.")
+    parser.add_argument("-o", "--output", default=OUTPUT_DIR,
+                        help="Directory of the csv files. Default: trained_csv.")
+    parser.add_argument("-w", "--workers", type=int, default=available_cpus(),
+                        help="Worker processes, each evaluates one model at a time. Default: one per cpu.")
+    parser.add_argument("--eval-envs", type=int, default=EVAL_ENVS,
+                        help="Episodes simulated at once by a worker, like in ExecuteBaseline it does not change the results. Default: 16.")
+    parser.add_argument("--cache", default=os.path.join(default_cache_dir(), "evaluations"),
+                        help="Directory of the cached evaluations. Default: evaluations in the weather cache directory.")
+    parser.add_argument("--no_random", action='store_true', default=False,
+                        help="Does not evaluate random. Default evaluates random.")
+    args = parser.parse_args()
+    model_paths = sorted({path for pattern in args.models
+                          for path in (glob.glob(pattern) if glob.has_magic(pattern) else [pattern])})
+    if(len(model_paths) == 0):
+        raise FileNotFoundError("There is no model matching " +
+                                " ".join(args.models))
+    config_hash = file_hash(CONFIG_PATH)
+    sources = source_hash()
+    years = evaluation_years(args.episodes, args.eval_seed)
+    weather = weather_hash(years)
+    jobs = {name: (path, file_hash(path))
+            for name, path in model_names(model_paths).items()}
+    if(not args.no_random):
+        if(RANDOM in jobs):
+            raise ValueError("The results of " + jobs[RANDOM][0] +
+                             " would overwrite the random baseline, rename it or pass --no_random")
+        jobs[RANDOM] = (RANDOM, RANDOM)
+    results = {}
+    pending = {}
+    for name, (path, model_hash) in jobs.items():
+        key = cache_key(model_hash, sources, config_hash, weather,
+                        args.eval_seed, args.episodes)
+        rewards = load_cached(cache_path(args.cache, name, key), key)
+        if(rewards is None):
+            pending[name] = (path, key)
+        else:
+            results[name] = rewards
+    print(f"{len(results)} evaluations cached, evaluating {len(pending)}: {' '.join(pending)}")
+    if(len(pending) > 0):
+        workers = max(1, min(args.workers, len(pending)))
+        # the cpus are split between the workers, so their torch threads do not oversubscribe them
+        threads = max(1, available_cpus() // workers)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {name: executor.submit(evaluate, path, years, args.eval_seed, args.eval_envs, threads)
+                       for name, (path, _) in pending.items()}
+            for name, future in futures.items():
+                results[name] = future.result()
+                key = pending[name][1]
+                store_cached(cache_path(args.cache, name, key),
+                             key, results[name])
+                print(f"evaluated {name}")
+    os.makedirs(args.output, exist_ok=True)
+    for name, rewards in sorted(results.items()):
+        results_frame(rewards, name == RANDOM).to_csv(
+            os.path.join(args.output, name + ".csv"))
+        print(f"{name:20s} mean_reward_per_step {np.mean(rewards):6.3f} +/- {np.std(rewards):.3f}, "
+              f"episode reward sum {np.mean(np.sum(rewards, axis=1)):9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,30 @@
 import gym
 import numpy as np
 from stable_baselines3 import *
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
+import torch
 import warnings
 import os
 import pandas as pd
 import argparse
+from micro_grid.envs.TrajectoryRecorder import TrajectoryRecorder
+from micro_grid.envs.Grid_env_3 import PRICE_FLUCTUATION, TOTAL_DAYS
+from micro_grid.envs.v2.Ambient2 import Ambient, candidate_years
+from micro_grid.envs.v2.YearBank import YearBank
+
+## PARAMETERS ##
+# dummy steps the environments one after another, subproc in a process each, batched all villages in one Grid_env_batched
+VEC_BACKENDS = ("dummy", "subproc", "batched")
+TRAIN_SEED = 42
+# thread pools of numpy and torch in the worker processes, the workers only step environments
+WORKER_THREAD_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS",
+                           "OPENBLAS_NUM_THREADS")
+# villages evaluated together in one Grid_env_batched
+EVAL_ENVS = 16
+EPISODE_STEPS = int(TOTAL_DAYS*24)
+# streams of the seeds of an evaluation episode, one for its prices and missing wind, one for the random policy
+ENV_STREAM = 0
+POLICY_STREAM = 1
 
 
 parser = argparse.ArgumentParser(
@@ -27,95 +47,305 @@ parser.add_argument("-e", "--episodes", type=int,
                     help="Sets the amount of evaluation episodes. Default: 1.")
 parser.add_argument("--no_random", action='store_true', default=False,
                     help="Does not evaluate random. Default evaluates random.")
-args = parser.parse_args()
-
-MODEL_PATH = None
-if(args.filename != ""):
-    MODEL_PATH = os.path.normpath(args.filename)
-EVAL_EPISODES = 1
-if(args.episodes):
-    EVAL_EPISODES = args.episodes
-TOTAL_STEPS = 50_000
-if(args.timesteps):
-    TOTAL_STEPS = args.timesteps
-warnings.filterwarnings('ignore')
-print(f"============================Building environment============================")
-env = gym.make("micro_grid:micro-v2")
-env.seed(42)
-eval_env = gym.make("micro_grid:micro-v2")
-if args.eval_seed:
-    eval_env.seed(args.eval_seed)
-if(args.load):
-    print(f"============================Loading============================")
-    model = PPO.load(str(MODEL_PATH))
-else:
-    model = PPO('MlpPolicy', env, verbose=1, device='cuda')
-    print(f"============================Learning============================")
-    model.learn(total_timesteps=TOTAL_STEPS)
-if(args.load != True and MODEL_PATH is not None):
-    print(f"============================Saving============================")
-    model.save(str(MODEL_PATH))
-
-print(f"============================Evaluating============================")
-if(args.exit):
-    exit()
-mean_reward = None
-std_reward = None
-model_rewards_all_episodes = []
-model_sum_rewards_all_episodes = []
-for i in range(EVAL_EPISODES):
-    rewards_list_episode = np.array([])
-    done = False
-    obs = eval_env.reset()
-    while True:
-        action, _ = model.predict(obs)
-        obs, reward, done, info = eval_env.step(action)
-        rewards_list_episode = np.append(rewards_list_episode, reward)
-        if(args.render):
-            eval_env.render()
-        if done == True:
-            break
-    model_rewards_all_episodes += rewards_list_episode.tolist()
-    model_sum_rewards_all_episodes.append(np.sum(rewards_list_episode))
-mean_reward = np.mean(model_rewards_all_episodes)
-std_reward = np.std(model_rewards_all_episodes)
-print(f"mean_reward_per_step:{mean_reward:.2f} +/- {std_reward:.2f}")
-print(f"============================Evaluation Ended============================")
-if(not args.no_random):
-    print(f"============================Random Action Evaluation============================")
-    eval_env.reset()
-    rewards_list_all_random = []
-    for i in range(EVAL_EPISODES):
-        rewards_list_episode = np.array([])
-        done = False
-        obs = eval_env.reset()
-        while True:
-            action = eval_env.action_space.sample()
-            obs, rewards, done, info = eval_env.step(action)
-            rewards_list_episode = np.append(rewards_list_episode, rewards)
+parser.add_argument("--trajectory",
+                    help="Records every evaluation step into npz chunks in this directory. Default nothing is recorded.")
+parser.add_argument("--n-envs", type=int, default=1,
+                    help="Amount of training environments. Default: 1.")
+parser.add_argument("--vec-backend", choices=VEC_BACKENDS, default="dummy",
+                    help="dummy steps the environments one after another, subproc each in its own process, batched all at once in one Grid_env_batched. Default: dummy.")
+parser.add_argument("--seed", type=int, default=TRAIN_SEED,
+                    help="Seed of the training environments, environment i draws its years and prices from its own generator seeded with seed + i. Default: 42.")
+parser.add_argument("--threads", type=int,
+                    help="Threads of torch in the training process. Default: torch decides.")
+parser.add_argument("--pin", action="store_true", default=False,
+                    help="Pins the training process to the first of the cpus it may use, one per thread, and every subproc worker to one of the remaining ones. Fails if there are too few cpus.")
+parser.add_argument("--eval-envs", type=int, default=EVAL_ENVS,
+                    help="Evaluation episodes simulated at once, the policy predicts the actions of all of them in one call. Default: 16.")
+
+
+def split_cpus(threads: int, workers: int) -> tuple:
+    """Splits the cpus this process may use, e.g. restricted by cgroups or taskset, between training and subproc workers
+
+    Args:
+        threads (int): threads of the training process, each gets a cpu
+        workers (int): subproc workers, each gets a cpu of its own
+
+    Raises:
+        ValueError: If there are fewer cpus than threads and workers
+
+    Returns:
+        tuple: the cpus of the training process and the cpu of every worker
+    """
+    cpus = sorted(os.sched_getaffinity(0))
+    if(len(cpus) < threads + workers):
+        raise ValueError("Pinning " + str(threads) + " training threads and " + str(workers) + " workers needs " +
+                         str(threads + workers) + " cpus, but only " + str(len(cpus)) + " are available: " + str(cpus))
+    return cpus[:threads], cpus[threads:threads + workers]
+
+
+def make_env(rank: int, seed: int, year_bank=None, cpu=None):
+    """Returns a function that creates a seeded training environment, e.g. for a vectorized environment
+
+    Args:
+        rank (int): index of the environment, it is seeded with seed + rank
+        seed (int): seed of the first environment
+        year_bank (YearBank, optional): shared tables of all years. Defaults to None.
+        cpu (int, optional): cpu the process of the environment is pinned to. Defaults to no pinning.
+
+    Returns:
+        _type_: function that creates the environment
+    """
+    def create_env():
+        if(cpu is not None):
+            os.sched_setaffinity(0, {cpu})
+        env = gym.make("micro_grid:micro-v2", year_bank=year_bank)
+        env.seed(seed + rank)
+        return env
+    return create_env
+
+
+def build_env(args, year_bank=None, worker_cpus=None):
+    """Creates the vectorized training environment of the command line options
+
+    Args:
+        args (_type_): parsed command line options
+        year_bank (YearBank, optional): shared tables of all years. Defaults to None.
+        worker_cpus (list, optional): cpu every subproc worker is pinned to. Defaults to no pinning.
+
+    Returns:
+        _type_: the VecEnv
+    """
+    if(args.vec_backend == "batched"):
+        from micro_grid.envs.Grid_env_batched import Grid_env_batched
+        return Grid_env_batched(args.n_envs, year_bank=year_bank, seed=args.seed)
+    if(args.vec_backend == "subproc"):
+        env_fns = [make_env(rank, args.seed, year_bank, worker_cpus[rank] if worker_cpus else None)
+                   for rank in range(args.n_envs)]
+        # inherited by the workers, so they do not oversubscribe the cpus
+        for variable in WORKER_THREAD_VARIABLES:
+            os.environ.setdefault(variable, "1")
+        return SubprocVecEnv(env_fns)
+    return DummyVecEnv([make_env(rank, args.seed, year_bank) for rank in range(args.n_envs)])
+
+
+def evaluation_years(episodes: int, seed: int) -> list:
+    """Draws the years of the evaluation episodes, the model and the random policy are evaluated on the same years
+
+    Args:
+        episodes (int): amount of episodes
+        seed (int): seed of the evaluation
+
+    Returns:
+        list: a year per episode
+    """
+    rng = np.random.default_rng(seed)
+    return [int(year) for year in rng.choice(candidate_years(), episodes)]
+
+
+def episode_seeds(seed: int, episodes: int, stream: int) -> list:
+    """Returns a seed of its own for every evaluation episode, derived from the evaluation seed, the episode and the stream.
+    An episode gets the same seed however the episodes are batched and whether they are simulated together or one by one.
+
+    Args:
+        seed (int): seed of the evaluation
+        episodes (int): amount of episodes
+        stream (int): ENV_STREAM or POLICY_STREAM
+
+    Returns:
+        list: a np.random.SeedSequence per episode
+    """
+    return [np.random.SeedSequence(seed, spawn_key=(episode, stream)) for episode in range(episodes)]
+
+
+def model_policy(model):
+    """Returns the deterministic policy of a model, predicting the actions of one or many observations at once.
+    Sampled actions would depend on which episodes are predicted together."""
+    return lambda obs, action_space, episodes: model.predict(obs, deterministic=True)[0]
+
+
+def random_policy(seed: int, episodes: int):
+    """Returns a policy of random actions, every episode draws from a generator of its own
+
+    Args:
+        seed (int): seed of the evaluation
+        episodes (int): amount of episodes
+
+    Returns:
+        _type_: function of the observations, the action space and the index of the episode or episodes, returning the actions
+    """
+    rngs = [np.random.default_rng(episode_seed)
+            for episode_seed in episode_seeds(seed, episodes, POLICY_STREAM)]
+
+    def policy(obs, action_space, episodes):
+        if(np.ndim(episodes) == 0):
+            return rngs[episodes].integers(action_space.nvec)
+        return np.stack([rngs[episode].integers(action_space.nvec) for episode in episodes])
+    return policy
+
+
+def evaluate_batched(policy, years: list, eval_envs: int, seed: int) -> np.ndarray:
+    """Evaluates a policy on one episode per year, eval_envs episodes at once in a Grid_env_batched
+
+    Args:
+        policy (_type_): function of the observations of all villages, the action space and the indices of their episodes,
+            returning their actions
+        years (list): a year per episode
+        eval_envs (int): episodes simulated at once, the results do not depend on it
+        seed (int): seed of the evaluation, every episode draws its prices and missing wind from a seed of its own, see episode_seeds
+
+    Returns:
+        np.ndarray: the reward of every step, one row per episode
+    """
+    from micro_grid.envs.Grid_env_batched import Grid_env_batched
+    seeds = episode_seeds(seed, len(years), ENV_STREAM)
+    rewards = np.zeros((len(years), EPISODE_STEPS), dtype=np.float32)
+    for first in range(0, len(years), eval_envs):
+        shard = years[first:first + eval_envs]
+        episodes = np.arange(first, first + len(shard))
+        env = Grid_env_batched(len(shard), years=shard, seed=seed,
+                               episode_seeds=seeds[first:first + len(shard)])
+        obs = env.reset()
+        for step in range(EPISODE_STEPS):
+            obs, rewards[first:first + len(shard), step], dones, _ = env.step(
+                policy(obs, env.action_space, episodes))
+        # all villages started together, so they end together
+        if(not np.all(dones)):
+            raise RuntimeError(
+                "The evaluation episodes did not end after " + str(EPISODE_STEPS) + " steps")
+        env.close()
+    return rewards
+
+
+def evaluate_serial(env, policy, years: list, seed: int, render=False) -> np.ndarray:
+    """Evaluates a policy on one episode per year one after another, e.g. to render or record the episodes
+
+    Args:
+        env (_type_): the environment
+        policy (_type_): function of the observation, the action space and the index of the episode, returning the action
+        years (list): a year per episode
+        seed (int): seed of the evaluation, every episode draws its prices and missing wind from a seed of its own like in evaluate_batched
+        render (bool, optional): renders every step. Defaults to False.
+
+    Returns:
+        np.ndarray: the reward of every step, one row per episode
+    """
+    seeds = episode_seeds(seed, len(years), ENV_STREAM)
+    rewards = np.zeros((len(years), EPISODE_STEPS), dtype=np.float32)
+    for episode, year in enumerate(years):
+        obs = env.reset(year=year, episode_seed=seeds[episode])
+        for step in range(EPISODE_STEPS):
+            obs, rewards[episode, step], done, info = env.step(
+                policy(obs, env.action_space, episode))
+            if(render):
+                env.render()
             if done == True:
                 break
-        rewards_list_all_random += rewards_list_episode.tolist()
-    print(
-        f"mean_reward_per_step random={np.mean(rewards_list_all_random):.2f} +/- {np.std(rewards_list_all_random)}")
-    print(f"============================Random Action Evaluation Ended============================")
+    return rewards
+
 
+def main():
+    args = parser.parse_args()
 
-if(args.log):
-    db = pd.DataFrame()
+    MODEL_PATH = None
+    if(args.filename != ""):
+        MODEL_PATH = os.path.normpath(args.filename)
+    EVAL_EPISODES = 1
+    if(args.episodes):
+        EVAL_EPISODES = args.episodes
+    TOTAL_STEPS = 50_000
+    if(args.timesteps):
+        TOTAL_STEPS = args.timesteps
+    warnings.filterwarnings('ignore')
+    print(f"============================Building environment============================")
+    if(args.pin and not args.threads):
+        # a pinned training process gets one cpu unless more threads are given
+        args.threads = 1
+    if(args.threads):
+        torch.set_num_threads(args.threads)
+    worker_cpus = None
+    if(args.pin):
+        if(not hasattr(os, "sched_setaffinity")):
+            parser.error("--pin needs os.sched_setaffinity, which this platform does not support")
+        # only subproc runs the environments in worker processes
+        workers = args.n_envs if args.vec_backend == "subproc" and not args.load else 0
+        try:
+            training_cpus, worker_cpus = split_cpus(args.threads, workers)
+        except ValueError as error:
+            parser.error("--pin: " + str(error))
+        os.sched_setaffinity(0, set(training_cpus))
+    eval_env = None
+    if(args.render or args.trajectory):
+        eval_env = gym.make("micro_grid:micro-v2")
+        if(args.trajectory):
+            eval_env = TrajectoryRecorder(eval_env, args.trajectory)
+    if(args.load):
+        print(f"============================Loading============================")
+        model = PPO.load(str(MODEL_PATH))
+    else:
+        # the tables of all years are loaded once and shared by all training environments
+        year_bank = None
+        if(args.n_envs > 1):
+            year_bank = YearBank.create(Ambient(TOTAL_DAYS, PRICE_FLUCTUATION))
+        env = build_env(args, year_bank, worker_cpus)
+        model = PPO('MlpPolicy', env, verbose=1, device='cuda')
+        print(f"============================Learning============================")
+        model.learn(total_timesteps=TOTAL_STEPS)
+        env.close()
+        if(year_bank is not None):
+            year_bank.close()
+    if(args.load != True and MODEL_PATH is not None):
+        print(f"============================Saving============================")
+        model.save(str(MODEL_PATH))
+
+    print(f"============================Evaluating============================")
+    if(args.exit):
+        return
+    eval_seed = args.eval_seed
+    if(eval_seed is None):
+        eval_seed = int(np.random.SeedSequence().entropy % 2**32)
+    years = evaluation_years(EVAL_EPISODES, eval_seed)
+
+    def evaluate(policy) -> np.ndarray:
+        if(eval_env is not None):
+            # rendering and recording need a single environment
+            return evaluate_serial(eval_env, policy, years, eval_seed, args.render)
+        return evaluate_batched(policy, years, args.eval_envs, eval_seed)
+
+    model_rewards = evaluate(model_policy(model))
+    model_rewards_all_episodes = model_rewards.ravel()
+    model_sum_rewards_all_episodes = np.sum(model_rewards, axis=1)
+    mean_reward = np.mean(model_rewards_all_episodes)
+    std_reward = np.std(model_rewards_all_episodes)
+    print(f"mean_reward_per_step:{mean_reward:.2f} +/- {std_reward:.2f}")
+    print(f"============================Evaluation Ended============================")
     if(not args.no_random):
-        db['rnd_rewards'] = rewards_list_all_random
-    db['model_rewards'] = model_rewards_all_episodes
-    db2 = pd.DataFrame()
-    db2['model_sum_rewards'] = model_sum_rewards_all_episodes
-    db3 = pd.DataFrame()
-    db3['model_mean_reward_per_step'] = [mean_reward]
-    db3['model_std_reward_per_step'] = [std_reward]
-    db3['episode_mean_reward'] = [np.mean(model_sum_rewards_all_episodes)]
-    db3['episode_std_reward'] = [np.std(model_sum_rewards_all_episodes)]
-    path = os.path.normpath(args.log)
-    pd.concat([db, db2, db3], axis=1).to_csv(str(path))
+        print(f"============================Random Action Evaluation============================")
+        rewards_list_all_random = evaluate(random_policy(eval_seed, EVAL_EPISODES)).ravel()
+        print(
+            f"mean_reward_per_step random={np.mean(rewards_list_all_random):.2f} +/- {np.std(rewards_list_all_random)}")
+        print(f"============================Random Action Evaluation Ended============================")
+
+    if(args.log):
+        db = pd.DataFrame()
+        if(not args.no_random):
+            db['rnd_rewards'] = rewards_list_all_random
+        db['model_rewards'] = model_rewards_all_episodes
+        db2 = pd.DataFrame()
+        db2['model_sum_rewards'] = model_sum_rewards_all_episodes
+        db3 = pd.DataFrame()
+        db3['model_mean_reward_per_step'] = [mean_reward]
+        db3['model_std_reward_per_step'] = [std_reward]
+        db3['episode_mean_reward'] = [np.mean(model_sum_rewards_all_episodes)]
+        db3['episode_std_reward'] = [np.std(model_sum_rewards_all_episodes)]
+        path = os.path.normpath(args.log)
+        pd.concat([db, db2, db3], axis=1).to_csv(str(path))
+    if(args.trajectory):
+        # writes the remaining steps of the trajectory
+        eval_env.close()
+
 
+if __name__ == "__main__":
+    main()
 
 # reward_sum_list = [model_rewards_all_episodes[0]]
 # x = [0]
@@ -1,138 +1,280 @@
-import enum
-from timeit import repeat
+import os
+import multiprocessing
 import matplotlib
 from matplotlib import animation
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from micro_grid.envs.v2.Building2 import Building
 import networkx as nx
-from micro_grid.envs.v2.Solar2 import Solar
-from micro_grid.envs.v2.Battery2 import Battery
-from micro_grid.envs.v2.Ambient2 import Ambient
+from micro_grid.envs.v3.Topology import Topology
 import matplotlib.pyplot as plt
 import numpy as np
-import queue as qu
 import datetime
+from micro_grid.envs.Telemetry import Telemetry, SharedTelemetry, frame_length
 
+## PARAMETERS ##
+# frames per second the monitor draws at most, steps in between are skipped
+TARGET_FPS = 5
+MIN_EDGE_WIDTH = 0.5
+MAX_EDGE_WIDTH = 4.0
+# position of the action label along the edge, from the source building
+LABEL_POS = 0.75
+# video frames per second, every step is one frame
+VIDEO_FPS = 24
+VIDEO_DPI = 100
+# memory of the telemetry between environment and renderer process, a year fits for usual villages
+VIDEO_BUFFER_BYTES = 256 * 1024 * 1024
+VIDEO_BUFFER_FRAMES = int(365.25*24) + 1
 
-def create_plot(nodes: Building, queue: qu.Queue, ambient: Ambient):
-    fig = plt.figure()
-    G = nx.MultiDiGraph()
-    buildings = nodes
-    node_tags = []
-    power_bought_list = []
-    size_list = []
-    try:
-        ambient_data = ambient.queue.get_nowait()
-    except qu.Empty:
-        return
-    text_str = "Hour: "+str(ambient_data[0]) + \
-        "\n Imported energy: "+str(ambient_data[1]) + \
-        "\n Year: "+str(datetime.datetime.now().year-ambient_data[2])
-    fig.text(0.01, 0.99, text_str, fontsize=8, verticalalignment='top',
-             bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-    # Adding nodes
-    for i, node in enumerate(nodes):
-        try:
-            power_bought = node.queue.get_nowait()
-        except qu.Empty:
-            return
-        if(power_bought > 0):
-            power_bought_list.append("red")
-        else:
-            power_bought_list.append("green")
-        size_list.append(node.inhabs*100)
-        node_tags.append(str(i))
-        G.add_node(str(i))
-
-    # Adding edges
-    weights = []
-    for i, node1 in enumerate(nodes):
-        for j, node2 in enumerate(nodes):
-            G.add_edge(node_tags[i], node_tags[j])
-            weights.append(0)
-    pos = nx.spring_layout(G)
-
-    nodes = nx.draw_networkx_nodes(
-        G,
-        pos,
-        node_size=size_list,
-        node_color=power_bought_list)
-
-    edges = nx.draw_networkx_edges(
-        G,
-        pos,
-        arrowstyle="->",
-        arrowsize=20,
-        edge_color=weights,
-        edge_cmap=plt.cm.Blues,
-        width=2,
-        connectionstyle='arc3, rad = 0.1'
-    )
 
-    def animate(frame):
-        try:
-            actions = queue.get_nowait()
-        except qu.Empty:
-            return
-        fig.clear()
-        actions = np.array(actions)
-        # Updating nodes
-        for i, node in enumerate(buildings):
-            try:
-                power_bought = node.queue.get_nowait()
-            except qu.Empty:
-                return
-            if(power_bought > 0):
-                power_bought_list[i] = "red"
-            else:
-                power_bought_list[i] = "green"
-        # Updating edges
-        weights_as_string = {}
-        weight_index = 0
-        for i in range(actions.shape[0]):
-            for j in range(actions.shape[1]):
-                weights[weight_index] = actions[i][j]
-                weights_as_string[(node_tags[i], node_tags[j])] = str(
-                    weights[weight_index])
-                weight_index += 1
-        nodes = nx.draw_networkx_nodes(
+def info_text(frame: dict) -> str:
+    """The text of the info box
+
+    Args:
+        frame (dict): the telemetry frame
+
+    Returns:
+        str: hour, night, imported energy and year of the frame
+    """
+    return "Hour: "+str(frame['hour']) + \
+        "\nNight: "+str(frame['night']) + \
+        "\nImported energy: "+str(frame['imported']) + \
+        "\nYear: " + str(datetime.datetime.now().year-frame['year_offset'])
+
+
+class VillagePlot:
+    """The village graph drawn once into an axes, every frame only updates colors, edge widths and texts
+
+    Args:
+        fig (Figure): the figure
+        ax (_type_): the axes to draw into
+        inhabs (list): inhabitants per building
+        topology (Topology, optional): lines the actions belong to. Defaults to every building connected with every other one.
+        action_shares (_type_, optional): share of the power every discrete action sends, e.g. (0.0, 1.0, 0.5).
+            Defaults to the actions scaled by the largest action of the step.
+    """
+
+    def __init__(self, fig: Figure, ax, inhabs: list, topology=None, action_shares=None):
+        if(topology is None):
+            topology = Topology(len(inhabs))
+        if(action_shares is not None):
+            action_shares = np.asarray(action_shares, dtype=np.float64)
+        self.action_shares = action_shares
+        ax.set_axis_off()
+        G = nx.MultiDiGraph()
+        node_tags = [str(i) for i in range(len(inhabs))]
+        G.add_nodes_from(node_tags)
+        edge_list = [(node_tags[s_index], node_tags[d_index])
+                     for s_index, d_index in zip(topology.sources, topology.destinations)]
+        G.add_edges_from(edge_list)
+        # the layout is computed once, the graph never changes
+        pos = nx.spring_layout(G, seed=0)
+        self.red_green = np.array([matplotlib.colors.to_rgba("green"),
+                                   matplotlib.colors.to_rgba("red")])
+        self.node_collection = nx.draw_networkx_nodes(
             G,
             pos,
-            node_size=size_list,
-            node_color=power_bought_list)
-
-        edges = nx.draw_networkx_edges(
+            ax=ax,
+            node_size=[inhab*100 for inhab in inhabs],
+            node_color=[self.red_green[0]] * len(inhabs))
+        self.edge_patches = nx.draw_networkx_edges(
             G,
             pos,
+            ax=ax,
+            edgelist=edge_list,
             arrowstyle="->",
             arrowsize=20,
-            edge_color=weights,
-            edge_cmap=plt.cm.Blues,
-            width=2,
+            edge_color=[plt.cm.Blues(0.0)] * len(edge_list),
+            width=MIN_EDGE_WIDTH,
             connectionstyle='arc3, rad = 0.1')
+        # plain texts at a fixed position, the edge labels of networkx recompute their angle on every draw
+        self.edge_labels = [ax.text(*(pos[source]*(1-LABEL_POS) + pos[destination]*LABEL_POS), "0", fontsize=8,
+                                    family='sans-serif', color="red", ha='center', va='center')
+                            for source, destination in edge_list]
+        nx.draw_networkx_labels(G, pos, ax=ax, font_family='sans-serif')
+        fig.colorbar(matplotlib.cm.ScalarMappable(
+            norm=matplotlib.colors.Normalize(0.0, 1.0), cmap=plt.cm.Blues), ax=ax)
+        self.text = ax.text(0.01, 0.99, "", transform=ax.transAxes, fontsize=8, verticalalignment='top',
+                            bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+        self.artists = [self.node_collection, self.text] + \
+            list(self.edge_patches) + self.edge_labels
+
+    def update(self, frame: dict) -> list:
+        """Shows a telemetry frame
+
+        Args:
+            frame (dict): the frame
+
+        Returns:
+            list: the changed artists
+        """
+        self.node_collection.set_facecolor(
+            self.red_green[(frame['bought'] > 0).astype(np.int64)])
+        actions = frame['actions']
+        if(self.action_shares is not None):
+            shares = self.action_shares[actions.astype(np.int64)]
+        else:
+            largest = np.max(np.abs(actions)) if len(actions) > 0 else 0.0
+            shares = np.abs(actions) / largest if largest > 0 else np.zeros(len(actions))
+        colors = plt.cm.Blues(shares)
+        for patch, label, color, share, action in zip(self.edge_patches, self.edge_labels, colors, shares, actions):
+            patch.set_color(color)
+            patch.set_linewidth(MIN_EDGE_WIDTH + share *
+                                (MAX_EDGE_WIDTH - MIN_EDGE_WIDTH))
+            label.set_text('%g' % action)
+        self.text.set_text(info_text(frame))
+        return self.artists
+
+
+def create_plot(nodes: Building, telemetry: Telemetry, topology=None, action_shares=None, fps=TARGET_FPS):
+    """Renders the steps of the environment in a window until it is closed.
+    Updates the village through blitting, waits for the next step instead of polling and draws at most fps frames per second,
+    the steps in between are skipped.
+
+    Args:
+        nodes (Building): the buildings of the environment
+        telemetry (Telemetry): the step telemetry, detached when the window is closed
+        topology (Topology, optional): lines the actions belong to. Defaults to every building connected with every other one.
+        action_shares (_type_, optional): share of the power every discrete action sends, see VillagePlot.
+        fps (int, optional): frames drawn per second at most. Defaults to TARGET_FPS.
+    """
+    try:
+        plot([node.inhabs for node in nodes],
+             telemetry, topology, action_shares, fps)
+    finally:
+        telemetry.detach()
+
+
+def plot(inhabs: list, telemetry: Telemetry, topology=None, action_shares=None, fps=TARGET_FPS):
+    interval = 1.0 / fps
+    fig, ax = plt.subplots()
+    village = VillagePlot(fig, ax, inhabs, topology, action_shares)
+
+    def frames():
+        # blocks until the next step, at most one frame interval so the window stays responsive
+        while True:
+            yield telemetry.get(timeout=interval, latest=True)
+
+    def animate(frame):
+        if(frame is None):
+            return []
+        return village.update(frame)
 
-        nx.draw_networkx_edge_labels(G, pos, edge_labels=weights_as_string,
-                                     label_pos=0.75, font_size=8, font_family='sans-serif', font_color="red")
-
-        labels = nx.draw_networkx_labels(G, pos, font_family='sans-serif')
-        pc = matplotlib.collections.PatchCollection(edges, cmap=plt.cm.Blues)
-        plt.colorbar(pc)
-
-        try:
-            ambient_data = ambient.queue.get_nowait()
-        except qu.Empty:
-            return
-        text_str = "Hour: "+str(ambient_data[0]) + \
-            "\nNight: "+str(ambient.night_hours[ambient_data[0]]) + \
-            "\nImported energy: "+str(ambient_data[1]) + \
-            "\nYear: " + \
-            str(datetime.datetime.now().year-ambient_data[2])
-        fig.text(0.01, 0.99, text_str, fontsize=8, verticalalignment='top',
-                 bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-
-    pc = matplotlib.collections.PatchCollection(edges, cmap=plt.cm.Blues)
-    plt.colorbar(pc)
     ani = animation.FuncAnimation(
-        fig, animate, frames=None, interval=1, repeat=True)
+        fig, animate, frames=frames, interval=interval*1000, blit=True, cache_frame_data=False)
     plt.show()
-    while True:
-        pass
+    return ani
+
+
+def record(telemetry: SharedTelemetry, inhabs: list, path: str, topology=None, action_shares=None, fps=VIDEO_FPS):
+    """Writes every step of the telemetry offscreen as video frame until the environment finishes the telemetry.
+    A path ending with .mp4 is written with ffmpeg, .gif with pillow, any other path is a directory of PNG frames.
+
+    Args:
+        telemetry (SharedTelemetry): the step telemetry of the environment, detached when done
+        inhabs (list): inhabitants per building
+        path (str): the video file or frame directory
+        topology (Topology, optional): lines the actions belong to. Defaults to every building connected with every other one.
+        action_shares (_type_, optional): share of the power every discrete action sends, see VillagePlot.
+        fps (int, optional): frames per second of the video. Defaults to VIDEO_FPS.
+    """
+    try:
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        village = VillagePlot(fig, fig.add_subplot(),
+                              inhabs, topology, action_shares)
+        writer = video_writer(path, fps)
+        if(writer is None):
+            os.makedirs(path, exist_ok=True)
+            index = 0
+            frame = telemetry.get()
+            while frame is not None:
+                village.update(frame)
+                fig.savefig(os.path.join(path, "frame_%06d.png" %
+                            index), dpi=VIDEO_DPI)
+                index += 1
+                frame = telemetry.get()
+        else:
+            with writer.saving(fig, path, VIDEO_DPI):
+                frame = telemetry.get()
+                while frame is not None:
+                    village.update(frame)
+                    writer.grab_frame()
+                    frame = telemetry.get()
+    finally:
+        telemetry.detach()
+        telemetry.close()
+
+
+def record_process(telemetry_spec: dict, *args):
+    """Entry point of the renderer process, attaches to the telemetry of the environment and records it, see record"""
+    record(SharedTelemetry.attach_to(telemetry_spec), *args)
+
+
+def video_writer(path: str, fps: int):
+    """Returns the matplotlib writer of a video path
+
+    Args:
+        path (str): the video file or frame directory
+        fps (int): frames per second of the video
+
+    Returns:
+        _type_: the writer, None for a directory of PNG frames
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if(extension == ".mp4"):
+        if(not animation.writers.is_available("ffmpeg")):
+            raise RuntimeError(
+                "Writing " + path + " requires ffmpeg, write PNG frames into a directory instead")
+        return animation.FFMpegWriter(fps=fps)
+    if(extension == ".gif"):
+        return animation.PillowWriter(fps=fps)
+    return None
+
+
+class VideoRenderer:
+    """Renders the steps of an environment offscreen in a separate process, which writes a video or PNG frames.
+    The environment writes its steps into a SharedTelemetry and never waits for the renderer,
+    so stepping does not compete with matplotlib for the GIL.
+
+    Args:
+        inhabs (list): inhabitants per building
+        n_actions (int): amount of actions per step
+        path (str): the video file or frame directory, see record
+        topology (Topology, optional): lines the actions belong to. Defaults to every building connected with every other one.
+        action_shares (_type_, optional): share of the power every discrete action sends, see VillagePlot.
+        fps (int, optional): frames per second of the video. Defaults to VIDEO_FPS.
+    """
+
+    def __init__(self, inhabs: list, n_actions: int, path: str, topology=None, action_shares=None, fps=VIDEO_FPS):
+        # fails before the process starts if the video can not be written
+        video_writer(path, fps)
+        frame_bytes = frame_length(len(inhabs), n_actions) * 8
+        capacity = max(
+            2, min(VIDEO_BUFFER_FRAMES, VIDEO_BUFFER_BYTES // frame_bytes))
+        self.path = path
+        self.telemetry = SharedTelemetry.create(
+            len(inhabs), n_actions, capacity)
+        # attached before the process starts, so no step is missed
+        self.telemetry.attach()
+        # spawned, forking a process that already runs the prefetch thread or torch threads can deadlock the child.
+        # Scripts rendering videos have to guard their main module, like ExecuteBaseline
+        self.process = multiprocessing.get_context("spawn").Process(
+            target=record_process, args=(self.telemetry.spec, list(inhabs), path, topology, action_shares, fps),
+            name="micro-grid-renderer", daemon=True)
+        self.process.start()
+
+    def write(self, *frame):
+        """Writes the frame of a step, see Telemetry.write"""
+        self.telemetry.write(*frame)
+
+    def get_stats(self) -> dict:
+        """Returns the counters of the telemetry, see Telemetry.get_stats"""
+        return self.telemetry.get_stats()
+
+    def close(self):
+        """Waits until the renderer wrote all pending steps and frees the telemetry
+        """
+        self.telemetry.finish()
+        self.process.join()
+        self.telemetry.close()
@@ -1,53 +1,212 @@
-from bokeh.models.axes import LinearAxis
-from bokeh.plotting import figure, show, save, output_file
+import argparse
+import fnmatch
+import glob
+import os
+from bokeh.plotting import figure, save, output_file
 from bokeh.io import curdoc
 from bokeh.models.tools import HoverTool, BoxZoomTool, ResetTool, PanTool, WheelZoomTool, SaveTool, ZoomInTool, ZoomOutTool
-from bokeh.models import BoxAnnotation, LinearAxis, Range1d
+from bokeh.palettes import Category10_10, Turbo256
+import numpy as np
 import pandas as pd
 
-db_10_000 = pd.read_csv("trained_csv/model_10_000.csv")
-db_25_000 = pd.read_csv("trained_csv/model_25_000.csv")
-db_75_000 = pd.read_csv("trained_csv/model_75_000.csv")
-db_125_000 = pd.read_csv("trained_csv/model_125_000.csv")
-db_250_000 = pd.read_csv("trained_csv/model_250_000.csv")
-db_500_000 = pd.read_csv("trained_csv/model_500_000.csv")
-db_750_000 = pd.read_csv("trained_csv/model_750_000.csv")
-db_random = pd.read_csv("trained_csv/random.csv")
-
-#Konfigurieren und Erstellen des Plots
-curdoc().theme = "light_minimal"
-wheel_zoom_tool = WheelZoomTool()
-
-plot = figure(title="Trained Model comparison",
-sizing_mode="stretch_both",
-x_axis_label='Episode',
-y_axis_label='Reward-Sum in episode',
-tools=[HoverTool(), BoxZoomTool(), ResetTool(), PanTool(), wheel_zoom_tool, SaveTool(), ZoomOutTool(dimensions="height"), ZoomInTool(dimensions="height")],
-tooltips="Datenpunkt @x hat den Wert @y")
-
-x = []
-y = []
-index = 0
-for reward in db_10_000['model_sum_rewards']:
-    x.append(index)
-    y.append(db_10_000['model_sum_rewards'].iloc[index])
-    index+=1
-
-#Hauptkurve
-plot.line(x,db_10_000["model_sum_rewards"], line_width=4, legend_label="Model 10_000", line_color="blue")
-plot.line(x,db_25_000["model_sum_rewards"], line_width=4, legend_label="Model 25_000", line_color="yellow")
-plot.line(x,db_75_000["model_sum_rewards"], line_width=4, legend_label="Model 75_000", line_color="green")
-plot.line(x,db_125_000["model_sum_rewards"], line_width=4, legend_label="Model 125_000", line_color="purple")
-plot.line(x,db_250_000["model_sum_rewards"], line_width=4, legend_label="Model 250_000", line_color="black")
-plot.line(x,db_500_000["model_sum_rewards"], line_width=4, legend_label="Model 500_000", line_color="brown")
-plot.line(x,db_750_000["model_sum_rewards"], line_width=4, legend_label="Model 750_000", line_color="orange")
-plot.line(x,db_random["random_sum_rewards"], line_width=4, legend_label="Random", line_color="red")
-
-plot.legend.location = "top_left"
-plot.legend.click_policy = "hide"
-plot.legend.label_text_font = "sans-serif"
-plot.legend.label_text_font_size = "10pt"
-
-plot.axis.axis_label_text_font_size = "30pt"
-
-save(plot)
\ No newline at end of file
+## PARAMETERS ##
+RESULTS = "trained_csv"
+OUTPUT = "Plotter/Plotter.html"
+# earlier evaluations kept next to the current ones
+EXCLUDE = "*_old.*"
+# points per line sent to the browser, longer series are downsampled with LTTB
+MAX_POINTS = 2000
+# episode plots the reward sum of every episode, step the cumulative reward of every step
+SERIES = ("episode", "step")
+# suffixes of the columns of the ExecuteBaseline and EvaluateModels results, e.g. model_rewards and random_sum_rewards
+STEP_SUFFIX = "_rewards"
+EPISODE_SUFFIX = "_sum_rewards"
+TABLE_EXTENSIONS = (".csv", ".parquet")
+
+
+def discover(paths: list, exclude: str) -> list:
+    """Finds the result files of the given files, directories and glob patterns.
+    A directory stands for its csv, parquet and npz files, a directory of trajectory chunks is a result itself.
+
+    Args:
+        paths (list): files, directories and glob patterns
+        exclude (str): pattern of file names to skip
+
+    Returns:
+        list: the result files and trajectory directories, sorted
+    """
+    found = set()
+    for pattern in paths:
+        for path in (glob.glob(pattern) if glob.has_magic(pattern) else [pattern]):
+            if(os.path.isdir(path) and len(glob.glob(os.path.join(path, "chunk_*.npz"))) == 0):
+                found.update(result for extension in TABLE_EXTENSIONS + (".npz",)
+                             for result in glob.glob(os.path.join(path, "*" + extension)))
+            else:
+                found.add(path)
+    return sorted(path for path in found if not fnmatch.fnmatch(os.path.basename(path), exclude))
+
+
+def read_columns(path: str, columns=None) -> pd.DataFrame:
+    """Reads columns of a csv or parquet file
+
+    Args:
+        path (str): the file
+        columns (list, optional): the columns to read. Defaults to only the header.
+
+    Returns:
+        pd.DataFrame: the columns, empty if columns is None
+    """
+    if(path.endswith(".parquet")):
+        # parquet needs pyarrow or fastparquet, only the requested columns are read from disk
+        if(columns is None):
+            import pyarrow.parquet
+            return pd.DataFrame(columns=pyarrow.parquet.read_schema(path).names)
+        return pd.read_parquet(path, columns=columns)
+    if(columns is None):
+        return pd.read_csv(path, nrows=0)
+    return pd.read_csv(path, usecols=columns)
+
+
+def load_series(path: str, series: str) -> np.ndarray:
+    """Loads the rewards of a result, only the column that is plotted is read
+
+    Args:
+        path (str): csv or parquet file of ExecuteBaseline or EvaluateModels, npz of the EvaluateModels cache
+            or directory of a recorded trajectory
+        series (str): one of SERIES
+
+    Returns:
+        np.ndarray: the reward sum per episode or the reward per step
+    """
+    if(os.path.isdir(path)):
+        from micro_grid.envs.TrajectoryRecorder import load_trajectory
+        trajectory = load_trajectory(path, columns=["episode", "reward"])
+        if(series == "step"):
+            return trajectory['reward']
+        episodes = trajectory['episode'] - np.min(trajectory['episode'])
+        return np.bincount(episodes, weights=trajectory['reward'])
+    if(path.endswith(".npz")):
+        with np.load(path) as cached:
+            rewards = cached['rewards']
+        if(series == "step"):
+            return rewards.ravel()
+        return np.sum(rewards, axis=1, dtype=np.float64)
+    suffix = STEP_SUFFIX if series == "step" else EPISODE_SUFFIX
+    names = [name for name in read_columns(path).columns if name.endswith(suffix) and
+             not (series == "step" and name.endswith(EPISODE_SUFFIX))]
+    if(len(names) == 0):
+        raise ValueError(path + " has no column ending with " + suffix)
+    # the reward log of ExecuteBaseline holds the model and the random rewards, the model is plotted
+    name = next((name for name in names if not name.startswith("rnd")), names[0])
+    # the summary columns are shorter than the rewards, the rows after the last episode are empty
+    return read_columns(path, [name])[name].dropna().to_numpy()
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> tuple:
+    """Downsamples a line with Largest-Triangle-Three-Buckets, which keeps peaks and the shape of the line.
+    The first and the last point are kept, from every bucket in between the point that spans the largest triangle
+    with the point chosen before and the mean of the next bucket.
+
+    Args:
+        x (np.ndarray): x values, ascending
+        y (np.ndarray): y values
+        n_out (int): amount of points to keep
+
+    Returns:
+        tuple: the kept x and y values
+    """
+    n = len(x)
+    if(n_out >= n or n_out < 3):
+        return x, y
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # n_out - 2 buckets between the first and the last point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.zeros(n_out, dtype=np.int64)
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        mean_x = np.mean(x[end:next_end])
+        mean_y = np.mean(y[end:next_end])
+        areas = np.abs((x[previous] - mean_x) * (y[start:end] - y[previous]) -
+                       (x[previous] - x[start:end]) * (mean_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return x[selected], y[selected]
+
+
+def result_labels(paths: list) -> list:
+    """Returns the legend label of every result, the file name and if it is not unique also its directory"""
+    names = [os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+             for path in paths]
+    return [name if names.count(name) == 1 else
+            os.path.basename(os.path.dirname(os.path.abspath(path))) + "/" + name
+            for path, name in zip(paths, names)]
+
+
+def plot(paths: list, series: str, max_points: int, output: str):
+    """Plots the rewards of the results into a html file
+
+    Args:
+        paths (list): the results, see load_series
+        series (str): one of SERIES
+        max_points (int): points per line at most
+        output (str): the html file
+    """
+    #Konfigurieren und Erstellen des Plots
+    curdoc().theme = "light_minimal"
+    wheel_zoom_tool = WheelZoomTool()
+    output_file(output, title="Trained Model comparison")
+    plot = figure(title="Trained Model comparison",
+                  sizing_mode="stretch_both",
+                  x_axis_label='Episode' if series == "episode" else 'Step',
+                  y_axis_label='Reward-Sum in episode' if series == "episode" else 'Cumulative reward',
+                  tools=[HoverTool(), BoxZoomTool(), ResetTool(), PanTool(), wheel_zoom_tool, SaveTool(),
+                         ZoomOutTool(dimensions="height"), ZoomInTool(dimensions="height")],
+                  tooltips="Datenpunkt @x hat den Wert @y")
+    palette = Category10_10 if len(paths) <= len(Category10_10) else \
+        [Turbo256[int(index)] for index in np.linspace(0, 255, len(paths))]
+    for path, label, color in zip(paths, result_labels(paths), palette):
+        y = load_series(path, series)
+        if(series == "step"):
+            y = np.cumsum(y, dtype=np.float64)
+        x, y = lttb(np.arange(len(y)), y, max_points)
+        plot.line(x, y, line_width=4, legend_label=label, line_color=color)
+
+    plot.legend.location = "top_left"
+    plot.legend.click_policy = "hide"
+    plot.legend.label_text_font = "sans-serif"
+    plot.legend.label_text_font_size = "10pt"
+
+    plot.axis.axis_label_text_font_size = "30pt"
+
+    save(plot)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="Plotter.py", usage="python Plotter/Plotter.py",
+        description="Plots the rewards of any number of evaluation results into an interactive html file.")
+    parser.add_argument("paths", nargs="*", default=[RESULTS],
+                        help="Result files, directories or glob patterns: csv or parquet files of ExecuteBaseline and EvaluateModels, "
+                             "npz files of the EvaluateModels cache and directories of recorded trajectories. Default: trained_csv.")
+    parser.add_argument("--series", choices=SERIES, default="episode",
+                        help="episode plots the reward sum of every episode, step the cumulative reward of every step. Default: episode.")
+    parser.add_argument("--exclude", default=EXCLUDE,
+                        help="Pattern of file names to skip. Default: *_old.*, the earlier evaluations.")
+    parser.add_argument("-p", "--points", type=int, default=MAX_POINTS,
+                        help="Points per line at most, longer lines are downsampled. Default: 2000.")
+    parser.add_argument("-o", "--output", default=OUTPUT,
+                        help="The html file. Default: Plotter/Plotter.html.")
+    args = parser.parse_args()
+    paths = discover(args.paths, args.exclude)
+    if(len(paths) == 0):
+        raise FileNotFoundError("There is no result in " +
+                                " ".join(args.paths))
+    plot(paths, args.series, args.points, args.output)
+
+
+if __name__ == "__main__":
+    main()
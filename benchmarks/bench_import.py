@@ -0,0 +1,65 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+
+## PARAMETERS ##
+ENV_IDS = ("micro-v0", "micro-v1", "micro-v2", "micro_minimal-v0")
+# dependencies that are only imported when they are used, e.g. matplotlib on render and meteostat on a weather cache miss
+DEFERRED_MODULES = ("matplotlib", "networkx", "pysolar",
+                    "meteostat", "tzwhere", "torch", "pandas", "Monitor")
+# imports an environment like gym.make and reports the import time and the deferred modules that were imported anyway
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import gym
+gym_time = time.perf_counter() - start
+import micro_grid
+from gym.envs.registration import load
+load(gym.spec(sys.argv[1]).entry_point)
+total = time.perf_counter() - start
+print(json.dumps({'gym_s': gym_time, 'total_s': total,
+                  'deferred': [name for name in sys.argv[2:] if name in sys.modules]}))
+"""
+
+
+def time_import(env_id: str) -> dict:
+    """Imports the environment of an id in a fresh interpreter
+
+    Returns:
+        dict: seconds to import gym, seconds to import gym and the environment and the deferred modules that were imported
+    """
+    completed = subprocess.run([sys.executable, "-W", "ignore", "-c", IMPORT_SCRIPT, env_id] + list(DEFERRED_MODULES),
+                               capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="bench_import.py", usage="python benchmarks/bench_import.py",
+        description="Measures how long importing every environment takes in a fresh interpreter "
+                    "and fails if an environment imports a dependency that should only be imported when it is used.")
+    parser.add_argument("--env-ids", nargs="+", default=list(ENV_IDS), choices=ENV_IDS,
+                        help="Environment ids. Default: all.")
+    parser.add_argument("-n", "--runs", type=int, default=5,
+                        help="Imports per environment, the median is reported. Default: 5.")
+    args = parser.parse_args()
+    failures = []
+    for env_id in args.env_ids:
+        runs = [time_import(env_id) for _ in range(args.runs)]
+        total = np.median([run['total_s'] for run in runs])
+        own = np.median([run['total_s'] - run['gym_s'] for run in runs])
+        deferred = runs[0]['deferred']
+        print(f"{env_id:18s} import {total*1000:8.1f} ms, without gym {own*1000:8.1f} ms"
+              + ("" if len(deferred) == 0 else ", imported " + " ".join(deferred)))
+        if(len(deferred) > 0):
+            failures.append(env_id)
+    if(len(failures) > 0):
+        raise SystemExit("deferred dependencies imported by " +
+                         ", ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import os
+import random
+import tempfile
+import tracemalloc
+import numpy as np
+from micro_grid.envs.v2.WeatherCache import CACHE_DIR_ENV, OFFLINE_ENV
+from fixtures import create_weather_cache
+
+
+def count_numpy_blocks() -> int:
+    """Counts the numpy data blocks that are alive and traced"""
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.DomainFilter(True, np.lib.tracemalloc_domain)])
+    return sum(stat.count for stat in snapshot.statistics("filename"))
+
+
+def count_allocations(call, calls: int) -> float:
+    """Calls a function and keeps every observation it returns alive,
+    so every observation array that is allocated shows up as numpy data block
+
+    Returns:
+        float: numpy data blocks that were allocated per call and are still alive
+    """
+    call()
+    kept = []
+    tracemalloc.start()
+    before = count_numpy_blocks()
+    for _ in range(calls):
+        kept.append(call())
+    after = count_numpy_blocks()
+    tracemalloc.stop()
+    return (after - before) / calls
+
+
+def create_envs() -> dict:
+    """Creates one of every environment with observation buffers"""
+    from micro_grid.envs.Grid_env_3 import Grid_env_3
+    from micro_grid.envs.Grid_env_minimal import Grid_env_minimal
+    envs = {"micro-v2 array": Grid_env_3(engine="array"), "micro-v2 object": Grid_env_3(engine="object"),
+            "micro_minimal-v0": Grid_env_minimal()}
+    try:
+        from micro_grid.envs.Grid_env_batched import Grid_env_batched
+    except ImportError:
+        print("stable-baselines3 is not installed, skipping Grid_env_batched")
+    else:
+        envs["batched (64 envs)"] = Grid_env_batched(64, seed=0)
+    return envs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="bench_observation.py", usage="python benchmarks/bench_observation.py",
+        description="Counts the observation arrays that get_state and step allocate per call.")
+    parser.add_argument("-n", "--calls", type=int, default=200,
+                        help="Calls per environment. Default: 200.")
+    args = parser.parse_args()
+    cache = create_weather_cache(tempfile.mkdtemp())
+    os.environ[CACHE_DIR_ENV] = cache.cache_dir
+    os.environ[OFFLINE_ENV] = "1"
+    random.seed(0)
+    allocating = []
+    for name, env in create_envs().items():
+        env.reset()
+        action = np.zeros((getattr(env, "num_envs", 1),) + env.action_space.shape,
+                          dtype=np.int64)
+        if(not hasattr(env, "num_envs")):
+            action = action[0]
+        get_state = count_allocations(env.get_state, args.calls)
+        step = count_allocations(lambda: env.step(action)[0], args.calls)
+        print(f"{name:18s}: {get_state:5.2f} arrays per get_state, {step:5.2f} arrays per step")
+        # a new observation per call shows up as one block per call, fractions are numpy internals
+        if(get_state >= 0.5 or step >= 0.5):
+            allocating.append(name)
+        env.close()
+    if(allocating):
+        raise SystemExit("observations are allocated by " +
+                         ", ".join(allocating))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+import numpy as np
+from micro_grid.envs.v2.WeatherCache import CACHE_DIR_ENV, OFFLINE_ENV
+from fixtures import create_building_config, create_weather_cache
+
+## PARAMETERS ##
+ENGINES = ("object", "array")
+
+
+def run_env(engine: str, profile: bool, steps: int, resets: int, seed: int):
+    """Resets and steps a Grid_env_3 with random actions
+
+    Returns:
+        tuple: mean step latency in seconds and the environment, closed
+    """
+    from micro_grid.envs.Grid_env_3 import Grid_env_3
+    random.seed(seed)
+    env = Grid_env_3(engine=engine, profile=profile)
+    rng = np.random.default_rng(seed)
+    for _ in range(resets):
+        env.reset()
+    start = time.perf_counter()
+    for _ in range(steps):
+        _, _, done, _ = env.step(rng.integers(0, 3, env.action_space.shape))
+        if(done):
+            env.reset()
+    latency = (time.perf_counter() - start) / steps
+    env.close()
+    return latency, env
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="bench_profile.py", usage="python benchmarks/bench_profile.py",
+        description="Prints where step and reset of Grid_env_3 spend their time and what profiling costs.")
+    parser.add_argument("-b", "--buildings", type=int, default=100,
+                        help="Building count. Default: 100.")
+    parser.add_argument("-n", "--steps", type=int, default=2000,
+                        help="Steps per run. Default: 2000.")
+    parser.add_argument("-r", "--resets", type=int, default=3,
+                        help="Resets before stepping. Default: 3.")
+    parser.add_argument("-e", "--engine", choices=ENGINES, default="array",
+                        help="Engine of the environment. Default: array.")
+    args = parser.parse_args()
+    cache = create_weather_cache(tempfile.mkdtemp())
+    os.environ[CACHE_DIR_ENV] = cache.cache_dir
+    os.environ[OFFLINE_ENV] = "1"
+    cwd = os.getcwd()
+    try:
+        # Grid_env_3 reads the config of the working directory
+        os.chdir(tempfile.mkdtemp())
+        create_building_config(os.getcwd(), args.buildings)
+        plain, _ = run_env(args.engine, False, args.steps, args.resets, 0)
+        profiled, env = run_env(args.engine, True,
+                                args.steps, args.resets, 0)
+    finally:
+        os.chdir(cwd)
+    print(env.profiler.format())
+    print(f"step without profile {plain*1e6:9.2f} us, with profile {profiled*1e6:9.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import random
+import tempfile
+import time
+import numpy as np
+from micro_grid.envs.v2.Ambient2 import Ambient
+from micro_grid.envs.v2 import SolarPosition
+from fixtures import create_weather_cache
+
+## PARAMETERS ##
+PRICE_FLUCTUATION = 0.5
+TOTAL_DAYS = 365.25
+
+
+def time_resets(ambient: Ambient, resets: int) -> float:
+    """Returns the mean reset latency in seconds"""
+    start = time.perf_counter()
+    for _ in range(resets):
+        ambient.reset()
+    return (time.perf_counter() - start) / resets
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="bench_reset.py", usage="python benchmarks/bench_reset.py",
+        description="Compares the ambient reset latency of the pysolar and the numpy solar backend.")
+    parser.add_argument("-n", "--resets", type=int, default=3,
+                        help="Resets per backend. Default: 3.")
+    args = parser.parse_args()
+    cache = create_weather_cache(tempfile.mkdtemp())
+    ambients = {}
+    for backend in ("pysolar", "numpy"):
+        random.seed(0)
+        ambients[backend] = Ambient(
+            TOTAL_DAYS, PRICE_FLUCTUATION, weather_cache=cache, solar_backend=backend)
+        latency = time_resets(ambients[backend], args.resets)
+        print(f"{backend:8s} reset: {latency*1000:10.1f} ms")
+    # same seed, so both ambients simulate the same year
+    difference = np.max(np.abs(np.asarray(ambients["pysolar"].sun_beams) -
+                               np.asarray(ambients["numpy"].sun_beams)))
+    night_mismatches = np.count_nonzero(np.asarray(
+        ambients["pysolar"].night_hours) != ambients["numpy"].night_hours)
+    print(f"max sunbeam difference: {difference:.3g} w/m^2 (tolerance {SolarPosition.TOLERANCE:g}), night mismatches: {night_mismatches}")
+    if(difference > SolarPosition.TOLERANCE or night_mismatches > 0):
+        raise SystemExit("numpy backend deviates from pysolar")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+import numpy as np
+from micro_grid.envs.v2.WeatherCache import CACHE_DIR_ENV, OFFLINE_ENV
+from fixtures import create_building_config, create_weather_cache
+
+## PARAMETERS ##
+ENGINES = ("object", "array")
+
+
+def run_engine(engine: str, steps: int, seed: int) -> tuple:
+    """Steps a Grid_env_3 with random actions
+
+    Returns:
+        tuple: mean step latency in seconds, observations and rewards
+    """
+    from micro_grid.envs.Grid_env_3 import Grid_env_3
+    random.seed(seed)
+    env = Grid_env_3(engine=engine)
+    rng = np.random.default_rng(seed)
+    # the environment rotates between two observation buffers, every kept observation is copied
+    observations = [env.reset().copy()]
+    rewards = []
+    start = time.perf_counter()
+    for _ in range(steps):
+        observation, reward, done, _ = env.step(
+            rng.integers(0, 3, env.action_space.shape))
+        observations.append(observation.copy())
+        rewards.append(reward)
+        if(done):
+            observations.append(env.reset().copy())
+    latency = (time.perf_counter() - start) / steps
+    env.close()
+    return latency, np.array(observations), np.array(rewards)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="bench_step.py", usage="python benchmarks/bench_step.py",
+        description="Compares the step latency of the object and the array engine of Grid_env_3 for growing villages.")
+    parser.add_argument("-b", "--buildings", type=int, nargs="+", default=[10, 100, 300],
+                        help="Building counts. Default: 10 100 300.")
+    parser.add_argument("-n", "--steps", type=int, default=50,
+                        help="Steps per engine. Default: 50.")
+    parser.add_argument("-f", "--feeder", action="store_true",
+                        help="Connects the buildings by the lines of a random tree instead of every building with every other one.")
+    args = parser.parse_args()
+    cache = create_weather_cache(tempfile.mkdtemp())
+    os.environ[CACHE_DIR_ENV] = cache.cache_dir
+    os.environ[OFFLINE_ENV] = "1"
+    cwd = os.getcwd()
+    try:
+        for n_buildings in args.buildings:
+            # Grid_env_3 reads the config of the working directory
+            os.chdir(tempfile.mkdtemp())
+            create_building_config(
+                os.getcwd(), n_buildings, args.feeder)
+            results = {engine: run_engine(engine, args.steps, 0)
+                       for engine in ENGINES}
+            speedup = results["object"][0] / results["array"][0]
+            print(f"{n_buildings:5d} buildings: object {results['object'][0]*1000:9.2f} ms, "
+                  f"array {results['array'][0]*1000:9.2f} ms per step, speedup {speedup:6.1f}x")
+            # same seed, so both engines must simulate the same episode
+            if(not np.array_equal(results["object"][1], results["array"][1]) or
+               not np.array_equal(results["object"][2], results["array"][2])):
+                raise SystemExit("array engine deviates from the object engine")
+    finally:
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
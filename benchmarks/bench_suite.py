@@ -0,0 +1,307 @@
+import argparse
+import datetime
+import json
+import multiprocessing as mp
+import os
+import platform
+import queue
+import random
+import resource
+import subprocess
+import tempfile
+import time
+import traceback
+import numpy as np
+from micro_grid.envs.v2.WeatherCache import CACHE_DIR_ENV, OFFLINE_ENV
+from fixtures import create_building_config, create_weather_cache
+
+## PARAMETERS ##
+ENV_IDS = ("micro-v0", "micro-v1", "micro-v2", "micro_minimal-v0")
+# only micro-v2 reads its village from a config, the other versions simulate a fixed village
+CONFIG_ENV_ID = "micro-v2"
+BUILDING_COUNTS = (3, 30, 300, 3000)
+# runs of the vectorized comparison, separate steps n Grid_env_3 one after another like a DummyVecEnv
+VEC_MODES = ("separate", "batched")
+# relative loss of steps per second that counts as regression in a comparison
+REGRESSION_TOLERANCE = 0.1
+# seconds between checks whether the process of a case is still alive
+POLL_INTERVAL = 1.0
+
+
+def read_rss() -> int:
+    """Returns the resident memory of this process in kB, Linux only"""
+    with open("/proc/self/status") as file:
+        for line in file:
+            if(line.startswith("VmRSS:")):
+                return int(line.split()[1])
+    return 0
+
+
+def peak_rss() -> int:
+    """Returns the peak resident memory of this process in kB"""
+    # kB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if platform.system() == "Darwin" else peak
+
+
+def create_env(env_id: str, config_path=None):
+    """Creates the environment of a registered id without the wrappers of gym.make, so only the environment is measured
+
+    Args:
+        env_id (str): the registered id
+        config_path (str, optional): building config, only for micro-v2. Defaults to None.
+
+    Returns:
+        gym.Env: the environment
+    """
+    import gym
+    from gym.envs.registration import load
+    import micro_grid  # registers the ids
+    env_class = load(gym.spec(env_id).entry_point)
+    if(config_path is not None):
+        return env_class(config_path=config_path)
+    return env_class()
+
+
+def measure_env(case: dict) -> dict:
+    """Creates, resets and steps a single environment with random actions
+
+    Args:
+        case (dict): env_id, config_path, steps, resets and seed of the case
+
+    Returns:
+        dict: creation time, reset latency, steps per second and memory of the case
+    """
+    random.seed(case['seed'])
+    rss_before = read_rss()
+    start = time.perf_counter()
+    env = create_env(case['env_id'], case.get('config_path'))
+    create_time = time.perf_counter() - start
+    env.action_space.seed(case['seed'])
+    actions = [env.action_space.sample() for _ in range(case['steps'])]
+    start = time.perf_counter()
+    for _ in range(case['resets']):
+        env.reset()
+    reset_latency = (time.perf_counter() - start) / case['resets']
+    start = time.perf_counter()
+    for action in actions:
+        _, _, done, _ = env.step(action)
+        if(done):
+            env.reset()
+    steps_per_second = case['steps'] / (time.perf_counter() - start)
+    result = {'buildings': len(env.buildings), 'create_s': create_time, 'reset_s': reset_latency,
+              'steps_per_s': steps_per_second, 'rss_growth_kb': read_rss() - rss_before}
+    env.close()
+    return result
+
+
+def measure_vec(case: dict) -> dict:
+    """Steps n micro-v2 villages, either as separate environments one after another or as one Grid_env_batched
+
+    Args:
+        case (dict): mode, n_envs, config_path, steps, resets and seed of the case
+
+    Returns:
+        dict: creation time, reset latency, village steps per second and memory of the case
+    """
+    from micro_grid.envs.Grid_env_3 import Grid_env_3
+    random.seed(case['seed'])
+    n_envs = case['n_envs']
+    rss_before = read_rss()
+    start = time.perf_counter()
+    if(case['mode'] == "batched"):
+        # needs stable-baselines3, the separate run does not
+        from micro_grid.envs.Grid_env_batched import Grid_env_batched
+        envs = [Grid_env_batched(
+            n_envs, seed=case['seed'], config_path=case['config_path'])]
+    else:
+        envs = [Grid_env_3(config_path=case['config_path'])
+                for _ in range(n_envs)]
+    create_time = time.perf_counter() - start
+    rng = np.random.default_rng(case['seed'])
+    shape = (n_envs,) + envs[0].action_space.shape
+    actions = [rng.integers(0, 3, shape) for _ in range(case['steps'])]
+    start = time.perf_counter()
+    for _ in range(case['resets']):
+        for env in envs:
+            env.reset()
+    reset_latency = (time.perf_counter() - start) / case['resets']
+    start = time.perf_counter()
+    for action in actions:
+        if(case['mode'] == "batched"):
+            # resets finished villages itself
+            envs[0].step(action)
+            continue
+        for env, env_action in zip(envs, action):
+            _, _, done, _ = env.step(env_action)
+            if(done):
+                env.reset()
+    steps_per_second = case['steps'] * n_envs / (time.perf_counter() - start)
+    result = {'buildings': case['buildings'], 'create_s': create_time, 'reset_s': reset_latency,
+              'steps_per_s': steps_per_second, 'rss_growth_kb': read_rss() - rss_before}
+    for env in envs:
+        env.close()
+    return result
+
+
+def run_case(case: dict, results: mp.Queue):
+    """Entry point of the process of a case, so every case starts with a fresh interpreter and its own peak memory"""
+    try:
+        measure = measure_vec if "mode" in case else measure_env
+        result = measure(case)
+        result['peak_rss_kb'] = peak_rss()
+    except Exception as error:
+        # e.g. an environment whose dependencies are not installed, the other cases still run
+        result = {'error': repr(error),
+                  'traceback': traceback.format_exc()}
+    results.put(result)
+
+
+def run(case: dict) -> dict:
+    """Runs a case in a spawned process.
+    A process that dies without a result, e.g. killed for running out of memory, is recorded as error of the case.
+
+    Args:
+        case (dict): the case
+
+    Returns:
+        dict: the case together with its measurements
+    """
+    context = mp.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=run_case, args=(case, results))
+    process.start()
+    result = None
+    while(result is None):
+        try:
+            result = results.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            if(not process.is_alive()):
+                # the result may have been put right before the process exited
+                try:
+                    result = results.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    result = {'error': 'exit code %d' % process.exitcode}
+    process.join()
+    return dict(case, **result)
+
+
+def create_cases(args, config_dir: str) -> list:
+    """Returns the cases of the suite, one per environment id, building count of micro-v2 and vectorized run"""
+    cases = []
+    configs = {}
+    for n_buildings in args.buildings:
+        directory = os.path.join(config_dir, str(n_buildings))
+        os.makedirs(directory, exist_ok=True)
+        configs[n_buildings] = create_building_config(
+            directory, n_buildings, args.lines == "feeder")
+    common = {'steps': args.steps, 'resets': args.resets, 'seed': args.seed}
+    for env_id in args.env_ids:
+        if(env_id != CONFIG_ENV_ID):
+            cases.append(dict(common, name=env_id, env_id=env_id))
+            continue
+        for n_buildings, config_path in configs.items():
+            cases.append(dict(common, name="%s/%d" % (env_id, n_buildings), env_id=env_id,
+                              config_path=config_path))
+    for n_envs in args.envs:
+        for n_buildings, config_path in configs.items():
+            for mode in VEC_MODES:
+                cases.append(dict(common, name="%s/%d/%s-%d" % (CONFIG_ENV_ID, n_buildings, mode, n_envs),
+                                  mode=mode, n_envs=n_envs, buildings=n_buildings, config_path=config_path))
+    return cases
+
+
+def git_commit() -> str:
+    """Returns the checked out commit, None outside of a git repository"""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list, baseline_path: str, tolerance: float) -> list:
+    """Prints the change of every case against the results of an earlier run
+
+    Args:
+        results (list): results of this run
+        baseline_path (str): JSON file of an earlier run
+        tolerance (float): relative loss of steps per second that counts as regression
+
+    Returns:
+        list: names of the regressed cases
+    """
+    with open(baseline_path) as file:
+        baseline = {result['name']: result for result in json.load(file)[
+            'results']}
+    regressions = []
+    print("\ncompared with " + baseline_path)
+    for result in results:
+        before = baseline.get(result['name'])
+        if(before is None or 'error' in before or 'error' in result):
+            continue
+        change = result['steps_per_s'] / before['steps_per_s'] - 1
+        flag = ""
+        if(change < -tolerance):
+            regressions.append(result['name'])
+            flag = "  REGRESSION"
+        print(f"{result['name']:32s} steps/s {change*100:+7.1f}%  reset {(result['reset_s']/before['reset_s']-1)*100:+7.1f}%  "
+              f"peak rss {result['peak_rss_kb']-before['peak_rss_kb']:+9d} kB{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="bench_suite.py", usage="python benchmarks/bench_suite.py -o results.json",
+        description="Measures steps per second, reset latency and peak memory of all environment versions, "
+                    "micro-v2 for growing villages and separate against batched environments. "
+                    "Every case runs in its own process, the results are written as JSON to compare commits.")
+    parser.add_argument("--env-ids", nargs="+", default=list(ENV_IDS), choices=ENV_IDS,
+                        help="Environment ids. Default: all.")
+    parser.add_argument("-b", "--buildings", type=int, nargs="+", default=list(BUILDING_COUNTS),
+                        help="Building counts of micro-v2. Default: 3 30 300 3000.")
+    parser.add_argument("-e", "--envs", type=int, nargs="*", default=[8],
+                        help="Environment counts of the vectorized comparison, none skips it. Default: 8.")
+    parser.add_argument("-l", "--lines", choices=("feeder", "mesh"), default="feeder",
+                        help="Lines of the generated villages, mesh connects every building with every other one, "
+                             "which has about 9 million lines for 3000 buildings. Default: feeder.")
+    parser.add_argument("-n", "--steps", type=int, default=500,
+                        help="Steps per case. Default: 500.")
+    parser.add_argument("-r", "--resets", type=int, default=3,
+                        help="Resets per case. Default: 3.")
+    parser.add_argument("-s", "--seed", type=int, default=0,
+                        help="Seed of the actions and the simulated years. Default: 0.")
+    parser.add_argument("-o", "--output", type=str, default=None,
+                        help="Writes the results as JSON into this file. Default only prints them.")
+    parser.add_argument("-c", "--compare", type=str, default=None,
+                        help="JSON results of an earlier run, exits with an error if a case lost more than the tolerance of its steps per second.")
+    parser.add_argument("-t", "--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help="Relative loss of steps per second that counts as regression. Default: 0.1.")
+    args = parser.parse_args()
+    cache = create_weather_cache(tempfile.mkdtemp())
+    # inherited by the processes of the cases
+    os.environ[CACHE_DIR_ENV] = cache.cache_dir
+    os.environ[OFFLINE_ENV] = "1"
+    results = []
+    for case in create_cases(args, tempfile.mkdtemp()):
+        result = run(case)
+        results.append(result)
+        if('error' in result):
+            print(f"{result['name']:32s} failed: {result['error']}")
+            continue
+        print(f"{result['name']:32s} {result['buildings']:6d} buildings  {result['steps_per_s']:10.1f} steps/s  "
+              f"reset {result['reset_s']*1000:9.2f} ms  peak rss {result['peak_rss_kb']/1024:8.1f} MB")
+    report = {'commit': git_commit(), 'date': datetime.datetime.now().isoformat(timespec="seconds"),
+              'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.platform(),
+              'cpus': os.cpu_count(), 'results': results}
+    if(args.output is not None):
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if(args.compare is not None):
+        regressions = compare(results, args.compare, args.tolerance)
+        if(len(regressions) > 0):
+            raise SystemExit("regressions: " + ", ".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+import numpy as np
+from micro_grid.envs.v2.WeatherCache import CACHE_DIR_ENV, OFFLINE_ENV
+from fixtures import create_weather_cache
+
+
+def time_separate(n_envs: int, steps: int) -> float:
+    """Steps separate Grid_env_3 environments one after another, like a DummyVecEnv
+
+    Returns:
+        float: mean latency of a step of all environments in seconds
+    """
+    from micro_grid.envs.Grid_env_3 import Grid_env_3
+    random.seed(0)
+    envs = [Grid_env_3() for _ in range(n_envs)]
+    for env in envs:
+        env.reset()
+    rng = np.random.default_rng(0)
+    actions = rng.integers(0, 3, (steps, n_envs) + envs[0].action_space.shape)
+    start = time.perf_counter()
+    for step in range(steps):
+        for env, action in zip(envs, actions[step]):
+            _, _, done, _ = env.step(action)
+            if(done):
+                env.reset()
+    latency = (time.perf_counter() - start) / steps
+    for env in envs:
+        env.close()
+    return latency
+
+
+def time_batched(n_envs: int, steps: int) -> float:
+    """Steps all environments at once with Grid_env_batched
+
+    Returns:
+        float: mean latency of a step of all environments in seconds
+    """
+    from micro_grid.envs.Grid_env_batched import Grid_env_batched
+    env = Grid_env_batched(n_envs, seed=0)
+    env.reset()
+    rng = np.random.default_rng(0)
+    actions = rng.integers(0, 3, (steps, n_envs) + env.action_space.shape)
+    start = time.perf_counter()
+    for step in range(steps):
+        env.step(actions[step])
+    latency = (time.perf_counter() - start) / steps
+    env.close()
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="bench_vec_env.py", usage="python benchmarks/bench_vec_env.py",
+        description="Compares stepping separate Grid_env_3 environments with stepping one Grid_env_batched.")
+    parser.add_argument("-e", "--envs", type=int, nargs="+", default=[1, 8, 64],
+                        help="Environment counts. Default: 1 8 64.")
+    parser.add_argument("-n", "--steps", type=int, default=200,
+                        help="Steps per run. Default: 200.")
+    args = parser.parse_args()
+    cache = create_weather_cache(tempfile.mkdtemp())
+    os.environ[CACHE_DIR_ENV] = cache.cache_dir
+    os.environ[OFFLINE_ENV] = "1"
+    for n_envs in args.envs:
+        separate = time_separate(n_envs, args.steps)
+        batched = time_batched(n_envs, args.steps)
+        print(f"{n_envs:4d} envs: separate {separate*1000:8.3f} ms, batched {batched*1000:8.3f} ms per step, "
+              f"speedup {separate/batched:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
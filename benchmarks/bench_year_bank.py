@@ -0,0 +1,82 @@
+import argparse
+import multiprocessing as mp
+import random
+import tempfile
+from micro_grid.envs.v2.Ambient2 import Ambient
+from micro_grid.envs.v2.YearBank import YearBank
+from fixtures import create_weather_cache
+
+## PARAMETERS ##
+PRICE_FLUCTUATION = 0.5
+TOTAL_DAYS = 365.25
+
+
+def read_memory() -> dict:
+    """Reads resident memory of this process in kB, RssAnon is the private part.
+    Linux only.
+
+    Returns:
+        dict: VmRSS, RssAnon and RssShmem in kB
+    """
+    memory = {}
+    with open("/proc/self/status") as file:
+        for line in file:
+            key, _, value = line.partition(":")
+            if(key in ("VmRSS", "RssAnon", "RssShmem")):
+                memory[key] = int(value.split()[0])
+    return memory
+
+
+def worker(rank: int, cache_dir: str, year_bank, resets: int, results: mp.Queue):
+    """Resets an ambient through many years and reports its memory"""
+    random.seed(rank)
+    cache = create_weather_cache(cache_dir)
+    ambient = Ambient(TOTAL_DAYS, PRICE_FLUCTUATION,
+                      weather_cache=cache, year_bank=year_bank)
+    before = read_memory()
+    for _ in range(resets):
+        ambient.reset()
+    after = read_memory()
+    results.put({key: after[key] - before[key] for key in after})
+    if(year_bank is not None):
+        year_bank.close()
+
+
+def run(workers: int, cache_dir: str, year_bank, resets: int) -> dict:
+    """Runs the workers in spawned processes and averages their memory growth"""
+    context = mp.get_context("spawn")
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(rank, cache_dir, year_bank, resets, results))
+                 for rank in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return {key: sum(report[key] for report in reports) / workers for key in reports[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="bench_year_bank.py", usage="python benchmarks/bench_year_bank.py",
+        description="Compares the per worker memory growth of ambients with and without a shared year bank.")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="Worker counts. Default: 1 2 4 8.")
+    parser.add_argument("-n", "--resets", type=int, default=60,
+                        help="Resets per worker. Default: 60.")
+    args = parser.parse_args()
+    cache_dir = tempfile.mkdtemp()
+    cache = create_weather_cache(cache_dir)
+    bank = YearBank.create(Ambient(TOTAL_DAYS, PRICE_FLUCTUATION, weather_cache=cache))
+    try:
+        for workers in args.workers:
+            for name, year_bank in (("private", None), ("year bank", bank)):
+                memory = run(workers, cache_dir, year_bank, args.resets)
+                print(f"{workers:3d} workers {name:9s}: RSS +{memory['VmRSS']:7.0f} kB, "
+                      f"private +{memory['RssAnon']:7.0f} kB, shared +{memory['RssShmem']:7.0f} kB per worker")
+    finally:
+        bank.close()
+
+
+if __name__ == "__main__":
+    main()
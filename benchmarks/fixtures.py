@@ -0,0 +1,68 @@
+import os
+import numpy as np
+import yaml
+from micro_grid.envs.v2.Ambient2 import LATITUDE, LONGITUDE, candidate_years
+from micro_grid.envs.v2.WeatherCache import WeatherCache
+from micro_grid.envs.v2.TimezoneResolver import location_key, store_timezone
+
+## PARAMETERS ##
+FIXTURE_SEED = 0
+HOURS_PER_YEAR = 8785
+FIXTURE_TIMEZONE = "Europe/Berlin"
+SOURCE_TYPES = ("solar", "wind")
+
+
+def create_weather_cache(cache_dir: str, latitude=LATITUDE, longitude=LONGITUDE) -> WeatherCache:
+    """Fills a weather cache with deterministic synthetic weather for all years the ambient can sample
+    and the timezone of the location, so benchmarks run offline and always see the same data.
+
+    Args:
+        cache_dir (str): directory of the cache
+
+    Returns:
+        WeatherCache: offline cache containing the fixture
+    """
+    cache = WeatherCache(cache_dir, offline=True)
+    rng = np.random.default_rng(FIXTURE_SEED)
+    for year in candidate_years():
+        weather = {'coco': rng.integers(1, 28, HOURS_PER_YEAR).astype(np.float64),
+                   'wspd': rng.gamma(2.0, 7.0, HOURS_PER_YEAR)}
+        if(not cache.contains(latitude, longitude, year)):
+            cache.store(latitude, longitude, year, weather)
+    store_timezone(cache.cache_dir, location_key(
+        latitude, longitude), FIXTURE_TIMEZONE)
+    return cache
+
+
+def create_building_config(config_dir: str, n_buildings: int, feeder=False) -> str:
+    """Writes a config.yml with deterministic random buildings, some without energy sources or battery
+
+    Args:
+        config_dir (str): directory of the config
+        n_buildings (int): amount of buildings
+        feeder (bool, optional): Connects the buildings with the lines of a random tree instead of every building with every other one. Defaults to False.
+
+    Returns:
+        str: path of the config
+    """
+    rng = np.random.default_rng(FIXTURE_SEED)
+    buildings = []
+    for _ in range(n_buildings):
+        energy_sources = None
+        if(rng.random() < 0.6):
+            energy_sources = [{'type': SOURCE_TYPES[rng.integers(len(SOURCE_TYPES))],
+                               'peak_power': round(float(rng.uniform(0.5, 15.0)), 2)}]
+        capacity = 0
+        if(rng.random() < 0.5):
+            capacity = round(float(rng.uniform(5.0, 30.0)), 2)
+        buildings.append({'energy_sources': energy_sources, 'battery': {'capacity': capacity},
+                          'inhabitants': int(rng.integers(1, 4))})
+    config = {'buildings': buildings}
+    if(feeder):
+        # every building is connected to one of the buildings before it
+        config['lines'] = [[int(rng.integers(index)), index]
+                           for index in range(1, n_buildings)]
+    path = os.path.join(config_dir, "config.yml")
+    with open(path, 'w') as file:
+        yaml.safe_dump(config, file)
+    return path
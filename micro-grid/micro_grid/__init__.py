@@ -1,6 +1,6 @@
-from importlib.metadata import entry_points
 from gym.envs.registration import register
-register(id='micro-v0', entry_point='micro_grid.envs:Grid_env',)
-register(id='micro-v1', entry_point='micro_grid.envs:Grid_env_2',)
-register(id='micro-v2', entry_point='micro_grid.envs:Grid_env_3',)
-register(id='micro_minimal-v0', entry_point='micro_grid.envs:Grid_env_minimal')
+# every id points at the module of its environment, so gym.make only imports that environment
+register(id='micro-v0', entry_point='micro_grid.envs.Grid_env:Grid_env',)
+register(id='micro-v1', entry_point='micro_grid.envs.Grid_env_2:Grid_env_2',)
+register(id='micro-v2', entry_point='micro_grid.envs.Grid_env_3:Grid_env_3',)
+register(id='micro_minimal-v0', entry_point='micro_grid.envs.Grid_env_minimal:Grid_env_minimal')
@@ -7,6 +7,7 @@ from micro_grid.envs.v1.Battery import Battery
 from micro_grid.envs.v1.Building import Building
 import numpy as np
 import random
+from micro_grid.envs.ObservationBuffer import ObservationBuffer
 
 ## PARAMETERS ##
 PRICE_FLUCTUATION = 0.5
@@ -31,6 +32,7 @@ class Grid_env(gym.Env):
         self.action_space = spaces.Box(low=0.0, high=500.0, shape=(9,))
         # self.observation_space = spaces.Dict({'ambient': spaces.Box(low=0.0, high=23.0, shape=(3,)), 'buildings': spaces.Box(low=0.0, high=500.0,shape=(3,2))})
         self.observation_space = spaces.Box(low=0.0, high=10_000.0, shape=(9,))
+        self.observations = ObservationBuffer(self.observation_space.shape)
 
     def get_state(self) -> spaces.Box:
         """Generates the environment state consiting of the building states and the ambient state
@@ -38,11 +40,11 @@ class Grid_env(gym.Env):
         Returns:
             spaces.Box: The environment state
         """
-        observations = np.array([])
-        observations = np.append(observations, self.ambient.render())
-        for building in self.buildings:
-            observations = np.append(observations, building.render())
-        return observations.flatten()
+        observations = self.observations.next()
+        observations[:3] = self.ambient.render()
+        for index, building in enumerate(self.buildings):
+            observations[3 + 2*index:5 + 2*index] = building.render()
+        return observations
 
     def reset(self) -> spaces.Box:
         """Resets the Environment
@@ -1,4 +1,3 @@
-import imp
 import gym
 from gym import spaces
 from typing import Tuple
@@ -9,13 +8,17 @@ from micro_grid.envs.v2.Battery2 import Battery
 from micro_grid.envs.v2.Building2 import Building
 import numpy as np
 import random
-import Monitor
-import queue as qu
 import threading
+from collections import deque
+from micro_grid.envs.RunningStats import RunningStats
+from micro_grid.envs.ObservationBuffer import ObservationBuffer
+from micro_grid.envs.Telemetry import Telemetry
 
 ## PARAMETERS ##
 PRICE_FLUCTUATION = 0.5
 TOTAL_DAYS = 365.25
+# bought power of a whole episode, including the 0 before the first step
+HISTORY_LENGTH = int(TOTAL_DAYS*24) + 1
 
 
 class Grid_env_2(gym.Env):
@@ -27,9 +30,9 @@ class Grid_env_2(gym.Env):
     """
 
     def __init__(self):
-        self.total_power_bought = [0]
+        self.total_power_bought = deque([0], maxlen=HISTORY_LENGTH)
+        self.power_bought_stats = RunningStats(0)
         self.metadata = {'render_modes': ["human"]}
-        self.queue = qu.Queue()
         self.ambient = Ambient(TOTAL_DAYS, PRICE_FLUCTUATION)
         self.buildings = [Building([Solar(11.1)], Battery(27.76), 5, self.ambient),
                           Building([Solar(5.55)], Battery(
@@ -42,8 +45,10 @@ class Grid_env_2(gym.Env):
             pow(len(self.buildings), 2),))  # wegnehmen und senden
         self.observation_space = spaces.Box(
             low=0.0, high=10_000.0, shape=(len(self.buildings)*2 + 3,))
-        self.render_thread = threading.Thread(
-            args=(self.buildings, self.queue, self.ambient), target=Monitor.create_plot)
+        self.observations = ObservationBuffer(self.observation_space.shape)
+        # step telemetry, only written while the monitor is attached
+        self.telemetry = Telemetry(
+            len(self.buildings), self.action_space.shape[0])
         self.render_thread = None
 
     def seed(self, seed: int) -> None:
@@ -61,11 +66,11 @@ class Grid_env_2(gym.Env):
         Returns:
             spaces.Box: The environment state
         """
-        observations = np.array([])
-        observations = np.append(observations, self.ambient.render())
-        for building in self.buildings:
-            observations = np.append(observations, building.render())
-        return observations.flatten()
+        observations = self.observations.next()
+        self.ambient.get_state(observations[:3])
+        for index, building in enumerate(self.buildings):
+            observations[3 + 2*index:5 + 2*index] = building.render()
+        return observations
 
     def reset(self) -> spaces.Box:
         """Resets the Environment
@@ -73,10 +78,8 @@ class Grid_env_2(gym.Env):
         Returns:
             spaces.Box: The environment state
         """
-        self.queue = qu.Queue()
-        self.render_thread = threading.Thread(
-            args=(self.buildings, self.queue, self.ambient), target=Monitor.create_plot)
-        self.total_power_bought = [0]
+        self.total_power_bought = deque([0], maxlen=HISTORY_LENGTH)
+        self.power_bought_stats.reset(0)
         self.ambient.reset()
         for building in self.buildings:
             building.reset()
@@ -93,8 +96,8 @@ class Grid_env_2(gym.Env):
         Returns:
             float: The reward, max reward is 110 min is -110
         """
-        mean_cost = np.mean(self.total_power_bought)
-        max_cost = np.max(self.total_power_bought)
+        mean_cost = self.power_bought_stats.mean
+        max_cost = self.power_bought_stats.max
         reward = 0
         if(power_bought > mean_cost):
             reward -= 10
@@ -122,10 +125,6 @@ class Grid_env_2(gym.Env):
         # Return Tuple[state, reward, done, info]
         shaped_action = np.reshape(
             action, (len(self.buildings), len(self.buildings)))
-        try:
-            self.queue.put_nowait(shaped_action)
-        except qu.Full:
-            pass
         # Abziehen und Geben
         for s_index, source_building in enumerate(shaped_action):
             for d_index, dest_power in enumerate(source_building):
@@ -133,14 +132,17 @@ class Grid_env_2(gym.Env):
                     self.buildings[s_index].consume_power(dest_power))
 
         # Step Haus
-        for building in self.buildings:
-            building.step()
+        bought = [building.step() for building in self.buildings]
         power_bought = self.ambient.hourly_bought_energy
+        if(self.telemetry.active):
+            self.telemetry.write(self.ambient.hour, power_bought, self.ambient.year_offset,
+                                 self.ambient.is_night(), bought, action)
         # Ambient Step
         self.ambient.step()
         state = self.get_state()
         reward = self.reward_func(power_bought)
         self.total_power_bought.append(power_bought)
+        self.power_bought_stats.add(power_bought)
         done = self.ambient.hour >= int(TOTAL_DAYS*24)
         info = {"money_used": self.total_power_bought}
         return (state, reward, done, info)
@@ -157,7 +159,12 @@ class Grid_env_2(gym.Env):
         # pass
         # render_string = "Ambient:(Preis: "+str(self.ambient.actual_price)+", Sonne: "+str(self.ambient.get_sunbeam())+", Tageszeit: "+str(self.ambient.hour % 24)+")\nA: "+str((self.buildings[0].power_consumption(
         # ), self.buildings[0].get_power()))+"\nB: "+str((self.buildings[1].power_consumption(), self.buildings[1].get_power()))+"\n:C: "+str((self.buildings[2].power_consumption(), self.buildings[2].get_power()))
-        if(self.render_thread.is_alive() == False):
+        # matplotlib and networkx are only imported once the environment is rendered
+        import Monitor
+        if(self.render_thread is None or self.render_thread.is_alive() == False):
+            self.telemetry.attach()
+            self.render_thread = threading.Thread(
+                args=(self.buildings, self.telemetry), target=Monitor.create_plot, daemon=True)
             self.render_thread.start()
         return ""
 
@@ -1,16 +1,19 @@
-import imp
 import gym
 from gym import spaces
 from typing import Tuple
-from micro_grid.envs.Ambient2 import Ambient
+from micro_grid.envs.v2.Ambient2 import Ambient
 from micro_grid.envs.v2.Solar2 import Solar
 from micro_grid.envs.v1.WindGenerator import WindGenerator
-from micro_grid.envs.v2.Battery2 import Battery
+from micro_grid.envs.v2.Battery2 import Battery, BatteryBank
 from micro_grid.envs.v3.Building3 import Building
+from micro_grid.envs.v3.GridEngine import GridEngine
+from micro_grid.envs.v3.Topology import Topology
+from micro_grid.envs.v3.DemandProfile import BuildingDemand, create_profile
+from micro_grid.envs.RunningStats import RunningStats
+from micro_grid.envs.ObservationBuffer import ObservationBuffer
+from micro_grid.envs.Telemetry import Telemetry
+from micro_grid.envs.PhaseProfiler import PhaseProfiler
 import numpy as np
-import random
-import Monitor
-import queue as qu
 import threading
 import os
 import yaml
@@ -18,71 +21,161 @@ import yaml
 ## PARAMETERS ##
 PRICE_FLUCTUATION = 0.5
 TOTAL_DAYS = 365.25
+# object steps every building object, array simulates all buildings with numpy, auto picks one by the size of the village
+ENGINES = ("auto", "object", "array")
+# break-even of the array engine measured with benchmarks/bench_step.py, smaller villages step faster with the objects
+ARRAY_MIN_BUILDINGS = 24
+ARRAY_MIN_EDGES = 200
+# share of the available power sent by the actions 0, 1 and 2, e.g. for rendering
+ACTION_SHARES = (0.0, 1.0, 0.5)
+# human shows a window, video writes the steps offscreen in a renderer process
+RENDER_MODES = ("human", "video")
 
 
 class Grid_env_3(gym.Env):
     """This is a reinforcement learning environment, based on the openai gym environments.
-    This environment creates a microgrid community, every step is one hour. Every building is connect with every other one
+    This environment creates a microgrid community, every step is one hour.
+    Every building is connect with every other one, unless the config declares the lines between the buildings
 
     Args:
         gym (_type_): Parent class From openai gym
+        year_bank (YearBank, optional): Shared tables of all years, e.g. created once for all subprocess workers. Defaults to None.
+        prefetch (bool, optional): Prepares the year of the next episode in the background. Defaults to False.
+        engine (str, optional): Simulation of the buildings, one of ENGINES. Defaults to "auto", see choose_engine.
+        profile (bool, optional): Times the phases of step and reset, see get_profile. Defaults to False.
+        config_path (str, optional): Building config of the village. Defaults to './config.yml'.
     """
 
-    def __init__(self):
-        self.total_power_bought = [0]
-        self.queue = qu.Queue()
-        self.ambient = Ambient(TOTAL_DAYS, PRICE_FLUCTUATION)
+    def __init__(self, year_bank=None, prefetch=False, engine="auto", profile=False, config_path='./config.yml'):
+        if(engine not in ENGINES):
+            raise ValueError("Unknown engine " + str(engine) +
+                             ", expected one of " + str(ENGINES))
+        # only exists while profiling, every timer checks for None
+        self.profiler = PhaseProfiler() if profile else None
+        # bought power of every step, starting with 0
+        self.power_bought_stats = RunningStats(0)
+        self.ambient = Ambient(
+            TOTAL_DAYS, PRICE_FLUCTUATION, year_bank=year_bank, prefetch=prefetch, profiler=self.profiler)
 
-        self.buildings = self.load_building_config('./config.yml')
+        config = read_config(config_path)
+        self.topology = Topology.from_config(config, len(config['buildings']))
+        if(engine == "auto"):
+            engine = choose_engine(
+                len(config['buildings']), self.topology.n_edges)
+        # the array engine shares the battery fuel with the building objects through a bank
+        self.buildings = load_buildings(
+            config, self.ambient, engine == "array")
+        # demand of every building in every hour, computed whenever the ambient simulates another year
+        self.demand = BuildingDemand([building.inhabs for building in self.buildings],
+                                     create_profile(config, config_path))
+        self.update_demand()
+        self.engine = None
+        if(engine == "array"):
+            self.engine = GridEngine(
+                self.buildings, self.ambient, self.topology, self.demand)
+            self.engine.profiler = self.profiler
 
         # self.buildings = [Building([Solar(11.1)], Battery(27.76), 5, self.ambient),
         #                   Building([], Battery(0), 3, self.ambient),
         #                   Building([], Battery(0), 1, self.ambient)]
-        n_actions = []
-        for i in range(pow(len(self.buildings), 2)):
-            n_actions.append(3)
+        # one action per line direction, wegnehmen und senden
         self.action_space = spaces.MultiDiscrete(
-            n_actions)  # wegnehmen und senden
+            [3] * self.topology.n_edges)
         self.observation_space = spaces.Box(
             low=0.0, high=10_000.0, shape=(len(self.buildings) + 3,))
-        self.render_thread = threading.Thread(
-            args=(self.buildings, self.queue, self.ambient), target=Monitor.create_plot)
+        self.observations = ObservationBuffer(self.observation_space.shape)
+        # step telemetry, only written while the monitor is attached
+        self.telemetry = Telemetry(len(self.buildings), self.topology.n_edges)
+        self.render_thread = None
+        self.video = None
 
     def seed(self, seed: int) -> None:
-        """Sets the seed of the different random generators used
+        """Sets the seed of the random generator of the ambient, environments with different seeds draw independently
 
         Args:
             seed (int): The seed to be set.
         """
-        random.seed(seed)
+        self.ambient.seed(seed)
 
-    def get_state(self) -> spaces.Box:
+    def get_state(self, out=None) -> spaces.Box:
         """Generates the environment state 
         Consists of the building states and the ambient state
 
+        Args:
+            out (np.ndarray, optional): float32 array the state is written into. Defaults to the next preallocated observation,
+                which is overwritten two observations later.
+
         Returns:
             spaces.Box: The environment state
         """
-        observations = np.array([])
-        observations = np.append(observations, self.ambient.get_state())
-        for building in self.buildings:
-            observations = np.append(observations, [building.get_state()])
-        return observations.flatten()
+        if(out is None):
+            out = self.observations.next()
+        self.ambient.get_state(out[:3])
+        if(self.engine is not None):
+            self.engine.get_state(out[3:])
+            return out
+        for index, building in enumerate(self.buildings):
+            out[3 + index] = building.get_state()[0]
+        return out
 
-    def reset(self) -> spaces.Box:
+    def reset(self, year=None, episode_seed=None) -> spaces.Box:
         """Resets the Environment
 
+        Args:
+            year (int, optional): year to simulate, e.g. to evaluate on fixed years. Defaults to a random year.
+            episode_seed (_type_, optional): seed of the prices and missing wind of the episode, see Ambient.reset.
+                Defaults to the random generator of the ambient.
+
         Returns:
             spaces.Box: The environment state
         """
-        self.queue = qu.Queue()
-        self.render_thread = threading.Thread(
-            args=(self.buildings, self.queue, self.ambient), target=Monitor.create_plot)
-        self.total_power_bought = [0]
-        self.ambient.reset()
+        profiler = self.profiler
+        if(profiler is not None):
+            start = profiler.clock()
+        self.power_bought_stats.reset(0)
+        self.ambient.reset(year, episode_seed)
+        if(profiler is not None):
+            start = profiler.lap("reset.ambient", start)
         for building in self.buildings:
             building.reset()
-        return self.get_state()
+        self.update_demand()
+        if(self.engine is not None):
+            self.engine.reset()
+        self.snapshot_generation()
+        if(profiler is not None):
+            start = profiler.lap("reset.buildings", start)
+        state = self.get_state()
+        if(profiler is not None):
+            profiler.lap("reset.get_state", start)
+        return state
+
+    def update_demand(self):
+        """Computes the demand of all buildings for the year of the ambient
+        """
+        self.demand.update(self.ambient.night_hours)
+        for index, building in enumerate(self.buildings):
+            building.demand = self.demand.get_building(index)
+
+    def snapshot_generation(self):
+        """Computes the generation of all buildings once for the current hour of the ambient.
+        Every building can hand out its generation only once, what is not sent stays in the building.
+        """
+        if(self.engine is not None):
+            self.engine.snapshot_generation()
+            return
+        for building in self.buildings:
+            building.snapshot_generation()
+
+    def get_power_state(self) -> dict:
+        """Returns the battery levels and the generation of the current hour of all buildings, e.g. to record trajectories
+
+        Returns:
+            dict: battery level in kWh and generation in kW per building, the arrays may be changed by the next step
+        """
+        if(self.engine is not None):
+            return {'battery': self.engine.fuel, 'generation': self.engine.generation}
+        return {'battery': np.array([building.battery.get_fuel() for building in self.buildings]),
+                'generation': np.array([building.generation for building in self.buildings])}
 
     def reward_func(self, power_bought: float) -> float:
         """Calculates the reward based on the bought electricity.
@@ -95,7 +188,7 @@ class Grid_env_3(gym.Env):
         Returns:
             float: The reward, max reward is 1 min is -1
         """
-        mean_cost = np.mean(self.total_power_bought)
+        mean_cost = self.power_bought_stats.mean
         reward = 0
         if(power_bought > mean_cost):
             reward = -1
@@ -114,46 +207,126 @@ class Grid_env_3(gym.Env):
         Returns:
             Tuple[spaces.Box, float, bool, dict]: Returns the state, reward, done state and info of the  environment step
         """
-        # convert action in matrix shape
-        shaped_action = np.reshape(
-            action, (len(self.buildings), len(self.buildings)))
-        # put shaped action in queue for rendering
-        try:
-            self.queue.put_nowait(shaped_action)
-        except qu.Full:
-            pass
-        # distriubute energy
-        for s_index, source_building in enumerate(shaped_action):
-            for d_index, dest_power in enumerate(source_building):
+        profiler = self.profiler
+        if(profiler is not None):
+            start = profiler.clock()
+        action = np.asarray(action)
+        if(self.engine is not None):
+            # distribute energy and step all buildings at once, the engine times its distribution
+            bought = self.engine.step(action)
+        else:
+            # distriubute energy along every line
+            for s_index, d_index, dest_power in zip(self.topology.sources, self.topology.destinations, action):
                 self.buildings[d_index].receive_power(
                     self.buildings[s_index].consume_percentage(dest_power))
-        # call step in all buildings
-        for building in self.buildings:
-            building.step()
+            if(profiler is not None):
+                start = profiler.lap("step.distribute", start)
+            # call step in all buildings
+            bought = [building.step() for building in self.buildings]
+        if(profiler is not None):
+            start = profiler.lap("step.buildings", start)
         # read total bought power in this hour from external source
         power_bought = self.ambient.hourly_bought_energy
+        # save the step for rendering
+        if(self.telemetry.active or self.video is not None):
+            frame = (self.ambient.hour, power_bought, self.ambient.year_offset,
+                     self.ambient.is_night(), bought, action)
+            self.telemetry.write(*frame)
+            if(self.video is not None):
+                self.video.write(*frame)
+        if(profiler is not None):
+            start = profiler.lap("step.telemetry", start)
         # call step in ambient
         self.ambient.step()
+        self.snapshot_generation()
+        if(profiler is not None):
+            start = profiler.lap("step.ambient", start)
         # Get state of environment
         state = self.get_state()
+        if(profiler is not None):
+            start = profiler.lap("step.get_state", start)
         # Calculate reward
         reward = self.reward_func(power_bought)
         # Log bought power from external source
-        self.total_power_bought.append(power_bought)
+        self.power_bought_stats.add(power_bought)
+        if(profiler is not None):
+            profiler.lap("step.reward", start)
         done = self.ambient.hour >= int(TOTAL_DAYS*24)
-        info = {}
+        info = {"power_bought": power_bought}
         return (state, reward, done, info)
 
-    def render(self):
-        """Renders the Environment, unused at the moment
+    def get_cache_stats(self) -> dict:
+        """Returns the hit and miss counters of the ambient year tables, e.g. to record them in training logs
+
+        Returns:
+            dict: memory hits, disk hits, misses and the amount of tables in memory
+        """
+        return self.ambient.get_cache_stats()
+
+    def get_profile(self) -> dict:
+        """Returns the timers and counters of the phases of step and reset, see PhaseProfiler.get_profile.
+        With the array engine step.buildings includes step.distribute.
+
+        Returns:
+            dict: calls, total, mean and max seconds per phase and the counters, None if the environment was created without profile
+        """
+        if(self.profiler is None):
+            return None
+        return self.profiler.get_profile()
+
+    def get_reset_stats(self) -> dict:
+        """Returns how long resets waited for the ambient year to be ready
+
+        Returns:
+            dict: stall time of the last reset, total stall time in seconds and amount of resets
+        """
+        return self.ambient.get_reset_stats()
+
+    def render(self, mode="human", path="render.mp4"):
+        """Renders the Environment, every step from now on is rendered
+
+        Args:
+            mode (str, optional): one of RENDER_MODES. human shows a monitor window in a thread,
+                video writes the steps offscreen in a separate renderer process without slowing stepping. Defaults to "human".
+            path (str, optional): for video, a .mp4 (needs ffmpeg) or .gif file, any other path is a directory of PNG frames.
+                The video is complete after close. Defaults to "render.mp4".
         """
-        if(self.render_thread.is_alive() == False):
+        if(mode not in RENDER_MODES):
+            raise ValueError("Unknown render mode " + str(mode) +
+                             ", expected one of " + str(RENDER_MODES))
+        # matplotlib and networkx are only imported once the environment is rendered
+        import Monitor
+        if(mode == "video"):
+            if(self.video is None):
+                self.video = Monitor.VideoRenderer([building.inhabs for building in self.buildings], self.topology.n_edges,
+                                                   path, self.topology, ACTION_SHARES)
+            return
+        if(self.render_thread is None or self.render_thread.is_alive() == False):
+            # attached before the thread starts, so no step is missed
+            self.telemetry.attach()
+            self.render_thread = threading.Thread(
+                args=(self.buildings, self.telemetry, self.topology),
+                kwargs={'action_shares': ACTION_SHARES}, target=Monitor.create_plot, daemon=True)
             self.render_thread.start()
 
+    def get_telemetry_stats(self) -> dict:
+        """Returns the counters of the step telemetry, e.g. how many steps the monitor dropped
+
+        Returns:
+            dict: written, dropped and pending frames and the amount of consumers, of the video renderer if one is recording
+        """
+        if(self.video is not None):
+            return self.video.get_stats()
+        return self.telemetry.get_stats()
+
     def close(self):
-        """Cleans up the Environment and closes it
+        """Cleans up the Environment and closes it, waits until a video renderer wrote all steps
         """
         print("cleaning up environment...")
+        if(self.video is not None):
+            self.video.close()
+            self.video = None
+        self.ambient.close()
 
     def load_building_config(self, config_path: str) -> list:
         """Parses environment config and creates building instances with the attributes of the config
@@ -164,24 +337,70 @@ class Grid_env_3(gym.Env):
         Returns:
             list: list with building instances
         """
-        building_list = []
-        path = os.path.normpath(config_path)
-        if(not os.path.isfile(path)):
-            raise FileNotFoundError(
-                "The config file that should be parsed does not exist")
-        with open(path, 'r') as file:
-            config = yaml.safe_load(file)
-        for index in range(len(config['buildings'])):
-            energy_sources = []
-            if(config['buildings'][index]['energy_sources'] is not None):
-                for source_index in range(len(config['buildings'][index]['energy_sources'])):
-                    peak_performance = config['buildings'][index]['energy_sources'][source_index]['peak_power']
-                    if(config['buildings'][index]['energy_sources'][source_index]['type'] == "solar"):
-                        energy_sources.append(Solar(peak_performance))
-                    elif(config['buildings'][index]['energy_sources'][source_index]['type'] == "wind"):
-                        energy_sources.append(WindGenerator(peak_performance))
-            battery_capacity = config['buildings'][index]['battery']['capacity']
-            inhabs = config['buildings'][index]['inhabitants']
-            building_list.append(Building(energy_sources, Battery(
-                battery_capacity), inhabs, self.ambient))
-        return building_list
+        return load_buildings(read_config(config_path), self.ambient)
+
+
+def choose_engine(n_buildings: int, n_edges: int) -> str:
+    """Picks the faster engine for a village, the array engine only pays off for larger villages
+
+    Args:
+        n_buildings (int): amount of buildings
+        n_edges (int): amount of line directions
+
+    Returns:
+        str: "array" or "object"
+    """
+    if(n_buildings >= ARRAY_MIN_BUILDINGS or n_edges >= ARRAY_MIN_EDGES):
+        return "array"
+    return "object"
+
+
+def read_config(config_path: str) -> dict:
+    """Parses the environment config
+
+    Args:
+        config_path (str): config path as string
+
+    Returns:
+        dict: the parsed config
+    """
+    path = os.path.normpath(config_path)
+    if(not os.path.isfile(path)):
+        raise FileNotFoundError(
+            "The config file that should be parsed does not exist")
+    with open(path, 'r') as file:
+        return yaml.safe_load(file)
+
+
+def load_buildings(config: dict, ambient: Ambient, shared_bank=False) -> list:
+    """Creates building instances with the attributes of the parsed config.
+
+    Args:
+        config (dict): the parsed config
+        ambient (Ambient): ambient of the buildings
+        shared_bank (bool, optional): The batteries of all buildings are views into a single BatteryBank,
+            which the array engine uses directly. Defaults to False.
+
+    Returns:
+        list: list with building instances
+    """
+    building_list = []
+    capacities = [building['battery']['capacity']
+                  for building in config['buildings']]
+    if(shared_bank):
+        batteries = BatteryBank(capacities).batteries()
+    else:
+        batteries = [Battery(capacity) for capacity in capacities]
+    for index in range(len(config['buildings'])):
+        energy_sources = []
+        if(config['buildings'][index]['energy_sources'] is not None):
+            for source_index in range(len(config['buildings'][index]['energy_sources'])):
+                peak_performance = config['buildings'][index]['energy_sources'][source_index]['peak_power']
+                if(config['buildings'][index]['energy_sources'][source_index]['type'] == "solar"):
+                    energy_sources.append(Solar(peak_performance))
+                elif(config['buildings'][index]['energy_sources'][source_index]['type'] == "wind"):
+                    energy_sources.append(WindGenerator(peak_performance))
+        inhabs = config['buildings'][index]['inhabitants']
+        building_list.append(Building(
+            energy_sources, batteries[index], inhabs, ambient))
+    return building_list
@@ -0,0 +1,194 @@
+from gym import spaces
+from stable_baselines3.common.vec_env import VecEnv
+from micro_grid.envs.Grid_env_3 import PRICE_FLUCTUATION, TOTAL_DAYS, load_buildings, read_config
+from micro_grid.envs.v3.BatchAmbient import BatchAmbient
+from micro_grid.envs.v3.BatchGridEngine import BatchGridEngine
+from micro_grid.envs.v3.Topology import Topology
+from micro_grid.envs.v3.DemandProfile import create_profile
+from micro_grid.envs.ObservationBuffer import ObservationBuffer
+import numpy as np
+
+
+class Grid_env_batched(VecEnv):
+    """Batch of independent Grid_env_3 villages as stable-baselines3 VecEnv.
+    All villages are simulated together as (environments, buildings) arrays in a single step call,
+    every village simulates its own year and is reset automatically at the end of its episode.
+
+    Args:
+        VecEnv (_type_): Parent class from stable-baselines3
+        n_envs (int): amount of villages
+        year_bank (YearBank, optional): Shared tables of all years. Defaults to None.
+        years (list, optional): Year per village, None draws a random year on every reset. Defaults to random years for all.
+        seed (int, optional): Seed of the random generator of years, prices and missing wind. Defaults to None.
+        config_path (str, optional): Building config of the villages. Defaults to './config.yml'.
+        episode_seeds (list, optional): Seed per village of the prices and missing wind of its episodes,
+            like Grid_env_3.reset(episode_seed=...). Defaults to drawing them from the generator of seed.
+    """
+
+    def __init__(self, n_envs: int, year_bank=None, years=None, seed=None, config_path='./config.yml', episode_seeds=None):
+        self.rng = np.random.default_rng(seed)
+        self.ambient = BatchAmbient(n_envs, TOTAL_DAYS, PRICE_FLUCTUATION, rng=self.rng,
+                                    year_bank=year_bank)
+        config = read_config(config_path)
+        self.buildings = load_buildings(config, self.ambient.source)
+        n_buildings = len(self.buildings)
+        self.topology = Topology.from_config(config, n_buildings)
+        self.engine = BatchGridEngine(
+            self.buildings, self.ambient, self.topology, create_profile(config, config_path))
+        action_space = spaces.MultiDiscrete([3] * self.topology.n_edges)
+        observation_space = spaces.Box(
+            low=0.0, high=10_000.0, shape=(n_buildings + 3,))
+        super().__init__(n_envs, observation_space, action_space)
+        self.observations = ObservationBuffer(
+            (n_envs,) + observation_space.shape)
+        if(years is not None):
+            self.ambient.select_years(years)
+        if(episode_seeds is not None):
+            self.ambient.select_episode_seeds(episode_seeds)
+        # sum and count of the bought power of every episode, starting with 0 like Grid_env_3.power_bought_stats
+        self.total_power_bought = np.zeros(n_envs)
+        self.steps = np.ones(n_envs)
+        self.actions = None
+
+    def seed(self, seed=None) -> list:
+        """Sets the seed of the random generator shared by all villages
+
+        Args:
+            seed (int, optional): The seed to be set. Defaults to None.
+
+        Returns:
+            list: the seed for every village
+        """
+        self.rng = np.random.default_rng(seed)
+        self.ambient.rng = self.rng
+        return [seed] * self.num_envs
+
+    def select_years(self, years: list, indices=None):
+        """Fixes the years the villages simulate after their next reset
+
+        Args:
+            years (list): a year per village, None draws a random year on every reset
+            indices (_type_, optional): villages the years are for. Defaults to all.
+        """
+        self.ambient.select_years(years, indices)
+
+    def get_state(self, out=None) -> np.ndarray:
+        """Generates the state of all villages, like Grid_env_3.get_state
+
+        Args:
+            out (np.ndarray, optional): float32 array the states are written into. Defaults to the next preallocated observation,
+                which is overwritten two observations later.
+
+        Returns:
+            np.ndarray: The state per village
+        """
+        if(out is None):
+            out = self.observations.next()
+        self.ambient.get_state(out[:, :3])
+        self.engine.get_state(out[:, 3:])
+        return out
+
+    def reset_envs(self, mask: np.ndarray):
+        """Resets the villages where mask is set
+
+        Args:
+            mask (np.ndarray): villages to reset
+        """
+        self.ambient.reset(mask)
+        self.engine.reset(mask)
+        self.engine.snapshot_generation()
+        self.total_power_bought[mask] = 0
+        self.steps[mask] = 1
+
+    def reset(self) -> np.ndarray:
+        """Resets all villages
+
+        Returns:
+            np.ndarray: The state per village
+        """
+        self.reset_envs(np.ones(self.num_envs, dtype=np.bool_))
+        return self.get_state()
+
+    def reward_func(self, power_bought: np.ndarray) -> np.ndarray:
+        """Calculates the rewards based on the bought electricity, like Grid_env_3.reward_func
+
+        Args:
+            power_bought (np.ndarray): Bought electricity this step per village, in euros
+
+        Returns:
+            np.ndarray: The reward per village, max reward is 1 min is -1
+        """
+        mean_cost = self.total_power_bought / self.steps
+        reward = np.where(power_bought > mean_cost, -1.0, -0.5)
+        return np.where(power_bought <= 0, 1.0, reward)
+
+    def step_async(self, actions: np.ndarray):
+        self.actions = actions
+
+    def step_wait(self) -> tuple:
+        """Performs the time step of all villages with the actions given to step_async.
+        Villages at the end of their episode are reset, their last state is in the info as terminal_observation.
+
+        Returns:
+            tuple: states, rewards, done states and infos per village
+        """
+        actions = np.reshape(
+            self.actions, (self.num_envs, self.topology.n_edges))
+        self.engine.step(actions)
+        power_bought = self.ambient.hourly_bought_energy.copy()
+        self.ambient.step()
+        self.engine.snapshot_generation()
+        states = self.get_state()
+        rewards = self.reward_func(power_bought)
+        self.total_power_bought += power_bought
+        self.steps += 1
+        dones = self.ambient.hour >= int(TOTAL_DAYS*24)
+        infos = [{} for _ in range(self.num_envs)]
+        if(np.any(dones)):
+            for index in np.flatnonzero(dones):
+                infos[index]["terminal_observation"] = states[index].copy()
+            self.reset_envs(dones)
+            # the reset villages are written into the same observation
+            self.get_state(states)
+        return states, rewards.astype(np.float32), dones, infos
+
+    def get_cache_stats(self) -> dict:
+        """Returns the hit and miss counters of the year tables
+
+        Returns:
+            dict: memory hits, disk hits, misses and the amount of tables in memory
+        """
+        return self.ambient.get_cache_stats()
+
+    def close(self):
+        """Cleans up the villages and closes them
+        """
+        self.ambient.close()
+
+    def get_attr(self, attr_name: str, indices=None) -> list:
+        """Returns an attribute of the batch once per village, per village arrays are indexed"""
+        value = getattr(self, attr_name)
+        return [self.select(value, index) for index in self._get_indices(indices)]
+
+    def set_attr(self, attr_name: str, value, indices=None):
+        """Sets an attribute of the batch, per village arrays only for the given villages"""
+        current = getattr(self, attr_name, None)
+        if(isinstance(current, np.ndarray) and current.shape[:1] == (self.num_envs,)):
+            current[list(self._get_indices(indices))] = value
+        else:
+            setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> list:
+        """Calls a method of the batch once, it acts on all villages, the result is returned once per village"""
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> list:
+        """The villages are not gym environments, so they are never wrapped"""
+        return [False for _ in self._get_indices(indices)]
+
+    def select(self, value, index: int):
+        """Returns the part of a value that belongs to a village"""
+        if(isinstance(value, np.ndarray) and value.shape[:1] == (self.num_envs,)):
+            return value[index]
+        return value
@@ -5,6 +5,8 @@ from random import random
 from micro_grid.envs.v_minimal.Ambient import Ambient
 from micro_grid.envs.v_minimal.Building import Building
 import numpy as np
+from micro_grid.envs.RunningStats import RunningStats
+from micro_grid.envs.ObservationBuffer import ObservationBuffer
 
 ## PARAMETERS ##
 TOTAL_DAYS = 365.25
@@ -25,7 +27,8 @@ class Grid_env_minimal(gym.Env):
         for building in self.buildings:
             self.ambient.booking_table[hash(building)] = [0]
 
-        self.carbon_sum_per_timestep = [0]
+        # carbon sum of every time step, starting with 0
+        self.carbon_stats = RunningStats(0)
 
         n_actions = []
         for i in range(pow(len(self.buildings), 2)):
@@ -34,6 +37,7 @@ class Grid_env_minimal(gym.Env):
             n_actions)  # wegnehmen und senden
         self.observation_space = spaces.Box(
             low=0.0, high=(4_919/365.25/24)*1.150, shape=(len(self.buildings),))
+        self.observations = ObservationBuffer(self.observation_space.shape)
 
     def reset(self) -> list:
         """Resets the environment to initial state
@@ -45,11 +49,11 @@ class Grid_env_minimal(gym.Env):
         self.ambient.reset()
         for building in self.buildings:
             building.reset()
-        self.carbon_sum_per_timestep = [0]
+        self.carbon_stats.reset(0)
         return self.get_state()
 
     def reward_func(self, state: list) -> float:
-        """Calculates the reward for the last executed action and appends sum of carbon in latest timestep to self.carbon_sum_per_timestep
+        """Calculates the reward for the last executed action and adds sum of carbon in latest timestep to self.carbon_stats
 
         Args:
             state(list): list with emmitted carbon of every building in latest timestep
@@ -57,11 +61,11 @@ class Grid_env_minimal(gym.Env):
         Returns:
             float: The reward. Higher is better than lower
         """
-        max = np.max(self.carbon_sum_per_timestep)
-        mean = np.mean(self.carbon_sum_per_timestep)
-        min = np.mean(self.carbon_sum_per_timestep)
+        max = self.carbon_stats.max
+        mean = self.carbon_stats.mean
+        min = self.carbon_stats.mean
         sum = np.sum(state)
-        self.carbon_sum_per_timestep.append(sum)
+        self.carbon_stats.add(sum)
         if(sum > max):
             return -1.0
         if(sum < min):
@@ -94,8 +98,9 @@ class Grid_env_minimal(gym.Env):
         for building in self.buildings:
             building.step()
 
-        state = self.ambient.get_state()
-        reward = self.reward_func(state)
+        state = self.get_state()
+        # reward of the exact carbon amounts, not the float32 state
+        reward = self.reward_func(self.ambient.get_state())
         done = len(next(iter(self.ambient.booking_table.values()))
                    ) >= TOTAL_DAYS*24
         info = {}
@@ -107,7 +112,9 @@ class Grid_env_minimal(gym.Env):
         Returns:
             list: Returns list of emmitted carbon of all buildings in latest time step
         """
-        return self.ambient.get_state()
+        observations = self.observations.next()
+        observations[:] = self.ambient.get_state()
+        return observations
 
     def render(self):
         """Renders the environment states as 2D Animation
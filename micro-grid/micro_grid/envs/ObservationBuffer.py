@@ -0,0 +1,30 @@
+import numpy as np
+
+## PARAMETERS ##
+# a returned observation stays valid during the next step, e.g. while a rollout buffer stores it after stepping
+OBSERVATION_BUFFERS = 2
+
+
+class ObservationBuffer:
+    """Preallocated float32 observation arrays, handed out in turn so environments write their state without allocating.
+    An observation is overwritten after OBSERVATION_BUFFERS further observations, copy it to keep it longer.
+
+    Args:
+        shape (tuple): shape of one observation
+        count (int, optional): amount of arrays handed out in turn. Defaults to OBSERVATION_BUFFERS.
+    """
+
+    def __init__(self, shape: tuple, count=OBSERVATION_BUFFERS):
+        self.buffers = np.zeros((count,) + tuple(shape), dtype=np.float32)
+        # views are created once, so handing them out allocates nothing
+        self.views = list(self.buffers)
+        self.index = 0
+
+    def next(self) -> np.ndarray:
+        """Returns the array for the next observation
+
+        Returns:
+            np.ndarray: the array
+        """
+        self.index = (self.index + 1) % len(self.views)
+        return self.views[self.index]
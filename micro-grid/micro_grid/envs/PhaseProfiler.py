@@ -0,0 +1,95 @@
+import threading
+import time
+
+
+class PhaseProfiler:
+    """Opt-in timers and counters of the phases of step and reset, aggregated in memory.
+    The environments only hold a profiler while profiling is enabled and check for None before timing,
+    so a disabled profiler costs nothing but that check.
+    Phases may be timed from several threads, e.g. the year prefetch of the ambient.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clears all timers and counters
+        """
+        with self.lock:
+            # calls, total and maximum seconds per phase
+            self.phases = {}
+            self.counters = {}
+
+    @staticmethod
+    def clock() -> float:
+        """Returns the monotonic clock the phases are timed with, in seconds"""
+        return time.perf_counter()
+
+    def add(self, phase: str, seconds: float):
+        """Adds a call of a phase
+
+        Args:
+            phase (str): name of the phase, e.g. step.ambient
+            seconds (float): duration of the call
+        """
+        with self.lock:
+            timer = self.phases.get(phase)
+            if(timer is None):
+                self.phases[phase] = [1, seconds, seconds]
+                return
+            timer[0] += 1
+            timer[1] += seconds
+            if(seconds > timer[2]):
+                timer[2] = seconds
+
+    def lap(self, phase: str, start: float) -> float:
+        """Adds a call of a phase that started at start and ended now, so consecutive phases can be timed with one clock read each
+
+        Args:
+            phase (str): name of the phase
+            start (float): clock at the start of the phase
+
+        Returns:
+            float: clock at the end of the phase
+        """
+        end = time.perf_counter()
+        self.add(phase, end - start)
+        return end
+
+    def count(self, counter: str, amount=1):
+        """Increments a counter
+
+        Args:
+            counter (str): name of the counter, e.g. reset.weather_misses
+            amount (int, optional): the increment. Defaults to 1.
+        """
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def get_profile(self) -> dict:
+        """Returns the aggregated timers and counters
+
+        Returns:
+            dict: calls, total, mean and max seconds per phase under phases, and the counters under counters
+        """
+        with self.lock:
+            phases = {phase: {'calls': calls, 'total': total, 'mean': total / calls, 'max': maximum}
+                      for phase, (calls, total, maximum) in self.phases.items()}
+            return {'phases': phases, 'counters': dict(self.counters)}
+
+    def format(self) -> str:
+        """Returns the profile as table, the phases ordered by their total time
+
+        Returns:
+            str: one line per phase and counter
+        """
+        profile = self.get_profile()
+        lines = ["%-24s %8s %12s %12s %12s" %
+                 ("phase", "calls", "total ms", "mean us", "max us")]
+        for phase, timer in sorted(profile['phases'].items(), key=lambda item: -item[1]['total']):
+            lines.append("%-24s %8d %12.2f %12.2f %12.2f" % (phase, timer['calls'], timer['total']*1e3,
+                                                            timer['mean']*1e6, timer['max']*1e6))
+        for counter, value in sorted(profile['counters'].items()):
+            lines.append("%-24s %8d" % (counter, value))
+        return "\n".join(lines)
@@ -0,0 +1,33 @@
+class RunningStats:
+    """Count, mean and maximum of a series of values, updated in constant time per value with Welford's method,
+    so rewards that compare against the history do not have to keep and scan it.
+
+    Args:
+        initial (float, optional): first value of the series. Defaults to an empty series.
+    """
+
+    def __init__(self, initial=None):
+        self.reset(initial)
+
+    def reset(self, initial=None):
+        """Clears the series
+
+        Args:
+            initial (float, optional): first value of the new series. Defaults to an empty series.
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.max = float("-inf")
+        if(initial is not None):
+            self.add(initial)
+
+    def add(self, value: float):
+        """Adds a value to the series
+
+        Args:
+            value (float): the value
+        """
+        self.count += 1
+        self.mean += (value - self.mean) / self.count
+        if(value > self.max):
+            self.max = value
@@ -0,0 +1,297 @@
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+
+## PARAMETERS ##
+# frames kept for a consumer that is slower than the environment, older frames are dropped
+TELEMETRY_CAPACITY = 256
+# hour, imported energy, year offset and night flag in front of the bought energy and the actions of a frame
+HEADER_LENGTH = 4
+# seconds a consumer in another process sleeps while waiting for a frame
+POLL_INTERVAL = 0.005
+# shared counters, written by the environment or by the consumer
+WRITTEN, READ, DROPPED, CONSUMERS, CLOSED = range(5)
+
+
+class Telemetry:
+    """Fixed capacity ring buffer of the step telemetry of a village, e.g. for rendering.
+    The frames are preallocated rows of a float array and only written while a consumer is attached,
+    so a headless run keeps nothing. A full buffer drops its oldest frame and counts it.
+
+    Args:
+        n_buildings (int): amount of buildings
+        n_actions (int): amount of actions per step
+        capacity (int, optional): amount of frames kept. Defaults to TELEMETRY_CAPACITY.
+    """
+
+    def __init__(self, n_buildings: int, n_actions: int, capacity=TELEMETRY_CAPACITY):
+        self.n_buildings = n_buildings
+        self.n_actions = n_actions
+        self.capacity = capacity
+        self.frames = np.zeros((capacity, frame_length(n_buildings, n_actions)))
+        # frames written and read, the buffer holds the frames in between
+        self.written = 0
+        self.read = 0
+        self.dropped = 0
+        self.consumers = 0
+        self.condition = threading.Condition()
+
+    def attach(self):
+        """Attaches a consumer, frames are written from now on
+        """
+        with self.condition:
+            self.consumers += 1
+
+    def detach(self):
+        """Detaches a consumer, without consumers frames are no longer written
+        """
+        with self.condition:
+            self.consumers = max(self.consumers - 1, 0)
+            self.condition.notify_all()
+
+    @property
+    def active(self) -> bool:
+        """Whether a consumer is attached"""
+        return self.consumers > 0
+
+    def pack(self, index: int, hour: int, imported: float, year_offset: int, night: bool, bought, actions):
+        """Writes a frame into a row of the buffer"""
+        row = self.frames[index]
+        row[0] = hour
+        row[1] = imported
+        row[2] = year_offset
+        row[3] = night
+        row[HEADER_LENGTH:HEADER_LENGTH + self.n_buildings] = bought
+        row[HEADER_LENGTH + self.n_buildings:] = actions
+
+    def unpack(self, index: int) -> dict:
+        """Reads a frame from a row of the buffer
+
+        Args:
+            index (int): the row
+
+        Returns:
+            dict: hour, imported, year_offset, night, bought and actions of the frame
+        """
+        row = self.frames[index].copy()
+        return {'hour': int(row[0]),
+                'imported': float(row[1]),
+                'year_offset': int(row[2]),
+                'night': bool(row[3]),
+                'bought': row[HEADER_LENGTH:HEADER_LENGTH + self.n_buildings],
+                'actions': row[HEADER_LENGTH + self.n_buildings:]}
+
+    def write(self, hour: int, imported: float, year_offset: int, night: bool, bought, actions):
+        """Writes the frame of a step if a consumer is attached, drops the oldest frame if the buffer is full
+
+        Args:
+            hour (int): hour of the step
+            imported (float): bought energy of the village in euro
+            year_offset (int): offset of the simulated year to the current year
+            night (bool): whether the hour is at night
+            bought (_type_): bought energy per building in euro
+            actions (_type_): the actions of the step
+        """
+        if(self.consumers == 0):
+            return
+        with self.condition:
+            if(self.written - self.read == self.capacity):
+                self.read += 1
+                self.dropped += 1
+            self.pack(self.written % self.capacity, hour, imported,
+                      year_offset, night, bought, actions)
+            self.written += 1
+            self.condition.notify_all()
+
+    def get(self, timeout=None, latest=False):
+        """Reads the oldest frame, blocks until a frame is written
+
+        Args:
+            timeout (float, optional): seconds to wait for a frame. Defaults to waiting until a frame is written.
+            latest (bool, optional): skips to the newest frame, the skipped frames are counted as dropped. Defaults to False.
+
+        Returns:
+            _type_: the frame as dict, see unpack, None if no frame was written in time
+        """
+        with self.condition:
+            if(not self.condition.wait_for(lambda: self.written > self.read, timeout)):
+                return None
+            if(latest):
+                self.dropped += self.written - self.read - 1
+                self.read = self.written - 1
+            frame = self.unpack(self.read % self.capacity)
+            self.read += 1
+            return frame
+
+    def pending(self) -> int:
+        """Returns the amount of frames that were written but not read yet"""
+        with self.condition:
+            return self.written - self.read
+
+    def get_stats(self) -> dict:
+        """Returns the counters of the buffer
+
+        Returns:
+            dict: written, dropped and pending frames and the amount of consumers
+        """
+        with self.condition:
+            return {'written': self.written, 'dropped': self.dropped,
+                    'pending': self.written - self.read, 'consumers': self.consumers}
+
+
+def frame_length(n_buildings: int, n_actions: int) -> int:
+    """Returns the amount of floats of a frame"""
+    return HEADER_LENGTH + n_buildings + n_actions
+
+
+class SharedTelemetry(Telemetry):
+    """Telemetry in a shared memory block, for a consumer in another process, e.g. a renderer.
+    The environment only writes and never waits, a consumer that falls behind by the capacity drops the oldest frames.
+    Passing the telemetry to a subprocess only sends its spec, like YearBank.
+    """
+
+    def __init__(self, spec: dict, memory: shared_memory.SharedMemory, owner: bool):
+        self.spec = spec
+        self.memory = memory
+        self.owner = owner
+        self.n_buildings = spec['n_buildings']
+        self.n_actions = spec['n_actions']
+        self.capacity = spec['capacity']
+        self.counters = np.ndarray(5, dtype=np.int64, buffer=memory.buf)
+        self.frames = np.ndarray((self.capacity, frame_length(self.n_buildings, self.n_actions)),
+                                 dtype=np.float64, buffer=memory.buf, offset=self.counters.nbytes)
+
+    @classmethod
+    def create(cls, n_buildings: int, n_actions: int, capacity=TELEMETRY_CAPACITY):
+        """Creates the shared telemetry
+
+        Args:
+            n_buildings (int): amount of buildings
+            n_actions (int): amount of actions per step
+            capacity (int, optional): amount of frames kept. Defaults to TELEMETRY_CAPACITY.
+
+        Returns:
+            SharedTelemetry: the telemetry, owning the shared memory
+        """
+        size = 5 * 8 + capacity * \
+            frame_length(n_buildings, n_actions) * 8
+        memory = shared_memory.SharedMemory(create=True, size=size)
+        spec = {'name': memory.name, 'n_buildings': n_buildings,
+                'n_actions': n_actions, 'capacity': capacity}
+        telemetry = cls(spec, memory, owner=True)
+        telemetry.counters[:] = 0
+        return telemetry
+
+    @classmethod
+    def attach_to(cls, spec: dict):
+        """Attaches to the telemetry described by the spec of a telemetry created in another process
+
+        Args:
+            spec (dict): spec of the telemetry
+
+        Returns:
+            SharedTelemetry: the telemetry
+        """
+        try:
+            memory = shared_memory.SharedMemory(name=spec['name'], track=False)
+        except TypeError:
+            # python < 3.13 always tracks attached shared memory
+            memory = shared_memory.SharedMemory(name=spec['name'])
+        return cls(spec, memory, owner=False)
+
+    def __reduce__(self):
+        return (SharedTelemetry.attach_to, (self.spec,))
+
+    def attach(self):
+        """Attaches a consumer, frames are written from now on
+        """
+        self.counters[CONSUMERS] += 1
+
+    def detach(self):
+        """Detaches a consumer, without consumers frames are no longer written
+        """
+        self.counters[CONSUMERS] = max(self.counters[CONSUMERS] - 1, 0)
+
+    @property
+    def active(self) -> bool:
+        """Whether a consumer is attached"""
+        return self.counters[CONSUMERS] > 0
+
+    @property
+    def closed(self) -> bool:
+        """Whether the environment will not write any more frames"""
+        return bool(self.counters[CLOSED])
+
+    def finish(self):
+        """Tells the consumer that no more frames are written, it reads the pending frames and stops
+        """
+        self.counters[CLOSED] = 1
+
+    def write(self, hour: int, imported: float, year_offset: int, night: bool, bought, actions):
+        """Writes the frame of a step if a consumer is attached, without waiting for the consumer.
+        The frame is complete before the written counter shows it.
+        """
+        if(not self.active):
+            return
+        written = int(self.counters[WRITTEN])
+        self.pack(written % self.capacity, hour, imported,
+                  year_offset, night, bought, actions)
+        self.counters[WRITTEN] = written + 1
+
+    def get(self, timeout=None, latest=False):
+        """Reads the oldest frame, waits until a frame is written. Only one consumer may read
+
+        Args:
+            timeout (float, optional): seconds to wait for a frame. Defaults to waiting until a frame is written or the telemetry is finished.
+            latest (bool, optional): skips to the newest frame, the skipped frames are counted as dropped. Defaults to False.
+
+        Returns:
+            _type_: the frame as dict, see Telemetry.unpack, None if no frame was written in time or the telemetry is finished
+        """
+        start = time.perf_counter()
+        while True:
+            written = int(self.counters[WRITTEN])
+            read = int(self.counters[READ])
+            if(written > read):
+                if(latest):
+                    read = written - 1
+                elif(written - read >= self.capacity):
+                    # the oldest row is the next one the environment writes
+                    read = written - self.capacity + 1
+                frame = self.unpack(read % self.capacity)
+                # the environment may have started to overwrite the row while it was copied
+                if(int(self.counters[WRITTEN]) - read < self.capacity):
+                    self.counters[DROPPED] += read - int(self.counters[READ])
+                    self.counters[READ] = read + 1
+                    return frame
+                continue
+            if(self.closed):
+                return None
+            if(timeout is not None and time.perf_counter() - start >= timeout):
+                return None
+            time.sleep(POLL_INTERVAL)
+
+    def pending(self) -> int:
+        """Returns the amount of frames that were written but not read yet"""
+        return int(min(self.counters[WRITTEN] - self.counters[READ], self.capacity - 1))
+
+    def get_stats(self) -> dict:
+        """Returns the counters of the telemetry
+
+        Returns:
+            dict: written, dropped and pending frames and the amount of consumers
+        """
+        written, read, dropped, consumers = (int(value)
+                                             for value in self.counters[:CLOSED])
+        return {'written': written, 'dropped': dropped + max(written - read - self.capacity + 1, 0),
+                'pending': min(written - read, self.capacity - 1), 'consumers': consumers}
+
+    def close(self):
+        """Detaches from the shared memory, the owner also frees it
+        """
+        self.counters = None
+        self.frames = None
+        self.memory.close()
+        if(self.owner):
+            self.memory.unlink()
@@ -0,0 +1,155 @@
+import glob
+import os
+import queue as qu
+import threading
+import gym
+import numpy as np
+
+## PARAMETERS ##
+# steps per file
+CHUNK_STEPS = 4096
+# chunk buffers that are filled or written in turn, step only waits if the disk falls this many chunks behind
+CHUNK_BUFFERS = 3
+
+
+class TrajectoryRecorder(gym.Wrapper):
+    """Records every step of an environment into chunked columnar npz files, written by a background thread.
+    Per step it keeps episode, step, observation, action, reward and, if the environment reports them,
+    the imported energy, the battery levels after the step and the generation of the hour.
+    Memory is bounded by CHUNK_BUFFERS preallocated chunks, whatever the amount of episodes.
+
+    Args:
+        env (gym.Env): the environment
+        directory (str): directory of the chunk files chunk_000000.npz, chunk_000001.npz, ...
+        chunk_steps (int, optional): steps per file. Defaults to CHUNK_STEPS.
+    """
+
+    def __init__(self, env: gym.Env, directory: str, chunk_steps=CHUNK_STEPS):
+        super().__init__(env)
+        self.directory = os.path.normpath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.chunk_steps = chunk_steps
+        self.power_state = getattr(env.unwrapped, "get_power_state", None)
+        self.columns = self.create_columns()
+        self.free = qu.Queue()
+        for _ in range(CHUNK_BUFFERS):
+            self.free.put({name: np.zeros((chunk_steps,) + shape, dtype=dtype)
+                           for name, (shape, dtype) in self.columns.items()})
+        self.written = qu.Queue()
+        self.error = None
+        self.writer = threading.Thread(
+            target=self.write_chunks, name="trajectory-writer", daemon=True)
+        self.writer.start()
+        self.chunk = self.free.get()
+        self.chunk_index = 0
+        self.row = 0
+        self.episode = -1
+        self.step_index = 0
+
+    def create_columns(self) -> dict:
+        """Shape of a step and dtype of every column
+
+        Returns:
+            dict: (shape, dtype) by column name
+        """
+        action_space = self.env.action_space
+        columns = {'episode': ((), np.int32),
+                   'step': ((), np.int32),
+                   'observation': (self.env.observation_space.shape, np.float32),
+                   'action': (action_space.shape, action_space.dtype),
+                   'reward': ((), np.float32),
+                   'imports': ((), np.float64)}
+        if(self.power_state is not None):
+            power_state = self.power_state()
+            columns['battery'] = (np.shape(power_state['battery']), np.float64)
+            columns['generation'] = (
+                np.shape(power_state['generation']), np.float64)
+        return columns
+
+    def reset(self, **kwargs):
+        self.episode += 1
+        self.step_index = 0
+        return self.env.reset(**kwargs)
+
+    def step(self, action):
+        if(self.error is not None):
+            raise self.error
+        chunk = self.chunk
+        row = self.row
+        if(self.power_state is not None):
+            # generation of the hour the action distributes
+            chunk['generation'][row] = self.power_state()['generation']
+        observation, reward, done, info = self.env.step(action)
+        chunk['episode'][row] = self.episode
+        chunk['step'][row] = self.step_index
+        chunk['observation'][row] = observation
+        chunk['action'][row] = action
+        chunk['reward'][row] = reward
+        chunk['imports'][row] = info.get('power_bought', np.nan)
+        if(self.power_state is not None):
+            chunk['battery'][row] = self.power_state()['battery']
+        self.step_index += 1
+        self.row += 1
+        if(self.row == self.chunk_steps):
+            self.flush()
+        return observation, reward, done, info
+
+    def flush(self):
+        """Hands the recorded steps to the writer thread and continues in a free chunk
+        """
+        if(self.row == 0):
+            return
+        self.written.put((self.chunk_index, self.chunk, self.row))
+        self.chunk_index += 1
+        self.row = 0
+        self.chunk = self.free.get()
+
+    def write_chunks(self):
+        """Writes the handed chunks until close, runs in the writer thread
+        """
+        while True:
+            item = self.written.get()
+            if(item is None):
+                return
+            index, chunk, rows = item
+            try:
+                if(self.error is None):
+                    np.savez(os.path.join(self.directory, "chunk_%06d.npz" % index),
+                             **{name: column[:rows] for name, column in chunk.items()})
+            except Exception as error:
+                self.error = error
+            self.free.put(chunk)
+
+    def close(self):
+        """Writes the remaining steps, waits for the writer and closes the environment
+        """
+        if(self.writer.is_alive()):
+            self.flush()
+            self.written.put(None)
+            self.writer.join()
+        super().close()
+        if(self.error is not None):
+            raise self.error
+
+
+def load_trajectory(directory: str, columns=None) -> dict:
+    """Loads the chunks of a recorded trajectory
+
+    Args:
+        directory (str): directory of the chunk files
+        columns (list, optional): columns to load. Defaults to all.
+
+    Returns:
+        dict: the steps of all chunks by column name
+    """
+    paths = sorted(glob.glob(os.path.join(
+        os.path.normpath(directory), "chunk_*.npz")))
+    if(len(paths) == 0):
+        raise FileNotFoundError(
+            "There is no recorded trajectory in " + directory)
+    parts = {}
+    for path in paths:
+        with np.load(path) as chunk:
+            for name in (chunk.files if columns is None else columns):
+                parts.setdefault(name, []).append(chunk[name])
+    return {name: np.concatenate(part) for name, part in parts.items()}
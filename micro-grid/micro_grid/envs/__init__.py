@@ -1,4 +1,36 @@
-from micro_grid.envs.Grid_env import Grid_env
-from micro_grid.envs.Grid_env_2 import Grid_env_2
-from micro_grid.envs.Grid_env_3 import Grid_env_3
-from micro_grid.envs.Grid_env_minimal import Grid_env_minimal
+import importlib
+import sys
+import types
+
+# the environment classes are imported on first access, so importing one environment does not import the dependencies of all
+ENV_MODULES = {'Grid_env': 'micro_grid.envs.Grid_env',
+               'Grid_env_2': 'micro_grid.envs.Grid_env_2',
+               'Grid_env_3': 'micro_grid.envs.Grid_env_3',
+               'Grid_env_minimal': 'micro_grid.envs.Grid_env_minimal'}
+
+
+class EnvsModule(types.ModuleType):
+    """The package, whose environment names always refer to the classes.
+    Importing an environment module binds the module to the package under the name of its class, the class is bound instead.
+    """
+
+    def __setattr__(self, name: str, value):
+        if(name in ENV_MODULES and isinstance(value, types.ModuleType)):
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+
+def __getattr__(name: str):
+    if(name not in ENV_MODULES):
+        raise AttributeError(
+            "module " + __name__ + " has no attribute " + name)
+    # binds the class through EnvsModule.__setattr__
+    importlib.import_module(ENV_MODULES[name])
+    return globals()[name]
+
+
+def __dir__() -> list:
+    return sorted(list(globals()) + list(ENV_MODULES))
+
+
+sys.modules[__name__].__class__ = EnvsModule
@@ -1,7 +1,5 @@
 import random
 
-from torch import rand
-
 
 class Ambient:
     """The Ambient of the Environment, keeps track of timespan, weather and sun radiation as well as energy price and buying energy.
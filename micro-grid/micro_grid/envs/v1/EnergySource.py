@@ -5,6 +5,8 @@ from micro_grid.envs.v1.Ambient import Ambient
 
 
 class Energysource:
+    __slots__ = ()
+
     def __init__(self) -> None:
         pass
 
@@ -8,6 +8,7 @@ class WindGenerator(Energysource):
     Args:
         Energysource (_type_): Parent class for easier identification
     """
+    __slots__ = ('peak_power',)
 
     def __init__(self, peak_power: float):
         self.peak_power = peak_power  # kilo watt per meter per second wind
@@ -1,21 +1,61 @@
-from cmath import nan
 import random
-from time import daylight
-import pysolar.solar
 import datetime
-from tzwhere import tzwhere
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pytz
 import numpy as np
-from meteostat import Hourly
-from meteostat import Point
-import queue as qu
+from micro_grid.envs.v2.WeatherCache import WeatherCache
+from micro_grid.envs.v2.YearTableCache import YearTableCache, weather_digest
+from micro_grid.envs.v2.TimezoneResolver import resolve_timezone
+
+## PARAMETERS ##
+LATITUDE = 52.382590
+LONGITUDE = 9.717735
+# the simulated year is drawn as current year minus a random offset
+MIN_YEAR_OFFSET = 1
+MAX_YEAR_OFFSET = 20
+# numpy computes the whole year at once, pysolar hour by hour and is kept as reference
+SOLAR_BACKENDS = ("numpy", "pysolar")
+
+
+def candidate_years() -> list:
+    """Returns all years the ambient can simulate
+
+    Returns:
+        list: the years in ascending order
+    """
+    current_year = datetime.datetime.now().year
+    return list(range(current_year - MAX_YEAR_OFFSET, current_year - MIN_YEAR_OFFSET + 1))
+
+
+def episode_noise(rng: np.random.Generator, hours: int, price_fluctuation: float) -> dict:
+    """Draws the price offset and the speed of missing wind of every hour of an episode at once,
+    so an episode seeded on its own has the same prices and wind whether it is simulated alone or in a batch
+
+    Args:
+        rng (np.random.Generator): random generator of the episode
+        hours (int): amount of hours of the episode
+        price_fluctuation (float): fluctuation of the energy price in percent
+
+    Returns:
+        dict: price_offset in euro and wind in km per h for every hour
+    """
+    price_offset = np.where(rng.integers(0, 2, hours) == 0, -1.0, 1.0)
+    price_offset *= price_fluctuation * 0.01 * rng.random(hours)
+    return {'price_offset': price_offset, 'wind': rng.uniform(0, 1, hours)}
 
 
 class Ambient:
     """The Ambient of the Environment, keeps track of timespan, weather and sun radiation as well as energy price and buying energy.
+    A PhaseProfiler, if given, times the timezone lookup, the weather fetch and the sun radiation computation.
+    Years, prices and missing wind are drawn from the random module until the ambient is seeded, see seed.
+    Without load no year is drawn or loaded, e.g. for an ambient that only prepares the tables of given years.
     """
 
-    def __init__(self, total_days: float, price_fluctuation: float, energy_price=0.3262, latitude=52.382590, longitude=9.717735):
+    def __init__(self, total_days: float, price_fluctuation: float, energy_price=0.3262, latitude=LATITUDE, longitude=LONGITUDE, weather_cache=None, solar_backend="numpy", year_tables=None, year_bank=None, prefetch=False, profiler=None, load=True):
+        if(solar_backend not in SOLAR_BACKENDS):
+            raise ValueError("Unknown solar backend " + str(solar_backend) +
+                             ", expected one of " + str(SOLAR_BACKENDS))
         self.total_days = total_days
         self.hour = 0
         self.energy_price = energy_price
@@ -25,34 +65,45 @@ class Ambient:
         self.hourly_bought_energy = 0  # in euro
         self.latitude = latitude
         self.longitude = longitude
-        self.year_offset = random.randint(1, 20)
+        if(weather_cache is None):
+            weather_cache = WeatherCache()
+        self.weather_cache = weather_cache
+        if(year_tables is None):
+            year_tables = YearTableCache(weather_cache.cache_dir)
+        self.year_tables = year_tables
+        self.solar_backend = solar_backend
+        self.year_bank = year_bank
+        self.profiler = profiler
+        # random.Random of this ambient once seeded, the shared random module before
+        self.rng = random
+        if(profiler is not None):
+            start = profiler.clock()
+        if(year_bank is not None):
+            timezone_name = year_bank.timezone
+        else:
+            timezone_name = resolve_timezone(
+                self.latitude, self.longitude, weather_cache.cache_dir)
+        if(profiler is not None):
+            profiler.lap("init.timezone", start)
+        self.timezone = pytz.timezone(timezone_name)
+        # the next year is prepared in the background while the current one is simulated
+        self.prefetch = prefetch
+        self.prefetch_executor = None
+        self.prefetched = None
+        # noise of an episode with a seed of its own, see reset
+        self.noise = None
+        self.reset_stall_time = 0.0
+        self.total_reset_stall_time = 0.0
+        self.resets = 0
         self.night_hours = []
+        self.year_offset = None
+        if(not load):
+            return
+        self.year_offset = self.rng.randint(MIN_YEAR_OFFSET, MAX_YEAR_OFFSET)
         # print("Year: "+str(datetime.datetime.now().year-self.year_offset))
-        # Getting weather
-        start = datetime.datetime(
-            datetime.datetime.now().year-self.year_offset, 1, 1)
-        end = datetime.datetime(
-            datetime.datetime.now().year-self.year_offset+1, 1, 1)
-        location = Point(self.latitude, self.longitude, 0)
-        for attempt in range(10):
-            try:
-                data = Hourly(location, start, end,)
-            except:
-                print("Trying again for " + str(9 - attempt) + " times")
-            else:
-                break
-        data = data.fetch()
-        self.weather_condition = data['coco']
-        self.winds = data['wspd']
-        # Calculating sunbeam
-        tzwhere_obj = tzwhere.tzwhere()
-        timezone_str = tzwhere_obj.tzNameAt(self.latitude, self.longitude)
-        self.timezone = pytz.timezone(timezone_str)
-        self.sun_beams = []
-        for i in range(int((total_days*24)+24)):
-            self.sun_beams.append(self.calculate_sunbeam(i))
+        # Getting weather and calculating sunbeam
+        self.load_year()
         # print("Created Ambient")
-        self.queue = qu.Queue()
         # print(self.sun_beams)
         # print(np.mean(self.sun_beams))
         # print(np.std(self.sun_beams))
@@ -65,25 +116,132 @@ class Ambient:
         Changes the energy price slightly and changes the radiation.
         """
         global PRICE_FLUCTUATION
-        try:
-            self.queue.put_nowait(
-                [self.hour, self.hourly_bought_energy, self.year_offset])
-        except qu.Full:
-            pass
         self.hour += 1
         self.hourly_bought_energy = 0
-        price_offset = 1
-        if(random.randint(0, 1) == 0):
-            price_offset = -1
-        price_offset *= (self.price_fluctuation * 0.01 * random.random())
+        if(self.noise is not None):
+            price_offset = self.noise['price_offset'][self.hour]
+        else:
+            price_offset = 1
+            if(self.rng.randint(0, 1) == 0):
+                price_offset = -1
+            price_offset *= (self.price_fluctuation *
+                             0.01 * self.rng.random())
         self.actual_price = self.energy_price + price_offset
         # watt per square meter to kilo watt per square meter
         self.sunbeam = self.sun_beams[self.hour]/1000
         if(self.sunbeam > 1):
             self.sunbeam = 1
 
+    def seed(self, seed: int):
+        """Gives the ambient a random generator of its own, so ambients seeded differently draw independent years and prices
+
+        Args:
+            seed (int): The seed to be set.
+        """
+        self.rng = random.Random(seed)
+
+    def get_year(self, year_offset=None) -> int:
+        """Returns the simulated year
+
+        Args:
+            year_offset (_type_, optional): offset to the current year. Defaults to the offset of the simulated year.
+
+        Returns:
+            int: the simulated year
+        """
+        if(year_offset is None):
+            year_offset = self.year_offset
+        return datetime.datetime.now().year-year_offset
+
+    def get_table_hours(self) -> int:
+        """Returns the amount of hours the sun radiation and night tables cover
+
+        Returns:
+            int: amount of hours, one day more than the simulated timespan
+        """
+        return int((self.total_days*24)+24)
+
+    def prepare_year(self, year_offset: int) -> dict:
+        """Loads weather, sun radiation and night hours of a year without changing the ambient, so it can run in the background.
+        If a year bank is given and contains the year its shared tables are used without copying,
+        otherwise the weather comes from the weather cache and the sun tables from the year tables.
+
+        Args:
+            year_offset (int): offset of the year to the current year
+
+        Returns:
+            dict: coco, wspd, sun_beams and night_hours arrays of the year
+        """
+        year = self.get_year(year_offset)
+        profiler = self.profiler
+        if(self.year_bank is not None):
+            tables = self.year_bank.get(year)
+            if(tables is not None):
+                if(profiler is not None):
+                    profiler.count("year.bank_hits")
+                return tables
+        if(profiler is not None):
+            start = profiler.clock()
+        weather = self.weather_cache.get(self.latitude, self.longitude, year)
+        if(profiler is not None):
+            start = profiler.lap("year.weather", start)
+        hours = self.get_table_hours()
+        # the sun radiation includes the weather modifier, a refetched weather year gets new tables
+        key = (self.latitude, self.longitude, self.timezone.zone, year, hours,
+               self.solar_backend, weather_digest(weather['coco']))
+        sun_beams, night_hours = self.year_tables.get(
+            key, lambda: self.compute_sun_beams(hours, year, weather['coco']))
+        if(profiler is not None):
+            # includes the cache lookup, get_cache_stats tells whether the tables were computed
+            profiler.lap("year.sun_beams", start)
+        return {'coco': weather['coco'], 'wspd': weather['wspd'], 'sun_beams': sun_beams, 'night_hours': night_hours}
+
+    def use_year(self, tables: dict):
+        """Swaps in the tables of a prepared year
+
+        Args:
+            tables (dict): tables returned by prepare_year
+        """
+        self.weather_condition = tables['coco']
+        self.winds = tables['wspd']
+        self.sun_beams = tables['sun_beams']
+        self.night_hours = tables['night_hours']
+
+    def load_year(self):
+        """Loads weather, sun radiation and night hours of the simulated year.
+        """
+        self.use_year(self.prepare_year(self.year_offset))
+
+    def compute_sun_beams(self, hours: int, year: int, weather_condition: np.ndarray) -> tuple:
+        """Computes sun radiation and night hours for the given amount of hours with the chosen solar backend
+
+        Args:
+            hours (int): amount of hours from the start of the year
+            year (int): the year
+            weather_condition (np.ndarray): hourly weather condition codes of the year
+
+        Returns:
+            tuple: sun radiation in w per square meter and night flags for every hour
+        """
+        if(self.solar_backend == "pysolar"):
+            sun_beams = []
+            night_hours = []
+            for i in range(hours):
+                sunbeam, night = self.calculate_sun_hour(
+                    i, year, weather_condition)
+                sun_beams.append(sunbeam)
+                night_hours.append(night)
+            return sun_beams, night_hours
+        # pysolar is only imported when a year table has to be computed
+        from micro_grid.envs.v2 import SolarPosition
+        start_date = datetime.datetime(
+            year, 1, 1, 0, 0, 0, 0, tzinfo=self.timezone)
+        return SolarPosition.calculate_sunbeams(
+            self.latitude, self.longitude, start_date, hours, weather_condition)
+
     def calculate_sunbeam(self, timestep: int) -> float:
-        """Calculates the sun radiation for the given timestep
+        """Calculates the sun radiation for the given timestep of the simulated year with pysolar
+        and appends whether it is night to the night hours
 
         Args:
             timestep (int): timestep in hours 
@@ -91,8 +249,25 @@ class Ambient:
         Returns:
             float: the sun radiation in w per square meter
         """
-        start_date = datetime.datetime(datetime.datetime.now(
-        ).year-self.year_offset, 1, 1, 0, 0, 0, 0, tzinfo=self.timezone)
+        sunbeam, night = self.calculate_sun_hour(
+            timestep, self.get_year(), self.weather_condition)
+        self.night_hours.append(night)
+        return sunbeam
+
+    def calculate_sun_hour(self, timestep: int, year: int, weather_condition: np.ndarray) -> tuple:
+        """Calculates the sun radiation for the given timestep of a year with pysolar
+
+        Args:
+            timestep (int): timestep in hours 
+            year (int): the year
+            weather_condition (np.ndarray): hourly weather condition codes of the year
+
+        Returns:
+            tuple: the sun radiation in w per square meter and whether it is night
+        """
+        import pysolar.solar
+        start_date = datetime.datetime(
+            year, 1, 1, 0, 0, 0, 0, tzinfo=self.timezone)
         date = start_date + datetime.timedelta(hours=timestep)
         altitude_deg = pysolar.solar.get_altitude(
             self.latitude, self.longitude, date)
@@ -101,8 +276,9 @@ class Ambient:
         # Check whether its night
         if(radiation < 0 or altitude_deg <= 0):
             radiation = 0
-        self.night_hours.append(altitude_deg <= 0)
-        weather = self.weather_condition.iloc[self.hour]
+        weather = np.nan
+        if(timestep < len(weather_condition)):
+            weather = weather_condition[timestep]
         # Unclear sky
         modifier = 0.8
         if(weather >= 15 or weather == 9 or weather == 13 or weather == 11):
@@ -110,7 +286,7 @@ class Ambient:
         # Clear sky
         elif(weather <= 3):
             modifier = 1
-        return radiation*modifier
+        return radiation*modifier, altitude_deg <= 0
 
     def get_sunbeam(self) -> float:
         """Returns the sun radiation in kw per square meter in given time step
@@ -121,7 +297,10 @@ class Ambient:
         return self.sunbeam
 
     def get_wind(self) -> float:
-        """Returns the windspeed in m per s for the given time step
+        """Returns the windspeed in m per s for the given time step.
+        A missing measurement is replaced by a random speed, drawn with the prices of a seeded episode
+        and otherwise from the random generator of the prices, which it advances.
+        Before the weather cache missing measurements were passed on as NaN.
 
         Returns:
             float: wind speed in m per s
@@ -129,8 +308,11 @@ class Ambient:
         if(len(self.winds) <= self.hour):
             return 0
         wind = self.winds[self.hour]
-        if wind is nan:
-            wind = random.uniform(0, 1)
+        if np.isnan(wind):
+            if(self.noise is not None):
+                wind = self.noise['wind'][self.hour]
+            else:
+                wind = self.rng.uniform(0, 1)
         return wind * (5.0/18.0)
 
     def is_night(self) -> bool:
@@ -154,41 +336,98 @@ class Ambient:
         self.hourly_bought_energy += price
         return price
 
-    def get_state(self) -> list:
+    def get_cache_stats(self) -> dict:
+        """Returns the hit and miss counters of the year tables
+
+        Returns:
+            dict: memory hits, disk hits, misses and the amount of tables in memory
+        """
+        return self.year_tables.get_stats()
+
+    def get_state(self, out=None) -> list:
         """Returns the state of the ambient
 
+        Args:
+            out (np.ndarray, optional): array of 3 values the state is written into. Defaults to a new list.
+
         Returns:
             list: energy price, sun radiation and hour of day 
         """
         night = 0
         if(self.is_night()):
             night = 1
-        return [self.get_wind(), self.sunbeam, night]
+        if(out is None):
+            return [self.get_wind(), self.sunbeam, night]
+        out[0] = self.get_wind()
+        out[1] = self.sunbeam
+        out[2] = night
+        return out
 
-    def reset(self):
+    def reset(self, year=None, episode_seed=None):
         """Resets the ambient.
         Sets timestep to 0, generates new random year, checks wether and radiation for year and resets energy price.
+
+        Args:
+            year (int, optional): year to simulate, e.g. to evaluate on fixed years. Defaults to a random year.
+            episode_seed (_type_, optional): seed or np.random.SeedSequence of the prices and missing wind of the episode,
+                which are then drawn at once by episode_noise. Defaults to drawing them every step from the random generator.
         """
         self.hour = 0
+        self.noise = None
+        if(episode_seed is not None):
+            self.noise = episode_noise(np.random.default_rng(episode_seed),
+                                       self.get_table_hours(), self.price_fluctuation)
         self.actual_price = self.energy_price
         self.sunbeam = 0
         self.hourly_bought_energy = 0  # in euro
-        self.year_offset = random.randint(1, 20)
-        # Getting weather
+        # Getting weather and calculating sunbeam, the timezone of the location was resolved once in __init__
+        start = time.perf_counter()
+        if(year is not None):
+            # a prefetched year is kept for the next reset without fixed year
+            self.year_offset = datetime.datetime.now().year - year
+            self.load_year()
+        elif(self.prefetched is not None):
+            # the year was drawn and prepared during the last episode
+            self.year_offset, prepared = self.prefetched
+            self.prefetched = None
+            self.use_year(prepared.result())
+        else:
+            self.year_offset = self.rng.randint(
+                MIN_YEAR_OFFSET, MAX_YEAR_OFFSET)
+            self.load_year()
         # print("Year: "+str(datetime.datetime.now().year-self.year_offset))
-        start = datetime.datetime(
-            datetime.datetime.now().year-self.year_offset, 1, 1)
-        end = datetime.datetime(
-            datetime.datetime.now().year-self.year_offset+1, 1, 1)
-        location = Point(self.latitude, self.longitude, 0)
-        data = Hourly(location, start, end,)
-        data = data.fetch()
-        self.weather_condition = data['coco']
-        # Calculating sunbeam
-        tzwhere_obj = tzwhere.tzwhere()
-        timezone_str = tzwhere_obj.tzNameAt(self.latitude, self.longitude)
-        self.timezone = pytz.timezone(timezone_str)
-        self.sun_beams = []
-        for i in range(int((self.total_days*24)+1)):
-            self.sun_beams.append(self.calculate_sunbeam(i))
-        self.queue = qu.Queue()
+        self.reset_stall_time = time.perf_counter() - start
+        self.total_reset_stall_time += self.reset_stall_time
+        if(self.profiler is not None):
+            self.profiler.add("reset.year", self.reset_stall_time)
+        self.resets += 1
+        if(self.prefetch and self.prefetched is None):
+            self.prefetch_year()
+
+    def prefetch_year(self):
+        """Draws the year of the next episode and prepares it in a background thread
+        """
+        if(self.prefetch_executor is None):
+            self.prefetch_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="ambient-prefetch")
+        year_offset = self.rng.randint(MIN_YEAR_OFFSET, MAX_YEAR_OFFSET)
+        self.prefetched = (year_offset, self.prefetch_executor.submit(
+            self.prepare_year, year_offset))
+
+    def get_reset_stats(self) -> dict:
+        """Returns how long resets waited for the year to be ready
+
+        Returns:
+            dict: stall time of the last reset, total stall time in seconds and amount of resets
+        """
+        return {"last_stall": self.reset_stall_time, "total_stall": self.total_reset_stall_time, "resets": self.resets}
+
+    def close(self):
+        """Stops the background preparation of the next year
+        """
+        if(self.prefetched is not None):
+            self.prefetched[1].cancel()
+            self.prefetched = None
+        if(self.prefetch_executor is not None):
+            self.prefetch_executor.shutdown(wait=False)
+            self.prefetch_executor = None
@@ -1,10 +1,61 @@
+import numpy as np
+
+
+class BatteryBank:
+    """Capacity and fuel of many batteries as numpy arrays, e.g. of all buildings of a village.
+    BankBattery objects are views into the bank, so the array engine and the building objects share the same fuel.
+
+    Args:
+        capacities (list): capacity of every battery in kWh
+    """
+    __slots__ = ('capacity', 'fuel')
+
+    def __init__(self, capacities: list):
+        self.capacity = np.array(capacities, dtype=np.float64)
+        self.fuel = np.zeros(len(self.capacity))
+
+    def __len__(self) -> int:
+        return len(self.capacity)
+
+    def batteries(self) -> list:
+        """Creates a battery view for every battery of the bank
+
+        Returns:
+            list: the batteries
+        """
+        return [BankBattery(self, index) for index in range(len(self))]
+
+    @staticmethod
+    def of(batteries: list):
+        """Returns the bank the batteries are views into, if they are all the batteries of a single bank in order
+
+        Args:
+            batteries (list): the batteries
+
+        Returns:
+            _type_: the bank, None if the batteries do not form one bank
+        """
+        if(len(batteries) == 0):
+            return None
+        bank = getattr(batteries[0], 'bank', None)
+        if(bank is None or len(bank) != len(batteries)):
+            return None
+        for index, battery in enumerate(batteries):
+            if(getattr(battery, 'bank', None) is not bank or battery.index != index):
+                return None
+        return bank
 
 
 class Battery:
-    """Structure representing the battery capacity of a buidling
+    """Structure representing the battery capacity of a buidling.
+    Capacity and fuel are plain floats, a BankBattery keeps them in a BatteryBank instead.
+
+    Args:
+        capacity (float, optional): capacity in kWh. Defaults to 0.
     """
+    __slots__ = ('capacity', 'fuel')
 
-    def __init__(self, capacity: float):
+    def __init__(self, capacity=0.0):
         self.capacity = capacity  # kWh
         self.fuel = 0
 
@@ -27,11 +78,12 @@ class Battery:
             float: Power that was taken
         """
         work = power * 1  # kW * hour
-        if self.fuel >= work:
-            self.fuel -= work
+        fuel = self.fuel
+        if fuel >= work:
+            self.fuel = fuel - work
             return work
         else:
-            work = self.fuel
+            work = fuel
             self.fuel = 0
         return work
     # Loads battery
@@ -44,11 +96,41 @@ class Battery:
             power (float): power to be loaded onto battery
         """
         work = power * 1
-        self.fuel += work
-        if(self.fuel > self.capacity):
-            self.fuel = self.capacity
+        self.fuel = min(self.fuel + work, self.capacity)
 
     def reset(self):
         """Resets battery level.
         """
         self.fuel = 0
+
+
+class BankBattery(Battery):
+    """A battery whose capacity and fuel are an entry of a BatteryBank.
+    Every access goes through the bank arrays, which is slower than a Battery,
+    so only villages simulated by the array engine use it.
+
+    Args:
+        bank (BatteryBank): the bank the battery belongs to
+        index (int): index of the battery in the bank
+    """
+    __slots__ = ('bank', 'index')
+
+    def __init__(self, bank: BatteryBank, index: int):
+        self.bank = bank
+        self.index = index
+
+    @property
+    def capacity(self) -> float:
+        return self.bank.capacity.item(self.index)  # kWh
+
+    @capacity.setter
+    def capacity(self, capacity: float):
+        self.bank.capacity[self.index] = capacity
+
+    @property
+    def fuel(self) -> float:
+        return self.bank.fuel.item(self.index)
+
+    @fuel.setter
+    def fuel(self, fuel: float):
+        self.bank.fuel[self.index] = fuel
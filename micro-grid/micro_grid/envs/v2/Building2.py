@@ -3,7 +3,6 @@ from micro_grid.envs.v2.Solar2 import Solar
 from micro_grid.envs.v1.WindGenerator import WindGenerator
 from micro_grid.envs.v2.Battery2 import Battery
 from micro_grid.envs.v1.EnergySource import Energysource
-import queue as qu
 import random
 
 
@@ -21,7 +20,6 @@ class Building:
         self.inhabs = inhabs
         self.ambient = ambient
         self.hourly_power_given = 0
-        self.queue = qu.Queue()
 
     def sum_sources(self, ambient=None) -> float:
         """Sums up all of the available power generated by available energy sources
@@ -114,6 +112,9 @@ class Building:
     def step(self):
         """Performs a time step for the building.
         Checks if energy needs to be bought and resets given power.
+
+        Returns:
+            float: The bought power in euro
         """
         bought_power = 0
         # Has to buy power
@@ -130,14 +131,10 @@ class Building:
             pw -= self.hourly_power_given
             self.battery.get_power(pw)
         self.hourly_power_given = 0
-        try:
-            self.queue.put_nowait(bought_power)
-        except qu.Full:
-            pass
+        return bought_power
 
     def reset(self):
         """Resets the building and battery of the building
         """
         self.battery.reset()
         self.hourly_power_given = 0
-        self.queue = qu.Queue()
@@ -0,0 +1,181 @@
+import datetime
+import numpy as np
+import pysolar
+from pysolar import constants
+from pysolar import radiation
+from pysolar import solar
+from pysolar import solartime as stime
+
+## PARAMETERS ##
+SECONDS_PER_HOUR = 3600
+# maximal absolute difference in w per square meter to the scalar pysolar computation
+TOLERANCE = 1e-6
+
+
+def check_numeric_mode():
+    """The pysolar functions are only vectorized if pysolar uses numpy, which is its default when numpy is installed.
+
+    Raises:
+        RuntimeError: If pysolar was switched to the math module
+    """
+    if(pysolar.numeric.current_mod != 'numpy'):
+        raise RuntimeError(
+            "Vectorized solar computation needs pysolar in numpy mode, call pysolar.use_numpy()")
+
+
+def get_time_corrections(timestamps: np.ndarray) -> tuple:
+    """Returns the leap seconds and delta t of pysolar for every timestamp.
+    Both only change at the start of a month, so pysolar is asked once per month.
+
+    Args:
+        timestamps (np.ndarray): utc timestamps in seconds
+
+    Returns:
+        tuple: leap seconds and delta t in seconds for every timestamp
+    """
+    months = timestamps.astype('datetime64[s]').astype('datetime64[M]')
+    unique_months, inverse = np.unique(months, return_inverse=True)
+    leap_seconds = np.empty(len(unique_months))
+    delta_t = np.empty(len(unique_months))
+    for index, month in enumerate(unique_months):
+        when = datetime.datetime.combine(
+            month.astype(datetime.date), datetime.time(tzinfo=datetime.timezone.utc))
+        leap_seconds[index] = stime.get_leap_seconds(when)
+        delta_t[index] = stime.get_delta_t(when)
+    return leap_seconds[inverse], delta_t[inverse]
+
+
+def get_julian_days(timestamps: np.ndarray) -> tuple:
+    """Vectorized version of pysolar.solartime.get_julian_solar_day and get_julian_ephemeris_day
+
+    Args:
+        timestamps (np.ndarray): utc timestamps in seconds
+
+    Returns:
+        tuple: julian solar days and julian ephemeris days
+    """
+    leap_seconds, delta_t = get_time_corrections(timestamps)
+    # same order of operations as pysolar to get the same rounding
+    jd = (timestamps + leap_seconds + stime.tt_offset - delta_t) / \
+        stime.seconds_per_day + stime.gregorian_day_offset + stime.julian_day_offset
+    jde = (timestamps + leap_seconds + stime.tt_offset) / \
+        stime.seconds_per_day + stime.gregorian_day_offset + stime.julian_day_offset
+    return jd, jde
+
+
+def get_altitudes(latitude_deg: float, longitude_deg: float, timestamps: np.ndarray, elevation=0,
+                  temperature=constants.standard_temperature, pressure=constants.standard_pressure) -> np.ndarray:
+    """Vectorized version of pysolar.solar.get_altitude.
+    Reuses the pysolar functions on arrays, only the julian days are computed here.
+
+    Args:
+        latitude_deg (float): latitude of the location
+        longitude_deg (float): longitude of the location
+        timestamps (np.ndarray): utc timestamps in seconds
+
+    Returns:
+        np.ndarray: altitude of the sun in degrees for every timestamp
+    """
+    check_numeric_mode()
+    # location-dependent calculations
+    projected_radial_distance = solar.get_projected_radial_distance(
+        elevation, latitude_deg)
+    projected_axial_distance = solar.get_projected_axial_distance(
+        elevation, latitude_deg)
+    # time-dependent calculations
+    jd, jde = get_julian_days(np.asarray(timestamps, dtype=np.float64))
+    jce = stime.get_julian_ephemeris_century(jde)
+    jme = stime.get_julian_ephemeris_millennium(jce)
+    geocentric_latitude = solar.get_geocentric_latitude(jme)
+    geocentric_longitude = solar.get_geocentric_longitude(jme)
+    sun_earth_distance = solar.get_sun_earth_distance(jme)
+    aberration_correction = solar.get_aberration_correction(sun_earth_distance)
+    equatorial_horizontal_parallax = solar.get_equatorial_horizontal_parallax(
+        sun_earth_distance)
+    nutation = solar.get_nutation(jce)
+    apparent_sidereal_time = solar.get_apparent_sidereal_time(
+        jd, jme, nutation)
+    true_ecliptic_obliquity = solar.get_true_ecliptic_obliquity(jme, nutation)
+    # calculations dependent on location and time
+    apparent_sun_longitude = solar.get_apparent_sun_longitude(
+        geocentric_longitude, nutation, aberration_correction)
+    geocentric_sun_right_ascension = solar.get_geocentric_sun_right_ascension(
+        apparent_sun_longitude, true_ecliptic_obliquity, geocentric_latitude)
+    geocentric_sun_declination = solar.get_geocentric_sun_declination(
+        apparent_sun_longitude, true_ecliptic_obliquity, geocentric_latitude)
+    local_hour_angle = solar.get_local_hour_angle(
+        apparent_sidereal_time, longitude_deg, geocentric_sun_right_ascension)
+    parallax_sun_right_ascension = solar.get_parallax_sun_right_ascension(
+        projected_radial_distance, equatorial_horizontal_parallax, local_hour_angle, geocentric_sun_declination)
+    topocentric_local_hour_angle = solar.get_topocentric_local_hour_angle(
+        local_hour_angle, parallax_sun_right_ascension)
+    topocentric_sun_declination = solar.get_topocentric_sun_declination(
+        geocentric_sun_declination, projected_axial_distance, equatorial_horizontal_parallax, parallax_sun_right_ascension, local_hour_angle)
+    topocentric_elevation_angle = solar.get_topocentric_elevation_angle(
+        latitude_deg, topocentric_sun_declination, topocentric_local_hour_angle)
+    refraction_correction = solar.get_refraction_correction(
+        pressure, temperature, topocentric_elevation_angle)
+    return topocentric_elevation_angle + refraction_correction
+
+
+def get_radiations_direct(timestamps: np.ndarray, altitudes: np.ndarray) -> np.ndarray:
+    """Vectorized version of pysolar.radiation.get_radiation_direct
+
+    Args:
+        timestamps (np.ndarray): utc timestamps in seconds
+        altitudes (np.ndarray): altitude of the sun in degrees
+
+    Returns:
+        np.ndarray: direct radiation in w per square meter, 0 at night
+    """
+    dates = np.asarray(timestamps).astype('datetime64[s]')
+    days = (dates.astype('datetime64[D]') -
+            dates.astype('datetime64[Y]')).astype(int) + 1
+    flux = radiation.get_apparent_extraterrestrial_flux(days)
+    optical_depth = radiation.get_optical_depth(days)
+    daytime = altitudes > 0
+    # only evaluated at day, the air mass ratio diverges at the horizon
+    air_mass_ratio = 1 / np.sin(np.radians(np.where(daytime, altitudes, 90)))
+    return np.where(daytime, flux * np.exp(-1 * optical_depth * air_mass_ratio), 0.0)
+
+
+def get_weather_modifiers(weather_condition: np.ndarray) -> np.ndarray:
+    """Returns how much of the sun radiation passes the weather.
+    Clear sky passes everything, unclear sky 80% and bad weather 50%.
+
+    Args:
+        weather_condition (np.ndarray): meteostat weather condition codes, nan if unknown
+
+    Returns:
+        np.ndarray: the modifier for every hour
+    """
+    weather = np.asarray(weather_condition, dtype=np.float64)
+    bad_weather = (weather >= 15) | (weather == 9) | (
+        weather == 13) | (weather == 11)
+    return np.where(bad_weather, 0.5, np.where(weather <= 3, 1.0, 0.8))
+
+
+def calculate_sunbeams(latitude: float, longitude: float, start_date: datetime.datetime, hours: int, weather_condition: np.ndarray) -> tuple:
+    """Calculates the sun radiation and night hours for consecutive hours in one array operation.
+    Same as calling Ambient.calculate_sunbeam for every hour, up to TOLERANCE.
+
+    Args:
+        latitude (float): latitude of the location
+        longitude (float): longitude of the location
+        start_date (datetime.datetime): timezone aware start of the first hour
+        hours (int): amount of hours
+        weather_condition (np.ndarray): hourly weather condition codes, hours past its end count as unknown
+
+    Returns:
+        tuple: sun radiation in w per square meter and night flags, both with one entry per hour
+    """
+    timestamps = start_date.timestamp() + SECONDS_PER_HOUR * \
+        np.arange(hours, dtype=np.float64)
+    altitudes = get_altitudes(latitude, longitude, timestamps)
+    radiations = get_radiations_direct(timestamps, altitudes)
+    night_hours = altitudes <= 0
+    radiations[(radiations < 0) | night_hours] = 0
+    weather = np.full(hours, np.nan)
+    known = min(hours, len(weather_condition))
+    weather[:known] = weather_condition[:known]
+    return radiations * get_weather_modifiers(weather), night_hours
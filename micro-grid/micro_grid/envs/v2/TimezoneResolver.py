@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, concurrent writers may lose an entry there, which is resolved again
+    fcntl = None
+from micro_grid.envs.v2.WeatherCache import default_cache_dir
+
+## PARAMETERS ##
+TIMEZONE_FILE = "timezones.json"
+# held while the timezone file is read and rewritten, so concurrent workers do not drop each other's entries
+LOCK_FILE = TIMEZONE_FILE + ".lock"
+
+# timezone names by location, shared by all ambients of the process
+timezones = {}
+
+
+def location_key(latitude: float, longitude: float) -> str:
+    """Returns the key of a location in the timezone memo
+
+    Returns:
+        str: the rounded coordinates
+    """
+    return "{:.4f}_{:.4f}".format(latitude, longitude)
+
+
+def load_timezones(cache_dir: str) -> dict:
+    """Loads the persisted timezone names of the cache directory
+
+    Args:
+        cache_dir (str): the cache directory
+
+    Returns:
+        dict: timezone names by location key, empty if nothing was persisted yet
+    """
+    path = os.path.join(cache_dir, TIMEZONE_FILE)
+    if(not os.path.isfile(path)):
+        return {}
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def store_timezone(cache_dir: str, key: str, timezone_name: str):
+    """Adds a timezone name to the persisted timezone names of the cache directory
+
+    Args:
+        cache_dir (str): the cache directory
+        key (str): location key
+        timezone_name (str): the timezone name of the location
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, TIMEZONE_FILE)
+    with open(os.path.join(cache_dir, LOCK_FILE), 'a') as lock:
+        if(fcntl is not None):
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        stored = load_timezones(cache_dir)
+        stored[key] = timezone_name
+        # a unique temporary file, so readers without the lock never see a partial file
+        descriptor, tmp_path = tempfile.mkstemp(
+            dir=cache_dir, prefix=TIMEZONE_FILE + ".", suffix=".tmp")
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump(stored, file, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+        # the lock is released when the lock file is closed
+
+
+def resolve_timezone(latitude: float, longitude: float, cache_dir=None) -> str:
+    """Returns the timezone name of a location.
+    Looks in the memo of the process first, then in the cache directory.
+    Only on a miss tzwhere is imported and its polygon dataset loaded, the result is persisted.
+
+    Args:
+        latitude (float): latitude of the location
+        longitude (float): longitude of the location
+        cache_dir (_type_, optional): cache directory of the persisted timezones. Defaults to None.
+
+    Raises:
+        ValueError: If the location has no timezone
+
+    Returns:
+        str: the timezone name, e.g. Europe/Berlin
+    """
+    key = location_key(latitude, longitude)
+    if(key in timezones):
+        return timezones[key]
+    if(cache_dir is None):
+        cache_dir = default_cache_dir()
+    timezone_name = load_timezones(cache_dir).get(key)
+    if(timezone_name is None):
+        from tzwhere import tzwhere
+        timezone_name = tzwhere.tzwhere().tzNameAt(latitude, longitude)
+        if(timezone_name is None):
+            raise ValueError("No timezone found for " +
+                             str((latitude, longitude)))
+        store_timezone(cache_dir, key, timezone_name)
+    timezones[key] = timezone_name
+    return timezone_name
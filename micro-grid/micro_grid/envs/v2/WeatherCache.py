@@ -0,0 +1,197 @@
+import argparse
+import datetime
+import os
+import tempfile
+import numpy as np
+
+## PARAMETERS ##
+CACHE_DIR = os.path.join("~", ".cache", "micro_grid")
+CACHE_DIR_ENV = "MICRO_GRID_CACHE_DIR"
+OFFLINE_ENV = "MICRO_GRID_OFFLINE"
+# weather columns that are kept from the meteostat data, in storage order
+COLUMNS = ("coco", "wspd")
+FETCH_ATTEMPTS = 10
+
+
+def default_cache_dir() -> str:
+    """Returns the cache directory, can be overwritten with the MICRO_GRID_CACHE_DIR environment variable
+
+    Returns:
+        str: path of the cache directory
+    """
+    return os.path.expanduser(os.environ.get(CACHE_DIR_ENV, CACHE_DIR))
+
+
+def default_offline() -> bool:
+    """Checks whether the MICRO_GRID_OFFLINE environment variable enables the offline mode
+
+    Returns:
+        bool: True if only the cache may be used
+    """
+    return os.environ.get(OFFLINE_ENV, "").lower() in ("1", "true", "yes")
+
+
+def save_atomic(path: str, data: np.ndarray):
+    """Saves an array as .npy file, it is written to a unique temporary file next to its destination and moved in place,
+    so concurrent readers never see a partial file and concurrent writers, processes or threads, never share a temporary file.
+
+    Args:
+        path (str): destination of the file
+        data (np.ndarray): the array
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    descriptor, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            np.save(file, data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class WeatherCache:
+    """On-disk cache of the hourly weather of a location and year.
+    Every (latitude, longitude, year) is stored as one columnar .npy file, one row per weather column,
+    which is memory mapped on load. In offline mode meteostat is never contacted.
+    """
+
+    def __init__(self, cache_dir=None, offline=None):
+        if(cache_dir is None):
+            cache_dir = default_cache_dir()
+        if(offline is None):
+            offline = default_offline()
+        self.cache_dir = os.path.normpath(cache_dir)
+        self.offline = offline
+
+    def path(self, latitude: float, longitude: float, year: int) -> str:
+        """Returns the path of the cache file of a location and year
+
+        Args:
+            latitude (float): latitude of the location
+            longitude (float): longitude of the location
+            year (int): the year of the weather data
+
+        Returns:
+            str: path of the cache file
+        """
+        location = "{:.4f}_{:.4f}".format(latitude, longitude)
+        return os.path.join(self.cache_dir, "weather", location, str(year) + ".npy")
+
+    def contains(self, latitude: float, longitude: float, year: int) -> bool:
+        """Checks whether the weather of a location and year is cached
+
+        Returns:
+            bool: True if cached
+        """
+        return os.path.isfile(self.path(latitude, longitude, year))
+
+    def load(self, latitude: float, longitude: float, year: int) -> dict:
+        """Loads the cached weather of a location and year
+
+        Returns:
+            dict: read only hourly arrays by column name
+        """
+        data = np.load(self.path(latitude, longitude, year), mmap_mode='r')
+        return {column: data[index] for index, column in enumerate(COLUMNS)}
+
+    def store(self, latitude: float, longitude: float, year: int, weather: dict):
+        """Writes the weather of a location and year into the cache, see save_atomic
+
+        Args:
+            weather (dict): hourly values by column name
+        """
+        data = np.stack([np.asarray(weather[column], dtype=np.float64)
+                         for column in COLUMNS])
+        save_atomic(self.path(latitude, longitude, year), data)
+
+    def fetch(self, latitude: float, longitude: float, year: int) -> dict:
+        """Downloads the hourly weather of a location and year from meteostat
+
+        Returns:
+            dict: hourly arrays by column name
+        """
+        from meteostat import Hourly
+        from meteostat import Point
+        start = datetime.datetime(year, 1, 1)
+        end = datetime.datetime(year+1, 1, 1)
+        location = Point(latitude, longitude, 0)
+        for attempt in range(FETCH_ATTEMPTS):
+            try:
+                data = Hourly(location, start, end,).fetch()
+            except Exception:
+                if(attempt == FETCH_ATTEMPTS - 1):
+                    raise
+                print("Trying again for " +
+                      str(FETCH_ATTEMPTS - 1 - attempt) + " times")
+            else:
+                break
+        return {column: data[column].to_numpy(dtype=np.float64) for column in COLUMNS}
+
+    def get(self, latitude: float, longitude: float, year: int) -> dict:
+        """Returns the weather of a location and year, fetches and caches it on a cache miss
+
+        Raises:
+            FileNotFoundError: If in offline mode and the weather is not cached
+
+        Returns:
+            dict: read only hourly arrays by column name
+        """
+        if(not self.contains(latitude, longitude, year)):
+            if(self.offline):
+                raise FileNotFoundError(
+                    "No cached weather for " + str((latitude, longitude, year)) + " in " + self.cache_dir +
+                    ", warm up the cache with: python -m micro_grid.envs.v2.WeatherCache")
+            self.store(latitude, longitude, year,
+                       self.fetch(latitude, longitude, year))
+        return self.load(latitude, longitude, year)
+
+    def warm(self, latitude: float, longitude: float, years) -> list:
+        """Fills the cache for a location and several years
+
+        Args:
+            years (_type_): iterable of years
+
+        Returns:
+            list: the years that had to be fetched
+        """
+        fetched = []
+        for year in years:
+            if(not self.contains(latitude, longitude, year)):
+                self.store(latitude, longitude, year,
+                           self.fetch(latitude, longitude, year))
+                fetched.append(year)
+        return fetched
+
+
+def main():
+    from micro_grid.envs.v2.Ambient2 import LATITUDE, LONGITUDE, candidate_years
+    from micro_grid.envs.v2.TimezoneResolver import resolve_timezone
+    years = candidate_years()
+    parser = argparse.ArgumentParser(
+        prog="WeatherCache", usage="python -m micro_grid.envs.v2.WeatherCache",
+        description="Fetches the weather for all years the environment can sample and the timezone of the location into the cache.")
+    parser.add_argument("--latitude", type=float, default=LATITUDE,
+                        help="Latitude of the location. Default: " + str(LATITUDE))
+    parser.add_argument("--longitude", type=float, default=LONGITUDE,
+                        help="Longitude of the location. Default: " + str(LONGITUDE))
+    parser.add_argument("--start", type=int, default=years[0],
+                        help="First year to fetch. Default: " + str(years[0]))
+    parser.add_argument("--end", type=int, default=years[-1],
+                        help="Last year to fetch. Default: " + str(years[-1]))
+    parser.add_argument("--cache_dir", default=None,
+                        help="Cache directory. Default: " + CACHE_DIR + " or $" + CACHE_DIR_ENV)
+    args = parser.parse_args()
+    cache = WeatherCache(args.cache_dir, offline=False)
+    fetched = cache.warm(args.latitude, args.longitude,
+                         range(args.start, args.end + 1))
+    # the timezone is needed offline as well
+    timezone_name = resolve_timezone(
+        args.latitude, args.longitude, cache.cache_dir)
+    print("Fetched " + str(len(fetched)) + " years into " +
+          cache.cache_dir + ", timezone: " + timezone_name)
+
+
+if __name__ == "__main__":
+    main()
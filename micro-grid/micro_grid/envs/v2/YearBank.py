@@ -0,0 +1,123 @@
+import datetime
+from multiprocessing import shared_memory
+import numpy as np
+from micro_grid.envs.v2.Ambient2 import Ambient, candidate_years
+
+## PARAMETERS ##
+# float tables, stored in this order in front of the night flags
+FLOAT_TABLES = ("sun_beams", "coco", "wspd")
+
+
+class YearBank:
+    """Weather, sun radiation and night tables of all candidate years in one shared memory block.
+    The parent process creates the bank once, every worker attaches to it and its ambients use the tables without copying.
+    Passing the bank to a subprocess, e.g. as keyword argument of gym.make, only sends its spec.
+    """
+
+    def __init__(self, spec: dict, memory: shared_memory.SharedMemory, owner: bool):
+        self.spec = spec
+        self.memory = memory
+        self.owner = owner
+        self.timezone = spec['timezone']
+        self.years = spec['years']
+        n_years = len(self.years)
+        hours = spec['hours']
+        self.floats = np.ndarray(
+            (n_years, len(FLOAT_TABLES), hours), dtype=np.float64, buffer=memory.buf)
+        self.nights = np.ndarray((n_years, hours), dtype=np.bool_,
+                                 buffer=memory.buf, offset=self.floats.nbytes)
+        if(not owner):
+            self.floats.flags.writeable = False
+            self.nights.flags.writeable = False
+
+    @classmethod
+    def create(cls, ambient: Ambient, years=None):
+        """Creates a bank with the tables of an ambient for the given years.
+        The tables are loaded through the caches of the ambient, its simulated year is restored afterwards.
+
+        Args:
+            ambient (Ambient): ambient that defines location, timespan and solar backend
+            years (_type_, optional): years to put into the bank. Defaults to all years the ambient can sample.
+
+        Returns:
+            YearBank: the bank, owning the shared memory
+        """
+        if(years is None):
+            years = candidate_years()
+        years = list(years)
+        hours = ambient.get_table_hours()
+        float_bytes = len(years) * len(FLOAT_TABLES) * hours * 8
+        memory = shared_memory.SharedMemory(
+            create=True, size=float_bytes + len(years) * hours)
+        spec = {'name': memory.name, 'years': years, 'hours': hours, 'timezone': ambient.timezone.zone,
+                'weather_lengths': []}
+        bank = cls(spec, memory, owner=True)
+        year_offset, year_bank = ambient.year_offset, ambient.year_bank
+        ambient.year_bank = None
+        try:
+            for index, year in enumerate(years):
+                ambient.year_offset = datetime.datetime.now().year - year
+                ambient.load_year()
+                # hours past the weather data are unknown weather
+                bank.floats[index, 1:] = np.nan
+                weather_length = len(ambient.weather_condition)
+                bank.floats[index, 0] = ambient.sun_beams
+                bank.floats[index, 1, :weather_length] = ambient.weather_condition
+                bank.floats[index, 2, :weather_length] = ambient.winds
+                bank.nights[index] = ambient.night_hours
+                spec['weather_lengths'].append(weather_length)
+        except Exception:
+            bank.close()
+            raise
+        finally:
+            ambient.year_offset, ambient.year_bank = year_offset, year_bank
+        ambient.load_year()
+        return bank
+
+    @classmethod
+    def attach(cls, spec: dict):
+        """Attaches to the bank described by the spec of a bank created in another process
+
+        Args:
+            spec (dict): spec of the bank
+
+        Returns:
+            YearBank: read only view of the bank
+        """
+        try:
+            memory = shared_memory.SharedMemory(name=spec['name'], track=False)
+        except TypeError:
+            # python < 3.13 always tracks attached shared memory
+            memory = shared_memory.SharedMemory(name=spec['name'])
+        return cls(spec, memory, owner=False)
+
+    def __reduce__(self):
+        return (YearBank.attach, (self.spec,))
+
+    def get(self, year: int):
+        """Returns views of the tables of a year
+
+        Args:
+            year (int): the year
+
+        Returns:
+            _type_: dict with sun_beams, night_hours, coco and wspd arrays, None if the year is not in the bank
+        """
+        if(year not in self.years):
+            return None
+        index = self.years.index(year)
+        weather_length = self.spec['weather_lengths'][index]
+        return {'sun_beams': self.floats[index, 0],
+                'coco': self.floats[index, 1, :weather_length],
+                'wspd': self.floats[index, 2, :weather_length],
+                'night_hours': self.nights[index]}
+
+    def close(self):
+        """Detaches from the shared memory, the owner also frees it.
+        Ambients must not use the bank afterwards.
+        """
+        self.floats = None
+        self.nights = None
+        self.memory.close()
+        if(self.owner):
+            self.memory.unlink()
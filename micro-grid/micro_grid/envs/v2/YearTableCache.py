@@ -0,0 +1,105 @@
+import collections
+import hashlib
+import os
+import threading
+import numpy as np
+from micro_grid.envs.v2.WeatherCache import default_cache_dir, save_atomic
+
+## PARAMETERS ##
+# enough to keep every year the ambient can sample in memory
+MAX_SIZE = 20
+
+
+def weather_digest(weather_condition: np.ndarray) -> str:
+    """Returns a short hash of the hourly weather condition codes a sun radiation table was computed from,
+    so tables of a refetched weather year are not mixed up with the old ones
+
+    Args:
+        weather_condition (np.ndarray): hourly weather condition codes of the year
+
+    Returns:
+        str: the first 16 hex digits of the sha256
+    """
+    data = np.ascontiguousarray(weather_condition, dtype=np.float64)
+    return hashlib.sha256(data.tobytes()).hexdigest()[:16]
+
+
+class YearTableCache:
+    """Memo of the hourly sun radiation and night tables of a year.
+    Tables are kept in a LRU bounded in-process memo and stored on disk next to the weather cache,
+    so other processes and later runs only have to load them.
+    The memo and the counters are guarded by a lock, the ambient prefetches years from a background thread.
+    """
+
+    def __init__(self, cache_dir=None, max_size=MAX_SIZE):
+        if(cache_dir is None):
+            cache_dir = default_cache_dir()
+        self.cache_dir = os.path.normpath(cache_dir)
+        self.max_size = max_size
+        self.tables = collections.OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def path(self, key: tuple) -> str:
+        """Returns the path of the table file of a key
+
+        Args:
+            key (tuple): (latitude, longitude, timezone name, year, hours, solar backend, weather digest)
+
+        Returns:
+            str: path of the table file
+        """
+        latitude, longitude, timezone, year, hours, backend, weather = key
+        location = "{:.4f}_{:.4f}".format(latitude, longitude)
+        name = "{}_{}_{}_{}.npy".format(year, hours, backend, weather)
+        return os.path.join(self.cache_dir, "sun", location, timezone.replace("/", "-"), name)
+
+    def get(self, key: tuple, compute) -> tuple:
+        """Returns the tables of a key, computes and stores them on a miss.
+        The tables are loaded or computed outside of the lock, two threads missing the same key both compute it.
+
+        Args:
+            key (tuple): (latitude, longitude, timezone name, year, hours, solar backend, weather digest)
+            compute (_type_): function without arguments returning sun radiation and night flags
+
+        Returns:
+            tuple: read only sun radiation and night flag arrays
+        """
+        with self.lock:
+            if(key in self.tables):
+                self.hits += 1
+                self.tables.move_to_end(key)
+                return self.tables[key]
+        path = self.path(key)
+        if(os.path.isfile(path)):
+            data = np.load(path, mmap_mode='r')
+            computed = False
+        else:
+            sun_beams, night_hours = compute()
+            data = np.stack([np.asarray(sun_beams, dtype=np.float64),
+                             np.asarray(night_hours, dtype=np.float64)])
+            save_atomic(path, data)
+            computed = True
+        tables = (data[0], data[1].astype(bool))
+        for table in tables:
+            table.flags.writeable = False
+        with self.lock:
+            if(computed):
+                self.misses += 1
+            else:
+                self.disk_hits += 1
+            self.tables[key] = tables
+            if(len(self.tables) > self.max_size):
+                self.tables.popitem(last=False)
+        return tables
+
+    def get_stats(self) -> dict:
+        """Returns the hit and miss counters, e.g. to record them in training logs
+
+        Returns:
+            dict: memory hits, disk hits, misses and the amount of tables in memory
+        """
+        with self.lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "size": len(self.tables)}
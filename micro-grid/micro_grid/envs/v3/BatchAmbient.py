@@ -0,0 +1,212 @@
+import datetime
+import numpy as np
+from micro_grid.envs.v2.Ambient2 import Ambient, candidate_years, episode_noise
+
+
+class BatchAmbient:
+    """The ambients of a batch of environments, every environment simulates its own year and hour.
+    The tables of a year are loaded once through a single Ambient, with its weather cache, year tables and year bank,
+    and shared by all environments that simulate this year.
+    The prices and missing wind of every environment are drawn for its whole episode on reset, see episode_noise,
+    from its own episode seed if one is selected, so its episode does not depend on the other environments of the batch.
+
+    Args:
+        n_envs (int): amount of environments
+        total_days (float): simulated timespan in days
+        price_fluctuation (float): fluctuation of the energy price in percent
+        energy_price (float, optional): energy price in euro per kwh. Defaults to 0.3262.
+        rng (np.random.Generator, optional): random generator for years, prices and missing wind. Defaults to a fresh one.
+        ambient_kwargs: further arguments of Ambient, e.g. weather_cache or year_bank
+    """
+
+    def __init__(self, n_envs: int, total_days: float, price_fluctuation: float, energy_price=0.3262, rng=None, **ambient_kwargs):
+        self.n_envs = n_envs
+        self.total_days = total_days
+        self.price_fluctuation = price_fluctuation
+        self.energy_price = energy_price
+        if(rng is None):
+            rng = np.random.default_rng()
+        self.rng = rng
+        # only prepares the years the environments simulate, it draws and loads none of its own
+        self.source = Ambient(total_days, price_fluctuation,
+                              energy_price, load=False, **ambient_kwargs)
+        self.years = candidate_years()
+        hours = self.source.get_table_hours()
+        self.sun_beams = np.zeros((len(self.years), hours))
+        self.night_hours = np.zeros((len(self.years), hours), dtype=np.bool_)
+        # past the weather data there is no wind, like Ambient.get_wind
+        self.winds = np.zeros((len(self.years), hours))
+        self.loaded = np.zeros(len(self.years), dtype=np.bool_)
+        # None draws a random year on every reset
+        self.fixed_years = [None] * n_envs
+        # None draws the noise of the episode from rng
+        self.episode_seeds = [None] * n_envs
+        self.price_offset = np.zeros((n_envs, hours))
+        self.wind_noise = np.zeros((n_envs, hours))
+        self.envs = np.arange(n_envs)
+        self.year_index = np.zeros(n_envs, dtype=np.int64)
+        self.hour = np.zeros(n_envs, dtype=np.int64)
+        self.actual_price = np.full(n_envs, energy_price)
+        self.sunbeam = np.zeros(n_envs)
+        self.wind = np.zeros(n_envs)
+        self.hourly_bought_energy = np.zeros(n_envs)  # in euro
+
+    def load_year(self, year: int) -> int:
+        """Loads the tables of a year if no environment simulated it before
+
+        Args:
+            year (int): the year
+
+        Returns:
+            int: row of the year in the tables
+        """
+        if(year not in self.years):
+            raise ValueError("Year " + str(year) + " can not be simulated, expected one of " +
+                             str(self.years))
+        index = self.years.index(year)
+        if(not self.loaded[index]):
+            tables = self.source.prepare_year(
+                datetime.datetime.now().year - year)
+            self.sun_beams[index] = tables['sun_beams']
+            self.night_hours[index] = tables['night_hours']
+            hours = min(len(tables['wspd']), self.winds.shape[1])
+            self.winds[index, :hours] = tables['wspd'][:hours]
+            self.loaded[index] = True
+        return index
+
+    def select_years(self, years: list, indices=None):
+        """Fixes the years the environments simulate after their next reset
+
+        Args:
+            years (list): a year per environment, None draws a random year on every reset
+            indices (_type_, optional): environments the years are for. Defaults to all.
+        """
+        if(indices is None):
+            indices = range(self.n_envs)
+        for index, year in zip(indices, years):
+            if(year is not None):
+                self.load_year(year)
+            self.fixed_years[index] = year
+
+    def select_episode_seeds(self, seeds: list, indices=None):
+        """Fixes the seeds of the prices and missing wind of the episodes the environments simulate after their next reset
+
+        Args:
+            seeds (list): a seed or np.random.SeedSequence per environment, None draws from rng
+            indices (_type_, optional): environments the seeds are for. Defaults to all.
+        """
+        if(indices is None):
+            indices = range(self.n_envs)
+        for index, seed in zip(indices, seeds):
+            self.episode_seeds[index] = seed
+
+    def get_year(self) -> np.ndarray:
+        """Returns the simulated year of every environment
+
+        Returns:
+            np.ndarray: the years
+        """
+        return np.asarray(self.years)[self.year_index]
+
+    def update_wind(self, mask=None):
+        """Reads the wind speed of the current hour, missing values are replaced by a random speed like in Ambient.get_wind
+
+        Args:
+            mask (_type_, optional): environments to update. Defaults to all.
+        """
+        wind = self.winds[self.year_index, self.hour]
+        missing = np.isnan(wind)
+        wind[missing] = self.wind_noise[self.envs, self.hour][missing]
+        wind *= 5.0/18.0
+        if(mask is None):
+            self.wind = wind
+        else:
+            self.wind[mask] = wind[mask]
+
+    def is_night(self) -> np.ndarray:
+        """Checks if its night time in every environment
+
+        Returns:
+            np.ndarray: True where night time
+        """
+        return self.night_hours[self.year_index, self.hour]
+
+    def buy_energy(self, energy: np.ndarray) -> np.ndarray:
+        """Buys energy at the momentary energy price of every environment
+
+        Args:
+            energy (np.ndarray): energy in kws per environment
+
+        Returns:
+            np.ndarray: price in eur per environment
+        """
+        price = self.actual_price * energy
+        self.hourly_bought_energy += price
+        return price
+
+    def get_state(self, out=None) -> np.ndarray:
+        """Returns the state of every ambient, like Ambient.get_state
+
+        Args:
+            out (np.ndarray, optional): (environments, 3) array the state is written into. Defaults to a new array.
+
+        Returns:
+            np.ndarray: wind, sun radiation and night per environment
+        """
+        if(out is None):
+            out = np.empty((self.n_envs, 3), dtype=np.float32)
+        out[:, 0] = self.wind
+        out[:, 1] = self.sunbeam
+        out[:, 2] = self.night_hours[self.year_index, self.hour]
+        return out
+
+    def step(self):
+        """Performs a time step for all ambients, changes the energy prices and reads radiation and wind of the next hour
+        """
+        self.hour += 1
+        self.hourly_bought_energy[:] = 0
+        self.actual_price = self.energy_price + \
+            self.price_offset[self.envs, self.hour]
+        # watt per square meter to kilo watt per square meter
+        self.sunbeam = np.minimum(
+            self.sun_beams[self.year_index, self.hour]/1000, 1)
+        self.update_wind()
+
+    def reset(self, mask=None):
+        """Resets the ambients where mask is set, sets the timestep to 0 and selects the next year
+
+        Args:
+            mask (_type_, optional): environments to reset. Defaults to all.
+        """
+        if(mask is None):
+            mask = np.ones(self.n_envs, dtype=np.bool_)
+        for index in np.flatnonzero(mask):
+            year = self.fixed_years[index]
+            if(year is None):
+                year = self.years[self.rng.integers(len(self.years))]
+            self.year_index[index] = self.load_year(year)
+            rng = self.rng
+            if(self.episode_seeds[index] is not None):
+                rng = np.random.default_rng(self.episode_seeds[index])
+            noise = episode_noise(
+                rng, self.price_offset.shape[1], self.price_fluctuation)
+            self.price_offset[index] = noise['price_offset']
+            self.wind_noise[index] = noise['wind']
+        self.hour[mask] = 0
+        self.actual_price[mask] = self.energy_price
+        self.sunbeam[mask] = 0
+        self.hourly_bought_energy[mask] = 0
+        self.update_wind(mask)
+
+    def get_cache_stats(self) -> dict:
+        """Returns the hit and miss counters of the year tables
+
+        Returns:
+            dict: memory hits, disk hits, misses and the amount of tables in memory
+        """
+        return self.source.get_cache_stats()
+
+    def close(self):
+        """Closes the ambient that loads the tables
+        """
+        self.source.close()
@@ -0,0 +1,158 @@
+from micro_grid.envs.v3.BatchAmbient import BatchAmbient
+from micro_grid.envs.v3.GridEngine import building_arrays
+from micro_grid.envs.v3.DemandProfile import BuildingDemand
+from micro_grid.envs.v3.Topology import Topology
+import numpy as np
+
+
+class BatchGridEngine:
+    """Simulation of the buildings of a batch of independent villages with the same buildings.
+    Like GridEngine, with the battery fuel of all villages as (environments, buildings) array
+    and the actions as (environments, edges) array.
+    """
+
+    def __init__(self, buildings: list, ambient: BatchAmbient, topology=None, profile=None):
+        self.ambient = ambient
+        self.n_envs = ambient.n_envs
+        self.n_buildings = len(buildings)
+        if(topology is None):
+            topology = Topology(self.n_buildings)
+        self.topology = topology
+        # offset of every village in the flattened (environments, buildings) arrays
+        self.offsets = np.arange(self.n_envs)[:, None] * self.n_buildings
+        arrays = building_arrays(buildings)
+        self.capacity = arrays['capacity']
+        self.solar_peak_power = arrays['solar_peak_power']
+        self.wind_peak_power = arrays['wind_peak_power']
+        # demand table of every year of the ambient, computed when a village simulates the year the first time
+        self.demand = BuildingDemand(arrays['inhabs'], profile)
+        n_years, hours = ambient.night_hours.shape
+        self.demand_tables = np.zeros(
+            (n_years, hours, len(self.demand.consumptions)))
+        self.demand_loaded = np.zeros(n_years, dtype=np.bool_)
+        self.fuel = np.zeros((self.n_envs, self.n_buildings))
+        # generation of the current hour and the ledger of the generation that was not handed out yet
+        self.generation = np.zeros((self.n_envs, self.n_buildings))
+        self.generation_left = np.zeros((self.n_envs, self.n_buildings))
+        # scratch arrays of snapshot_generation and get_state
+        self.supply = np.zeros((self.n_envs, self.n_buildings))
+        self.wind_power = np.zeros((self.n_envs, self.n_buildings))
+
+    def snapshot_generation(self):
+        """Computes the power generated by the energy sources of every building in all villages once per hour,
+        like GridEngine.snapshot_generation
+        """
+        np.multiply(self.ambient.sunbeam[:, None],
+                    self.solar_peak_power, out=self.generation)
+        np.multiply(self.ambient.wind[:, None],
+                    self.wind_peak_power, out=self.wind_power)
+        self.generation += self.wind_power
+        self.generation_left[:] = self.generation
+
+    def consumption(self) -> np.ndarray:
+        """Power consumption of every building in the current hour
+
+        Returns:
+            np.ndarray: consumption in kW per environment and building
+        """
+        return self.demand_tables[self.ambient.year_index, self.ambient.hour][:, self.demand.kinds]
+
+    def drain(self, power: np.ndarray, mask: np.ndarray, index=slice(None)) -> np.ndarray:
+        """Drains the batteries where mask is set, like GridEngine.drain
+
+        Args:
+            power (np.ndarray): power to be taken per environment and building
+            mask (np.ndarray): which batteries are drained
+            index (_type_, optional): buildings power and mask refer to. Defaults to all.
+
+        Returns:
+            np.ndarray: power that was taken, 0 where mask is not set
+        """
+        fuel = self.fuel[:, index]
+        enough = fuel >= power
+        taken = np.where(mask, np.where(enough, power, fuel), 0.0)
+        self.fuel[:, index] = np.where(mask, np.where(
+            enough, fuel - power, 0.0), fuel)
+        return taken
+
+    def distribute(self, action: np.ndarray) -> np.ndarray:
+        """Sends power along every edge of the topology in all villages, like GridEngine.distribute
+
+        Args:
+            action (np.ndarray): action per environment and edge
+
+        Returns:
+            np.ndarray: power received per environment and building
+        """
+        size = self.n_envs * self.n_buildings
+        received = np.zeros(size)
+        for sources, actions, destinations in self.topology.rounds:
+            percentage = action[:, actions]
+            generation_left = self.generation_left[:, sources]
+            available = generation_left + self.fuel[:, sources]
+            requested = np.where(percentage == 0, 0.0, np.where(
+                percentage == 1, available, available * 0.5))
+            from_generation = np.minimum(requested, generation_left)
+            self.generation_left[:, sources] = generation_left - from_generation
+            sent = from_generation + \
+                self.drain(requested - from_generation, from_generation <
+                           requested, sources)
+            received += np.bincount((self.offsets + destinations).ravel(), weights=sent.ravel(),
+                                    minlength=size)
+        return received.reshape(self.n_envs, self.n_buildings)
+
+    def step(self, action: np.ndarray) -> np.ndarray:
+        """Distributes the energy and performs the time step of all buildings in all villages, like GridEngine.step
+
+        Args:
+            action (np.ndarray): action per environment and edge
+
+        Returns:
+            np.ndarray: bought power per environment and building in euro
+        """
+        given = self.distribute(action)
+        # the generation that was not sent stays in the building
+        given += self.generation_left
+        self.generation_left[:] = 0
+        consumption = self.consumption()
+        has_to_buy = given + self.fuel < consumption
+        excess = ~has_to_buy & (given > consumption)
+        missing = consumption - given
+        missing = missing - self.drain(missing, ~excess)
+        missing = np.where(has_to_buy, missing, 0.0)
+        self.ambient.buy_energy(np.sum(missing, axis=1))
+        self.fuel = np.where(excess, np.minimum(
+            self.fuel + (given - consumption), self.capacity), self.fuel)
+        return missing * self.ambient.actual_price[:, None]
+
+    def get_state(self, out=None) -> np.ndarray:
+        """The state of all buildings, like GridEngine.get_state
+
+        Args:
+            out (np.ndarray, optional): array the state is written into. Defaults to a new float32 array.
+
+        Returns:
+            np.ndarray: 1 where the building does not have to import energy, 0 otherwise, per environment and building
+        """
+        if(out is None):
+            out = np.empty((self.n_envs, self.n_buildings), dtype=np.float32)
+        np.add(self.generation_left, self.fuel, out=self.supply)
+        np.less(self.consumption(), self.supply, out=out)
+        return out
+
+    def reset(self, mask=None):
+        """Resets the batteries of the villages where mask is set and computes the demand of their years
+
+        Args:
+            mask (_type_, optional): environments to reset. Defaults to all.
+        """
+        if(mask is None):
+            mask = np.ones(self.n_envs, dtype=np.bool_)
+        self.fuel[mask] = 0
+        self.generation[mask] = 0
+        self.generation_left[mask] = 0
+        for year_index in np.unique(self.ambient.year_index[mask]):
+            if(not self.demand_loaded[year_index]):
+                self.demand.update(self.ambient.night_hours[year_index])
+                self.demand_tables[year_index] = self.demand.table
+                self.demand_loaded[year_index] = True
@@ -3,13 +3,14 @@ from micro_grid.envs.v2.Solar2 import Solar
 from micro_grid.envs.v1.WindGenerator import WindGenerator
 from micro_grid.envs.v2.Battery2 import Battery
 from micro_grid.envs.v1.EnergySource import Energysource
-import queue as qu
 import random
 
 
 class Building:
     """Class representing a building in the microgrid, can have energy sources and a battery, has inhabitants and a
     """
+    __slots__ = ('energy_sources', 'battery', 'inhabs', 'ambient', 'hourly_power_given',
+                 'demand', 'generation', 'generation_left')
 
     def __init__(self, energy_sources: list, battery: Battery, inhabs: int, ambient: Ambient):
         self.energy_sources = energy_sources
@@ -21,7 +22,11 @@ class Building:
         self.inhabs = inhabs
         self.ambient = ambient
         self.hourly_power_given = 0
-        self.queue = qu.Queue()
+        # demand for every hour of the simulated year, set by the environment
+        self.demand = None
+        # generation of the current hour and the part of it that was not handed out yet
+        self.generation = 0
+        self.generation_left = 0
 
     def sum_sources(self, ambient=None) -> float:
         """Sums up all of the available power generated by available energy sources
@@ -40,9 +45,18 @@ class Building:
                 sum += source.get_power(ambient)
         return sum
 
+    def snapshot_generation(self, ambient=None):
+        """Sums up the generation of the current hour once, all power accounting of the hour reads this snapshot
+
+        Args:
+            ambient (_type_, optional): The Ambient of the environment. Defaults to None.
+        """
+        self.generation = self.sum_sources(ambient)
+        self.generation_left = self.generation
+
     # Asks how much power is ready to be send
     def get_power(self, ambient=None) -> float:
-        """Sums up the total power available in the building
+        """Sums up the total power available in the building, the generation that was not handed out yet and the battery
 
         Args:
             ambient (_type_, optional): The Ambient of the environment Defaults to None.
@@ -50,14 +64,10 @@ class Building:
         Returns:
             float: The total power available at the building
         """
-        if(ambient is None):
-            ambient = self.ambient
-        sum = self.sum_sources(ambient)
-        sum += self.battery.get_fuel()
-        return sum
+        return self.generation_left + self.battery.get_fuel()
 
     def consume_power(self, power: float, ambient=None) -> float:
-        """Drains power from the building
+        """Drains power from the building, first from the generation that was not handed out yet, then from the battery.
         If there is not enough power drains everything that is available
         Args:
             power (float): Amount of power to be drained
@@ -66,9 +76,8 @@ class Building:
         Returns:
             float: The power that was taken from the house.
         """
-        if(ambient is None):
-            ambient = self.ambient
-        sum = self.sum_sources(ambient)
+        sum = min(power, self.generation_left)
+        self.generation_left -= sum
         if sum < power:
             sum += self.battery.get_power(power-sum)
         return sum
@@ -104,6 +113,8 @@ class Building:
         """
         if(ambient is None):
             ambient = self.ambient
+        if(self.demand is not None):
+            return self.demand[ambient.hour]
         consumption_per_year = [1_958, 3_196, 4_919]
         own_year_consumption = consumption_per_year[self.inhabs-1]
         own_day_consumption = own_year_consumption/365.25
@@ -136,8 +147,14 @@ class Building:
 
     def step(self):
         """Performs a time step for the building.
+        The generation that was not sent to other buildings stays in the building.
         Checks if energy needs to be bought and resets given power.
+
+        Returns:
+            float: The bought power in euro
         """
+        self.hourly_power_given += self.generation_left
+        self.generation_left = 0
         bought_power = 0
         # Has to buy power
         pw = self.power_consumption()
@@ -153,15 +170,12 @@ class Building:
             pw -= self.hourly_power_given
             self.battery.get_power(pw)
         self.hourly_power_given = 0
-        # Save bought power amount in queue for rendering
-        try:
-            self.queue.put_nowait(bought_power)
-        except qu.Full:
-            pass
+        return bought_power
 
     def reset(self):
         """Resets the building and battery of the building
         """
         self.battery.reset()
         self.hourly_power_given = 0
-        self.queue = qu.Queue()
+        self.generation = 0
+        self.generation_left = 0
@@ -0,0 +1,166 @@
+import csv
+import os
+import numpy as np
+
+## PARAMETERS ##
+# yearly consumption in kWh by amount of inhabitants, same as Building.power_consumption
+CONSUMPTION_PER_YEAR = np.array([1_958, 3_196, 4_919])
+DAY_CONSUMPTION_FACTOR = 1.75
+NIGHT_CONSUMPTION_FACTOR = 0.25
+HOURS_PER_YEAR = 365.25 * 24
+
+
+def yearly_consumption(inhabs: np.ndarray) -> np.ndarray:
+    """Returns the yearly consumption of buildings by their amount of inhabitants
+
+    Args:
+        inhabs (np.ndarray): inhabitants per building
+
+    Returns:
+        np.ndarray: consumption in kWh per year and building
+    """
+    # python indexing, like Building.power_consumption 0 inhabitants consume as much as 3
+    return CONSUMPTION_PER_YEAR[np.asarray(inhabs, dtype=np.int64)-1]
+
+
+class DayNightProfile:
+    """Demand profile of the original model, a building consumes 1.75 times its mean hourly consumption at day
+    and 0.25 times at night.
+    """
+
+    def get_demand(self, consumptions: np.ndarray, night_hours: np.ndarray) -> np.ndarray:
+        """Returns the hourly demand of buildings for every hour of a year
+
+        Args:
+            consumptions (np.ndarray): yearly consumption in kWh per building kind
+            night_hours (np.ndarray): night flag for every hour
+
+        Returns:
+            np.ndarray: demand in kW, hour by building kind
+        """
+        own_day_consumption = consumptions/365.25
+        hourly_consumption = own_day_consumption/24
+        return np.where(np.asarray(night_hours, dtype=np.bool_)[:, None], hourly_consumption*NIGHT_CONSUMPTION_FACTOR,
+                        hourly_consumption*DAY_CONSUMPTION_FACTOR)
+
+
+class CsvProfile:
+    """Demand profile read from a CSV file, e.g. a standard load profile with one value per hour of a year.
+    The profile is repeated if the simulated timespan is longer
+    and scaled so that a year sums up to the yearly consumption of the building.
+
+    Args:
+        path (str): path of the CSV file
+        column (_type_, optional): name of the column with the load values, requires a header row. Defaults to the last column.
+    """
+
+    def __init__(self, path: str, column=None):
+        path = os.path.normpath(path)
+        if(not os.path.isfile(path)):
+            raise FileNotFoundError(
+                "The demand profile " + path + " does not exist")
+        with open(path, 'r', newline='') as file:
+            rows = [row for row in csv.reader(file) if row]
+        index = -1
+        if(column is not None):
+            index = rows[0].index(column)
+            rows = rows[1:]
+        elif(not self.is_number(rows[0][index])):
+            # header row
+            rows = rows[1:]
+        self.load = np.array([float(row[index]) for row in rows])
+        # share of the yearly consumption in every hour
+        self.shares = self.load / self.load.sum() * (len(self.load) / HOURS_PER_YEAR)
+
+    @staticmethod
+    def is_number(value: str) -> bool:
+        """Checks whether a CSV value is a number, to detect header rows"""
+        try:
+            float(value)
+        except ValueError:
+            return False
+        return True
+
+    def get_demand(self, consumptions: np.ndarray, night_hours: np.ndarray) -> np.ndarray:
+        """Returns the hourly demand of buildings for every hour of a year
+
+        Args:
+            consumptions (np.ndarray): yearly consumption in kWh per building kind
+            night_hours (np.ndarray): night flag for every hour, only its length is used
+
+        Returns:
+            np.ndarray: demand in kW, hour by building kind
+        """
+        shares = np.resize(self.shares, len(night_hours))
+        return shares[:, None] * consumptions
+
+
+def create_profile(config: dict, config_path='.'):
+    """Creates the demand profile of a parsed config.yml, e.g.
+
+        demand_profile:
+          path: h0.csv
+          column: load
+
+    Args:
+        config (dict): the parsed config
+        config_path (str, optional): path of the config, a relative profile path is relative to it. Defaults to '.'.
+
+    Returns:
+        _type_: the profile, DayNightProfile if the config has none
+    """
+    profile = config.get('demand_profile')
+    if(profile is None):
+        return DayNightProfile()
+    path = os.path.join(os.path.dirname(
+        os.path.normpath(config_path)), profile['path'])
+    return CsvProfile(path, profile.get('column'))
+
+
+class BuildingDemand:
+    """Demand of all buildings of a village for every hour of the simulated year.
+    Buildings with the same yearly consumption share one column of the demand table, which is computed once per year.
+
+    Args:
+        inhabs (np.ndarray): inhabitants per building
+        profile (_type_, optional): demand profile. Defaults to DayNightProfile.
+    """
+
+    def __init__(self, inhabs: np.ndarray, profile=None):
+        if(profile is None):
+            profile = DayNightProfile()
+        self.profile = profile
+        self.consumptions, self.kinds = np.unique(
+            yearly_consumption(inhabs), return_inverse=True)
+        self.table = None
+
+    def update(self, night_hours: np.ndarray):
+        """Computes the demand table of a year
+
+        Args:
+            night_hours (np.ndarray): night flag for every hour of the year
+        """
+        self.table = self.profile.get_demand(self.consumptions, night_hours)
+
+    def get_building(self, index: int) -> np.ndarray:
+        """Returns the demand of a building for every hour
+
+        Args:
+            index (int): index of the building
+
+        Returns:
+            np.ndarray: demand in kW per hour
+        """
+        return self.table[:, self.kinds[index]]
+
+    def get(self, hour: int, out=None) -> np.ndarray:
+        """Returns the demand of all buildings in an hour
+
+        Args:
+            hour (int): the hour
+            out (np.ndarray, optional): array the demand is written into. Defaults to a new array.
+
+        Returns:
+            np.ndarray: demand in kW per building
+        """
+        return np.take(self.table[hour], self.kinds, out=out)
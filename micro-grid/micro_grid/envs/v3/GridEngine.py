@@ -0,0 +1,193 @@
+from micro_grid.envs.v2.Ambient2 import Ambient
+from micro_grid.envs.v2.Solar2 import Solar
+from micro_grid.envs.v1.WindGenerator import WindGenerator
+from micro_grid.envs.v2.Battery2 import BatteryBank
+from micro_grid.envs.v3.Topology import Topology
+from micro_grid.envs.v3.DemandProfile import BuildingDemand
+import numpy as np
+
+
+def building_arrays(buildings: list) -> dict:
+    """Collects the attributes of building objects into arrays
+
+    Args:
+        buildings (list): the buildings of the village
+
+    Returns:
+        dict: capacity, fuel, inhabs, solar_peak_power, wind_peak_power per building
+    """
+    inhabs = np.array([building.inhabs for building in buildings], dtype=np.int64)
+    return {'capacity': np.array([building.battery.capacity for building in buildings], dtype=np.float64),
+            'fuel': np.array([building.battery.get_fuel() for building in buildings], dtype=np.float64),
+            'inhabs': inhabs,
+            'solar_peak_power': np.array([sum(source.peak_power for source in building.energy_sources if type(source) is Solar)
+                                          for building in buildings], dtype=np.float64),
+            'wind_peak_power': np.array([sum(source.peak_power for source in building.energy_sources if type(source) is WindGenerator)
+                                         for building in buildings], dtype=np.float64)}
+
+
+class GridEngine:
+    """Struct of arrays simulation of the buildings of a village.
+    Holds battery fuel, capacity, inhabitants, peak power of the energy sources and consumption of all buildings as numpy arrays
+    and resolves the hourly energy distribution with array operations over the edges of the topology.
+    Follows the object model of Building, which is kept as reference implementation.
+    """
+
+    def __init__(self, buildings: list, ambient: Ambient, topology=None, demand=None):
+        self.ambient = ambient
+        self.n_buildings = len(buildings)
+        if(topology is None):
+            topology = Topology(self.n_buildings)
+        self.topology = topology
+        arrays = building_arrays(buildings)
+        self.capacity = arrays['capacity']
+        self.fuel = arrays['fuel']
+        # shares the fuel with the battery objects if they form one bank, it is only changed in place then
+        bank = BatteryBank.of([building.battery for building in buildings])
+        if(bank is not None):
+            self.capacity = bank.capacity
+            self.fuel = bank.fuel
+        self.inhabs = arrays['inhabs']
+        self.solar_peak_power = arrays['solar_peak_power']
+        self.wind_peak_power = arrays['wind_peak_power']
+        if(demand is None):
+            demand = BuildingDemand(self.inhabs)
+            demand.update(ambient.night_hours)
+        # updated by the environment whenever the ambient simulates another year
+        self.demand = demand
+        self.demand_now = np.zeros(self.n_buildings)
+        self.hourly_power_given = np.zeros(self.n_buildings)
+        self.bought = np.zeros(self.n_buildings)
+        # generation of the current hour and the ledger of the generation that was not handed out yet
+        self.generation = np.zeros(self.n_buildings)
+        self.generation_left = np.zeros(self.n_buildings)
+        # scratch arrays of snapshot_generation and get_state
+        self.supply = np.zeros(self.n_buildings)
+        self.wind_power = np.zeros(self.n_buildings)
+        # PhaseProfiler of the environment while profiling is enabled
+        self.profiler = None
+
+    def snapshot_generation(self):
+        """Computes the power generated by the energy sources of every building once per hour, like Building.snapshot_generation.
+        Distribution and state of the hour read this snapshot.
+        """
+        np.multiply(self.solar_peak_power,
+                    self.ambient.get_sunbeam(), out=self.generation)
+        np.multiply(self.wind_peak_power,
+                    self.ambient.get_wind(), out=self.wind_power)
+        self.generation += self.wind_power
+        self.generation_left[:] = self.generation
+
+    def consumption(self) -> np.ndarray:
+        """Power consumption of every building in the current hour
+
+        Returns:
+            np.ndarray: consumption in kW per building, overwritten by the next call
+        """
+        return self.demand.get(self.ambient.hour, out=self.demand_now)
+
+    def drain(self, power: np.ndarray, mask: np.ndarray, index=slice(None)) -> np.ndarray:
+        """Drains the batteries where mask is set, like Battery.get_power.
+        If more power is to be taken than is available drains everything that is possible.
+
+        Args:
+            power (np.ndarray): power to be taken per building
+            mask (np.ndarray): which batteries are drained
+            index (_type_, optional): buildings power and mask refer to. Defaults to all.
+
+        Returns:
+            np.ndarray: power that was taken per building, 0 where mask is not set
+        """
+        fuel = self.fuel[index]
+        enough = fuel >= power
+        taken = np.where(mask, np.where(enough, power, fuel), 0.0)
+        self.fuel[index] = np.where(mask, np.where(
+            enough, fuel - power, 0.0), fuel)
+        return taken
+
+    def distribute(self, action: np.ndarray) -> np.ndarray:
+        """Sends power along every edge of the topology, like Building.consume_percentage.
+        Power is taken from the generation that was not handed out yet first, then from the battery.
+        In round k every building sends along its k-th edge at once, since only the source ledgers and batteries change.
+
+        Args:
+            action (np.ndarray): action per edge, 0 nothing, 1 all and 2 half of the available power
+
+        Returns:
+            np.ndarray: power received per building
+        """
+        received = np.zeros(self.n_buildings)
+        for sources, actions, destinations in self.topology.rounds:
+            percentage = action[actions]
+            generation_left = self.generation_left[sources]
+            available = generation_left + self.fuel[sources]
+            requested = np.where(percentage == 0, 0.0, np.where(
+                percentage == 1, available, available * 0.5))
+            from_generation = np.minimum(requested, generation_left)
+            self.generation_left[sources] = generation_left - from_generation
+            sent = from_generation + \
+                self.drain(requested - from_generation, from_generation <
+                           requested, sources)
+            received += np.bincount(destinations, weights=sent,
+                                    minlength=self.n_buildings)
+        return received
+
+    def step(self, action: np.ndarray) -> np.ndarray:
+        """Distributes the energy and performs the time step of all buildings, like Building.step.
+        The generation that was not sent to other buildings stays in the building.
+        Buys missing power from the ambient and loads batteries with excess power.
+
+        Args:
+            action (np.ndarray): action per edge of the topology
+
+        Returns:
+            np.ndarray: bought power per building in euro
+        """
+        profiler = self.profiler
+        if(profiler is not None):
+            start = profiler.clock()
+        self.hourly_power_given = self.distribute(action)
+        if(profiler is not None):
+            profiler.lap("step.distribute", start)
+        self.hourly_power_given += self.generation_left
+        self.generation_left[:] = 0
+        given = self.hourly_power_given
+        consumption = self.consumption()
+        has_to_buy = given + self.fuel < consumption
+        excess = ~has_to_buy & (given > consumption)
+        missing = consumption - given
+        missing = missing - self.drain(missing, ~excess)
+        missing_power = np.sum(missing[has_to_buy])
+        self.bought = np.where(
+            has_to_buy, missing * self.ambient.actual_price, 0.0)
+        if(missing_power > 0):
+            self.ambient.buy_energy(missing_power)
+        self.fuel[:] = np.where(excess, np.minimum(
+            self.fuel + (given - consumption), self.capacity), self.fuel)
+        self.hourly_power_given = np.zeros(self.n_buildings)
+        return self.bought
+
+    def get_state(self, out=None) -> np.ndarray:
+        """The state of all buildings, like Building.get_state
+
+        Args:
+            out (np.ndarray, optional): array the state is written into. Defaults to a new float32 array.
+
+        Returns:
+            np.ndarray: 1 where the building does not have to import energy, 0 otherwise
+        """
+        if(out is None):
+            out = np.empty(self.n_buildings, dtype=np.float32)
+        # generation that was not handed out yet plus fuel, computed in place
+        np.add(self.generation_left, self.fuel, out=self.supply)
+        np.less(self.consumption(), self.supply, out=out)
+        return out
+
+    def reset(self):
+        """Resets the batteries and the given power of all buildings
+        """
+        self.fuel[:] = 0
+        self.hourly_power_given = np.zeros(self.n_buildings)
+        self.bought = np.zeros(self.n_buildings)
+        self.generation[:] = 0
+        self.generation_left[:] = 0
@@ -0,0 +1,76 @@
+import numpy as np
+
+
+class Topology:
+    """Power lines between the buildings of a village, stored as CSR adjacency.
+    Every edge sends power from a source to a destination building and has one action, in the order of the edges.
+    Without lines every building is connected with every other one, the edge of source s and destination d has action s*N+d,
+    which is the action matrix of the fully connected village.
+    With lines every building has an edge to itself, followed by both directions of every line.
+
+    Args:
+        n_buildings (int): amount of buildings
+        lines (list, optional): pairs of connected building indices. Defaults to every building connected with every other one.
+    """
+
+    def __init__(self, n_buildings: int, lines=None):
+        self.n_buildings = n_buildings
+        self.complete = lines is None
+        if(self.complete):
+            self.sources = np.repeat(np.arange(n_buildings), n_buildings)
+            self.destinations = np.tile(np.arange(n_buildings), n_buildings)
+        else:
+            lines = np.asarray(lines, dtype=np.int64).reshape(-1, 2)
+            if(np.any(lines < 0) or np.any(lines >= n_buildings)):
+                raise ValueError("Lines have to connect buildings between 0 and " +
+                                 str(n_buildings - 1))
+            own = np.arange(n_buildings)
+            self.sources = np.concatenate([own, lines[:, 0], lines[:, 1]])
+            self.destinations = np.concatenate(
+                [own, lines[:, 1], lines[:, 0]])
+        self.n_edges = len(self.sources)
+        # edges sorted by source, a building sends in the order of its edges
+        order = np.argsort(self.sources, kind='stable')
+        degree = np.bincount(self.sources, minlength=n_buildings)
+        self.indptr = np.concatenate([[0], np.cumsum(degree)])
+        self.indices = self.destinations[order]
+        self.edge_actions = order
+        # k-th edge of every building with more than k edges, so the distribution loops over the maximum degree
+        self.rounds = []
+        for k in range(int(degree.max(initial=0))):
+            sources = np.flatnonzero(degree > k)
+            slots = self.indptr[sources] + k
+            if(len(sources) == n_buildings):
+                sources = slice(None)
+            self.rounds.append(
+                (sources, self.edge_actions[slots], self.indices[slots]))
+
+    @classmethod
+    def from_config(cls, config: dict, n_buildings: int):
+        """Creates the topology of the lines of a parsed config.yml, fully connected if the config has no lines
+
+        Args:
+            config (dict): the parsed config
+            n_buildings (int): amount of buildings
+
+        Returns:
+            Topology: the topology
+        """
+        return cls(n_buildings, config.get('lines'))
+
+    def to_matrix(self, action: np.ndarray) -> np.ndarray:
+        """Converts the actions of the edges into the source building by destination building matrix, e.g. for rendering
+
+        Args:
+            action (np.ndarray): action per edge
+
+        Returns:
+            np.ndarray: action matrix, 0 where buildings are not connected
+        """
+        action = np.asarray(action)
+        if(self.complete):
+            return np.reshape(action, (self.n_buildings, self.n_buildings))
+        matrix = np.zeros((self.n_buildings, self.n_buildings),
+                          dtype=action.dtype)
+        matrix[self.sources, self.destinations] = action
+        return matrix